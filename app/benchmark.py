@@ -0,0 +1,301 @@
+# benchmark.py
+import os
+import io
+import sys
+import json
+import math
+import time
+import argparse
+import platform
+import tempfile
+import contextlib
+from datetime import datetime, timedelta
+import numpy as np
+import cv2
+
+from synthetic_tray import SyntheticTray, BORDER_FILE, default_border_rect, uniform_grid_regions
+
+# 默认测试规模
+FRAME_SIZES = ((640, 480), (1920, 1080), (3840, 2160))
+MONITOR_TYPES = ("charging_case", "hearing_aid")
+GRID_COUNTS = (20, 56, 200, 400)    # 均匀网格数（网格数扩展性；空=只测设备默认布局）
+LOG_SIZES = (1000, 100000)          # 日志条目数（10M 需显式指定 --log-sizes）
+MONITOR_ITERATIONS = 50             # 每个监控函数计时次数
+ANALYZER_ITERATIONS = 1             # 日志分析计时次数（大目录只跑一次）
+SYNTHETIC_FRAMES = 16               # 预渲染帧数（循环使用，渲染不计入耗时）
+REGRESSION_TOLERANCE = 0.20         # p50 比基线慢超过20%视为退化
+
+# 生成日志的采样间隔（与实时运行接近）
+HEARING_AID_LOG_RATE = 10           # 助听器亮度日志：每秒条目数
+CHARGING_ANALYSIS_INTERVAL = 4      # 充电盒状态日志：每4秒20条
+SEGMENT_SECONDS = 600               # 10分钟一个分段文件
+
+
+def _summarize(samples):
+    """耗时统计（毫秒）"""
+    arr = np.asarray(samples, dtype=np.float64) * 1000.0
+    return {
+        "iterations": len(samples),
+        "mean_ms": round(float(arr.mean()), 4),
+        "p50_ms": round(float(np.percentile(arr, 50)), 4),
+        "p95_ms": round(float(np.percentile(arr, 95)), 4),
+        "min_ms": round(float(arr.min()), 4),
+    }
+
+
+def _time_calls(func, iterations):
+    samples = []
+    for i in range(iterations):
+        started = time.perf_counter()
+        func(i)
+        samples.append(time.perf_counter() - started)
+    return _summarize(samples)
+
+
+def grid_layout(grid_count):
+    """网格数对应的行列数（最接近方形的因数分解）"""
+    rows = max(d for d in range(1, math.isqrt(grid_count) + 1) if grid_count % d == 0)
+    return rows, grid_count // rows
+
+
+def bench_monitor(monitor_type, frame_size, iterations=MONITOR_ITERATIONS, grid_count=None):
+    """GridMonitor 热路径各函数的单次耗时（grid_count 为 None 时用设备默认网格布局，否则用均匀网格）"""
+    import grid_monitor
+
+    border_rect = default_border_rect(monitor_type, frame_size)
+    grid_regions = uniform_grid_regions(border_rect, *grid_layout(grid_count)) if grid_count else None
+    tray = SyntheticTray(monitor_type, frame_size=frame_size, border_rect=border_rect,
+                         grid_regions=grid_regions, noise_std=4.0, seed=0)
+    fps = 30.0
+    frames = [tray.render(i / fps) for i in range(SYNTHETIC_FRAMES)]
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir, contextlib.redirect_stdout(io.StringIO()):
+        border_file = os.path.join(tmp_dir, BORDER_FILE)
+        with open(border_file, "w", encoding="utf-8") as f:
+            json.dump(tray.border_config(), f)
+        monitor = grid_monitor.GridMonitor(None, monitor_type, border_file=border_file, log_dir=tmp_dir,
+                                           grid_regions=grid_regions)
+        monitor.load_config()
+        monitor.init_grid_regions()
+        monitor.log_writer.start()
+        base_time = time.time()
+        # 跳过启动延迟，并先填满4秒窗口
+        monitor.start_time = base_time - grid_monitor.START_DELAY - 1
+        warmup = int(grid_monitor.CACHE_DURATION * fps)
+        state = {"bright_grids": [], "grid_brightness": []}
+
+        def set_frame(i):
+            monitor.frame_time = base_time + (warmup + i) / fps
+            return frames[i % len(frames)]
+
+        for i in range(warmup):
+            monitor.frame_time = base_time + i / fps
+            monitor.calculate_grid_bright(frames[i % len(frames)])
+
+        def calc(i):
+            frame = set_frame(i)
+            state["bright_grids"], state["grid_brightness"], _ = monitor.calculate_grid_bright(frame)
+
+        results["calculate_grid_bright"] = _time_calls(calc, iterations)
+        results["clean_expired_cache"] = _time_calls(lambda i: monitor.clean_expired_cache(), iterations)
+        results["log_change"] = _time_calls(
+            lambda i: monitor.log_change(state["bright_grids"], state["grid_brightness"]), iterations)
+        if monitor_type == "charging_case":
+            results["analyze_charging_case_status"] = _time_calls(
+                lambda i: monitor.analyze_charging_case_status(), iterations)
+        draw_frames = [f.copy() for f in frames]
+        results["draw_grid_and_bright"] = _time_calls(
+            lambda i: monitor.draw_grid_and_bright(draw_frames[i % len(draw_frames)], state["bright_grids"]),
+            iterations)
+        monitor.log_writer.stop()
+    return results
+
+
+def _segment_name(ts):
+    """分段文件名（与 GridMonitor._get_10min_segment 一致：YYYYMMDD_HHMM_HHMM，本地时间）"""
+    local = datetime.fromtimestamp(ts)
+    start = local.replace(minute=local.minute // 10 * 10, second=0, microsecond=0)
+    return f"{start:%Y%m%d_%H%M}_{start + timedelta(seconds=SEGMENT_SECONDS):%H%M}"
+
+
+def generate_hearing_aid_logs(root_dir, entry_count, start_time=1700000000.0):
+    """生成助听器亮度日志目录（与 GridMonitor.log_change 的条目格式一致）"""
+    rng = np.random.default_rng(0)
+    restart = time.strftime("%Y%m%d_%H%M%S", time.localtime(start_time))
+    out_dir = os.path.join(root_dir, restart)
+    os.makedirs(out_dir, exist_ok=True)
+    brightness = np.round(rng.random((64, 56)) * 0.002, 6).tolist()
+    f, segment = None, None
+    try:
+        for i in range(entry_count):
+            ts = start_time + i / HEARING_AID_LOG_RATE
+            name = _segment_name(ts)
+            if name != segment:
+                if f:
+                    f.close()
+                segment = name
+                f = open(os.path.join(out_dir, f"{name}.jsonl"), "w", encoding="utf-8")
+            values = brightness[i % len(brightness)]
+            abnormal = [g for g, v in enumerate(values) if v >= 0.001]
+            f.write(json.dumps({
+                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts)),
+                "monitor_type": "hearing_aid",
+                "abnormal_grids": abnormal,
+                "grid_brightness": values,
+                "total_abnormal_grids": len(abnormal),
+                "restart_timestamp": restart,
+                "normal_status": "dark",
+                "abnormal_reason": "bright spot detected (fluctuation)"
+            }) + "\n")
+    finally:
+        if f:
+            f.close()
+
+
+def generate_charging_logs(root_dir, entry_count, start_time=1700000000.0):
+    """生成充电盒状态日志目录（每次分析20条，与 analyze_charging_case_status 一致）"""
+    restart = time.strftime("%Y%m%d_%H%M%S", time.localtime(start_time))
+    out_dir = os.path.join(root_dir, restart)
+    os.makedirs(out_dir, exist_ok=True)
+    f, segment = None, None
+    try:
+        for i in range(entry_count):
+            round_idx, grid_idx = divmod(i, 20)
+            ts = start_time + round_idx * CHARGING_ANALYSIS_INTERVAL
+            name = _segment_name(ts)
+            if name != segment:
+                if f:
+                    f.close()
+                segment = name
+                f = open(os.path.join(out_dir, f"{name}.jsonl"), "w", encoding="utf-8")
+            # 各网格在不同时刻由充电中转为充电完成
+            status = "charging" if round_idx < 30 + grid_idx * 10 else "charged"
+            f.write(json.dumps({
+                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts)),
+                "restart_timestamp": restart,
+                "grid_id": grid_idx,
+                "status": status,
+                "detail": ""
+            }) + "\n")
+    finally:
+        if f:
+            f.close()
+
+
+def bench_analyzers(log_sizes=LOG_SIZES, iterations=ANALYZER_ITERATIONS):
+    """两个日志分析工具在不同日志规模下的耗时"""
+    from hearing_aid_log_analysis_tool import HearingAidLogAnalyzer
+    from charging_log_analysis_tool import ChargingLogAnalyzer
+
+    results = {}
+    for size in log_sizes:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            hearing_dir = os.path.join(tmp_dir, "hearing_aid")
+            charging_dir = os.path.join(tmp_dir, "charging")
+            generate_hearing_aid_logs(hearing_dir, size)
+            generate_charging_logs(charging_dir, size)
+            # 关闭分段缓存：每次迭代都测完整解析
+            results[f"hearing_aid/{size}"] = _time_calls(
+                lambda i: HearingAidLogAnalyzer(hearing_dir, use_cache=False).analyze(), iterations)
+            results[f"charging/{size}"] = _time_calls(
+                lambda i: ChargingLogAnalyzer(charging_dir, use_cache=False).analyze(), iterations)
+    return results
+
+
+def run_benchmarks(frame_sizes=FRAME_SIZES, monitor_types=MONITOR_TYPES, log_sizes=LOG_SIZES,
+                   iterations=MONITOR_ITERATIONS, progress=None, grid_counts=GRID_COUNTS):
+    """运行全部基准，返回 {"meta":..., "results": {名称: 统计}}"""
+    results = {}
+    for monitor_type in monitor_types:
+        for frame_size in frame_sizes:
+            # 设备默认布局 + 各均匀网格数（名称追加 /grids<N>）
+            for grid_count in (None, *grid_counts):
+                key = f"monitor/{monitor_type}/{frame_size[0]}x{frame_size[1]}"
+                if grid_count:
+                    key += f"/grids{grid_count}"
+                if progress:
+                    progress(key)
+                for name, stats in bench_monitor(monitor_type, frame_size, iterations, grid_count).items():
+                    results[f"{key}/{name}"] = stats
+    if log_sizes:
+        if progress:
+            progress(f"analyzer {list(log_sizes)}")
+        for name, stats in bench_analyzers(log_sizes).items():
+            results[f"analyzer/{name}"] = stats
+    return {
+        "meta": {
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+            "opencv": cv2.__version__,
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+    }
+
+
+def compare_with_baseline(report, baseline, tolerance=REGRESSION_TOLERANCE):
+    """按 p50 与基线对比，返回 (退化列表, 对比明细)"""
+    regressions, rows = [], []
+    base_results = baseline.get("results", {})
+    for name, stats in sorted(report["results"].items()):
+        base = base_results.get(name)
+        if base is None or not base.get("p50_ms"):
+            continue
+        ratio = stats["p50_ms"] / base["p50_ms"]
+        row = {"name": name, "baseline_p50_ms": base["p50_ms"], "p50_ms": stats["p50_ms"], "ratio": round(ratio, 3)}
+        rows.append(row)
+        if ratio > 1.0 + tolerance:
+            regressions.append(row)
+    return regressions, rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Grid monitor / log analyzer benchmarks (headless)")
+    parser.add_argument("--frame-sizes", default=",".join(f"{w}x{h}" for w, h in FRAME_SIZES),
+                        help="comma separated WxH list")
+    parser.add_argument("--types", default=",".join(MONITOR_TYPES))
+    parser.add_argument("--grid-counts", default=",".join(str(n) for n in GRID_COUNTS),
+                        help="comma separated uniform grid counts (empty to skip)")
+    parser.add_argument("--log-sizes", default=",".join(str(n) for n in LOG_SIZES),
+                        help="comma separated entry counts, e.g. 1000,100000,10000000 (empty to skip)")
+    parser.add_argument("--iterations", type=int, default=MONITOR_ITERATIONS)
+    parser.add_argument("--output", help="write JSON results to this file (default: stdout)")
+    parser.add_argument("--baseline", help="baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    frame_sizes = [tuple(int(v) for v in s.lower().split("x")) for s in args.frame_sizes.split(",") if s]
+    monitor_types = [t for t in args.types.split(",") if t]
+    log_sizes = [int(n) for n in args.log_sizes.split(",") if n]
+    grid_counts = [int(n) for n in args.grid_counts.split(",") if n]
+
+    report = run_benchmarks(frame_sizes, monitor_types, log_sizes, args.iterations,
+                            progress=lambda name: print(f"running {name} ...", file=sys.stderr),
+                            grid_counts=grid_counts)
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions, rows = compare_with_baseline(report, baseline, args.tolerance)
+        report["comparison"] = {"baseline": args.baseline, "tolerance": args.tolerance,
+                                "rows": rows, "regressions": regressions}
+        for row in regressions:
+            print(f"REGRESSION {row['name']}: {row['baseline_p50_ms']}ms -> {row['p50_ms']}ms "
+                  f"(x{row['ratio']})", file=sys.stderr)
+        if regressions:
+            exit_code = 1
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
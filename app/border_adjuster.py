@@ -3,6 +3,7 @@ import numpy as np
 import json
 import os
 from tkinter import messagebox
+from camera_broker import acquire_camera
 
 # 常量定义
 PARAMS_FILE = "calibration_params.json"
@@ -66,26 +67,29 @@ def adjust_charging_case_border():
             dragging_tl = dragging_br = False
             print("停止拖动")
 
-    # 3. 启动摄像头
-    cap = cv2.VideoCapture(1)
-    if not cap.isOpened(): 
-        cap = cv2.VideoCapture(0)
+    # 3. 获取共享摄像头（与监控/预览共用同一设备，分辨率1920x1080）
+    camera = acquire_camera()
+    if camera is None:
+        print("摄像头不可用，退出")
+        return
+    if camera.device_index == 0:
         print("警告：未检测到摄像头1，切换到摄像头0")
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1920)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 1080)
 
     win_name = "Manual Adjust: Drag Green/Red dots. (S: Save, Q: Quit)"
     cv2.namedWindow(win_name)
     cv2.setMouseCallback(win_name, mouse_callback)
 
     while True:
-        ret, raw = cap.read()
-        if not ret: 
+        packet = camera.read()
+        if packet is None:
+            if not camera.failed:
+                continue
             print("摄像头读取失败，退出")
             break
+        raw = packet.frame
 
-        # 应用校正变换
-        frame = cv2.warpPerspective(raw, M, size) if M is not None else raw
+        # 应用校正变换（共享帧只读，复制后再绘制）
+        frame = cv2.warpPerspective(raw, M, size) if M is not None else raw.copy()
 
         # 绘制交互元素
         # 绘制主矩形
@@ -121,7 +125,7 @@ def adjust_charging_case_border():
             print("用户退出调整")
             break
 
-    cap.release()
+    camera.release()
     cv2.destroyAllWindows()
 
 # 测试调用（可选）
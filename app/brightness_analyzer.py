@@ -1,10 +1,11 @@
 import json
 import matplotlib.pyplot as plt
 import numpy as np
+from segment_log import read_log_entries
 
 def plot_dynamic_brightness_curves(json_file_path):
     """
-    从JSON文件读取亮度数据，自动识别曲线数量并绘制曲线图
+    从日志文件（JSON Lines / 旧版JSON数组）读取亮度数据，自动识别曲线数量并绘制曲线图
     核心特性：
     1. 不固定线条数，完全根据grid_brightness数组长度自适应
     2. Y轴范围固定为 0 ~ 0.01，聚焦亮度值区间
@@ -12,8 +13,7 @@ def plot_dynamic_brightness_curves(json_file_path):
     """
     # ===================== 1. 读取并验证JSON数据 =====================
     try:
-        with open(json_file_path, 'r', encoding='utf-8') as f:
-            data_list = json.load(f)
+        data_list = read_log_entries(json_file_path)
         
         # 检查数据是否为空
         if not isinstance(data_list, list) or len(data_list) == 0:
@@ -0,0 +1,74 @@
+# brightness_cache.py
+import numpy as np
+
+DEFAULT_CAPACITY = 256  # 默认样本容量（约4秒×60fps），不足时自动翻倍
+
+
+class BrightnessRingBuffer:
+    """按时间戳索引的网格亮度环形缓冲（样本数×网格数）：追加/过期O(1)，窗口视图零拷贝"""
+
+    def __init__(self, grid_count, capacity=DEFAULT_CAPACITY):
+        self.grid_count = grid_count
+        self._allocate(max(1, capacity))
+
+    def _allocate(self, capacity):
+        """分配镜像存储：每个样本同时写入 i 和 i+capacity，任意窗口都是连续切片"""
+        self.capacity = capacity
+        self._times = np.zeros(2 * capacity, dtype=np.float64)
+        self._values = np.zeros((2 * capacity, self.grid_count), dtype=np.float64)
+        self._tail = 0  # 最旧样本位置
+        self._size = 0  # 当前样本数
+
+    def _grow(self):
+        """容量不足时翻倍（保留现有窗口，均摊O(1)）"""
+        times, values = self.window()
+        times, values = times.copy(), values.copy()
+        self._allocate(self.capacity * 2)
+        n = len(times)
+        self._times[:n] = times
+        self._times[self.capacity:self.capacity + n] = times
+        self._values[:n] = values
+        self._values[self.capacity:self.capacity + n] = values
+        self._size = n
+
+    def __len__(self):
+        return self._size
+
+    def append(self, timestamp, values):
+        """追加一帧所有网格的亮度（不足网格数时补0）"""
+        if self._size == self.capacity:
+            self._grow()
+        pos = (self._tail + self._size) % self.capacity
+        mirror = pos + self.capacity
+        values = np.asarray(values, dtype=np.float64)[:self.grid_count]
+        n = len(values)
+        self._times[pos] = self._times[mirror] = timestamp
+        self._values[pos, :n] = values
+        self._values[pos, n:] = 0.0
+        self._values[mirror] = self._values[pos]
+        self._size += 1
+
+    def expire(self, now, duration):
+        """移除超过duration秒的旧样本（只移动尾指针）"""
+        while self._size and now - self._times[self._tail] > duration:
+            self._tail = (self._tail + 1) % self.capacity
+            self._size -= 1
+        if not self._size:
+            self._tail = 0
+
+    def clear(self):
+        self._tail = 0
+        self._size = 0
+
+    def window(self):
+        """当前窗口（时间戳向量, 样本×网格矩阵），均为只读视图"""
+        end = self._tail + self._size
+        times = self._times[self._tail:end]
+        values = self._values[self._tail:end]
+        times.flags.writeable = False
+        values.flags.writeable = False
+        return times, values
+
+    def grid_window(self, grid_idx):
+        """单个网格的亮度序列视图"""
+        return self.window()[1][:, grid_idx]
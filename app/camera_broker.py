@@ -0,0 +1,128 @@
+# camera_broker.py
+import threading
+from frame_grabber import LatestFrameGrabber, FRAME_WAIT_TIMEOUT
+import camera_discovery
+
+# 默认摄像头候选（优先外接摄像头1，不可用时回退到0）
+DEFAULT_CAMERA_CANDIDATES = (1, 0)
+CAM_WIDTH, CAM_HEIGHT = 1920, 1080
+CAM_FPS = 30
+
+
+class _SharedCamera:
+    """已打开的摄像头：一个VideoCapture + 一个抓帧线程 + 引用计数"""
+
+    def __init__(self, device_index, cap, profile=None):
+        self.device_index = device_index
+        self.cap = cap
+        self.profile = profile  # 实际使用的后端/编码/分辨率
+        self.grabber = LatestFrameGrabber(cap, name=f"camera{device_index}_grabber", read_only=True)
+        self.ref_count = 0
+
+
+class CameraLease:
+    """摄像头使用凭证：读取共享的最新帧（只读），用完调用 release()"""
+
+    def __init__(self, broker, shared):
+        self._broker = broker
+        self._shared = shared
+        self.device_index = shared.device_index
+        self.frames = shared.grabber.subscribe()
+        self.released = False
+
+    def read(self, timeout=FRAME_WAIT_TIMEOUT):
+        """返回最新 FramePacket（frame只读，需绘制时先 copy）；超时/失败返回 None"""
+        return self.frames.read(timeout)
+
+    @property
+    def failed(self):
+        return self.frames.failed
+
+    @property
+    def finished(self):
+        """实时摄像头没有结尾（与回放帧源接口一致）"""
+        return False
+
+    @property
+    def dropped_count(self):
+        return self.frames.dropped_count
+
+    def release(self):
+        """归还摄像头（最后一个使用者归还时关闭设备）"""
+        if not self.released:
+            self.released = True
+            self._broker._release(self._shared)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+
+class CameraBroker:
+    """进程级摄像头代理：每个设备只打开一次，由一个抓帧线程分发给所有使用者"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cameras = {}  # 设备号 -> _SharedCamera
+
+    def _open(self, candidates):
+        """按缓存配置或并行探测打开候选设备之一；全部不可用返回 None"""
+        cap, profile = camera_discovery.open_camera(candidates, CAM_WIDTH, CAM_HEIGHT, CAM_FPS)
+        if cap is None:
+            return None
+        shared = _SharedCamera(profile["device_index"], cap, profile)
+        shared.grabber.start()
+        return shared
+
+    def acquire(self, device_index=None):
+        """获取摄像头（device_index=None 按默认候选依次尝试）；全部不可用时返回 None"""
+        candidates = DEFAULT_CAMERA_CANDIDATES if device_index is None else (device_index,)
+        with self._lock:
+            shared = None
+            # 优先复用已打开且仍在工作的设备
+            for idx in candidates:
+                opened = self._cameras.get(idx)
+                if opened is not None and not opened.grabber.failed:
+                    shared = opened
+                    break
+            if shared is None:
+                for idx in candidates:
+                    stale = self._cameras.pop(idx, None)
+                    if stale is not None:
+                        self._close(stale)
+                shared = self._open(candidates)
+                if shared is not None:
+                    self._cameras[shared.device_index] = shared
+            if shared is None:
+                return None
+            shared.ref_count += 1
+            return CameraLease(self, shared)
+
+    def _release(self, shared):
+        with self._lock:
+            shared.ref_count -= 1
+            if shared.ref_count > 0:
+                return
+            if self._cameras.get(shared.device_index) is shared:
+                del self._cameras[shared.device_index]
+        self._close(shared)
+
+    def _close(self, shared):
+        shared.grabber.stop()
+        shared.cap.release()
+
+    def open_devices(self):
+        """当前打开的设备及引用数"""
+        with self._lock:
+            return {idx: cam.ref_count for idx, cam in self._cameras.items()}
+
+
+# 进程内唯一代理
+_broker = CameraBroker()
+
+
+def acquire_camera(device_index=None):
+    """获取共享摄像头（见 CameraBroker.acquire）"""
+    return _broker.acquire(device_index)
@@ -0,0 +1,224 @@
+# camera_discovery.py
+import os
+import sys
+import json
+import time
+import threading
+import cv2
+
+CURRENT_SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+# 已验证可用的摄像头配置（设备号/后端/编码/分辨率），下次启动直接按此打开
+CAMERA_PROFILE = os.environ.get("GRID_MONITOR_CAMERA_PROFILE", os.path.join(CURRENT_SCRIPT_DIR, "camera_profile.json"))
+
+PROBE_TIMEOUT = 4.0          # 单个设备探测（打开+设置+读到首帧）超时（秒）
+CACHED_OPEN_TIMEOUT = 2.0    # 按缓存配置打开的超时（超时/失败后重新探测）
+PREFERRED_FOURCC = "MJPG"    # 优先MJPG：USB摄像头1080p下通常只有MJPG能跑满帧率
+
+# 各平台依次尝试的后端（同一设备的后端串行尝试，不同设备并行探测）
+if sys.platform.startswith("win"):
+    PROBE_BACKENDS = ("DSHOW", "MSMF", "ANY")
+elif sys.platform == "darwin":
+    PROBE_BACKENDS = ("AVFOUNDATION", "ANY")
+else:
+    PROBE_BACKENDS = ("V4L2", "ANY")
+
+
+def _backend_id(name):
+    return getattr(cv2, f"CAP_{name}", cv2.CAP_ANY)
+
+
+def _fourcc_str(value):
+    value = int(value)
+    text = "".join(chr((value >> (8 * i)) & 0xFF) for i in range(4))
+    return text if text.isprintable() and text.strip() else ""
+
+
+def open_capture(device_index, backend, fourcc, width, height, fps):
+    """按指定后端/编码/分辨率打开设备并读到首帧；返回 (cap, 实际配置) 或 (None, None)
+
+    编码先于分辨率设置：部分驱动在切换编码时会重新协商分辨率。
+    """
+    start = time.monotonic()
+    cap = cv2.VideoCapture(device_index, _backend_id(backend))
+    if not cap.isOpened():
+        cap.release()
+        return None, None
+    if fourcc:
+        cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*fourcc))
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    cap.set(cv2.CAP_PROP_FPS, fps)
+    ret, frame = cap.read()
+    if not ret or frame is None:
+        cap.release()
+        return None, None
+    profile = {
+        "device_index": device_index,
+        "backend": backend,
+        "fourcc": _fourcc_str(cap.get(cv2.CAP_PROP_FOURCC)) or fourcc or "",
+        "width": frame.shape[1],
+        "height": frame.shape[0],
+        "fps": round(cap.get(cv2.CAP_PROP_FPS) or fps, 2),
+        "open_ms": round((time.monotonic() - start) * 1000, 1),
+        "probed_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    return cap, profile
+
+
+class _Probe:
+    """后台线程中打开设备（VideoCapture 打开无超时参数，卡住时由调用方放弃，线程结束后自行释放）"""
+
+    def __init__(self, device_index, attempts, timeout):
+        self.device_index = device_index
+        self.attempts = attempts        # [(backend, fourcc, width, height, fps), ...] 依次尝试
+        self.deadline = time.monotonic() + timeout
+        self._lock = threading.Lock()
+        self._abandoned = False
+        self.cap = None
+        self.profile = None
+        self.done = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"camera{device_index}_probe", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        try:
+            for backend, fourcc, width, height, fps in self.attempts:
+                if time.monotonic() > self.deadline:
+                    break
+                try:
+                    cap, profile = open_capture(self.device_index, backend, fourcc, width, height, fps)
+                except cv2.error:
+                    cap, profile = None, None
+                if cap is None:
+                    continue
+                with self._lock:
+                    if self._abandoned:
+                        cap.release()
+                    else:
+                        self.cap, self.profile = cap, profile
+                break
+        finally:
+            self.done.set()
+
+    def result(self):
+        """等待至截止时间，返回 (cap, profile)；超时/失败返回 (None, None) 并放弃本次探测"""
+        self.done.wait(max(0.0, self.deadline - time.monotonic()))
+        with self._lock:
+            if self.cap is not None:
+                return self.cap, self.profile
+            self._abandoned = True
+            return None, None
+
+    def abandon(self):
+        """不再需要该设备：已打开则释放，仍在打开的由线程结束时释放"""
+        with self._lock:
+            self._abandoned = True
+            cap, self.cap = self.cap, None
+        if cap is not None:
+            cap.release()
+
+
+def load_profiles(path=CAMERA_PROFILE):
+    """读取缓存的设备配置：{设备号(str): 配置}；文件不存在/损坏返回空字典"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data.get("devices", {}) if isinstance(data, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def save_profile(profile, path=CAMERA_PROFILE, remove_index=None):
+    """更新一个设备的缓存配置（先写临时文件再替换，多进程同时写入不会损坏文件）"""
+    devices = load_profiles(path)
+    if remove_index is not None:
+        devices.pop(str(remove_index), None)
+    if profile is not None:
+        devices[str(profile["device_index"])] = profile
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"devices": devices}, f, indent=2)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Camera profile not saved: {str(e)}")
+
+
+def _probe_attempts(width, height, fps):
+    attempts = []
+    for backend in PROBE_BACKENDS:
+        attempts.append((backend, PREFERRED_FOURCC, width, height, fps))
+    return attempts
+
+
+def discover_camera(candidates, width, height, fps, timeout=PROBE_TIMEOUT):
+    """并行探测候选设备，按候选顺序返回第一个可用的 (cap, profile)；全部不可用返回 (None, None)"""
+    probes = [_Probe(idx, _probe_attempts(width, height, fps), timeout).start() for idx in candidates]
+    chosen = (None, None)
+    for i, probe in enumerate(probes):
+        cap, profile = probe.result()
+        if cap is not None:
+            chosen = (cap, profile)
+            for other in probes[i + 1:]:
+                other.abandon()
+            break
+    return chosen
+
+
+def open_camera(candidates, width, height, fps, refresh=False, profile_path=CAMERA_PROFILE):
+    """打开摄像头：优先按缓存配置直接打开（毫秒级），失败再并行探测并更新缓存
+
+    candidates 为按优先级排列的设备号；返回 (cap, profile)，全部不可用返回 (None, None)。
+    排在有缓存设备之前、但没有缓存的设备先探测，保证优先级不因缓存而改变。
+    """
+    pending = list(candidates)
+    if not refresh:
+        profiles = load_profiles(profile_path)
+        pending = []    # 尚未尝试的更高优先级设备（无缓存或缓存已失效）
+        for idx in candidates:
+            cached = profiles.get(str(idx))
+            if not cached:
+                pending.append(idx)
+                continue
+            if pending:
+                cap, profile = discover_camera(pending, width, height, fps)
+                if cap is not None:
+                    save_profile(profile, profile_path)
+                    return cap, profile
+                pending = []
+            attempt = (cached["backend"], cached.get("fourcc", ""), cached["width"], cached["height"],
+                       cached.get("fps", fps))
+            cap, profile = _Probe(idx, [attempt], CACHED_OPEN_TIMEOUT).start().result()
+            if cap is not None:
+                return cap, profile
+            # 缓存已失效（设备更换/被占用），删除后与之后的设备一起重新探测
+            save_profile(None, profile_path, remove_index=idx)
+            pending.append(idx)
+
+    if not pending:
+        return None, None
+    cap, profile = discover_camera(pending, width, height, fps)
+    if cap is not None:
+        save_profile(profile, profile_path)
+    return cap, profile
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Probe cameras and refresh the cached camera profile")
+    parser.add_argument("devices", nargs="*", type=int, default=[1, 0], help="candidate device indices in order")
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--fps", type=float, default=30)
+    parser.add_argument("--cached", action="store_true", help="try the cached profile first")
+    args = parser.parse_args()
+    start = time.monotonic()
+    cap, profile = open_camera(args.devices, args.width, args.height, args.fps, refresh=not args.cached)
+    if cap is None:
+        print("No camera available")
+        sys.exit(1)
+    cap.release()
+    print(f"Opened in {(time.monotonic() - start) * 1000:.0f} ms: {json.dumps(profile, ensure_ascii=False)}")
@@ -0,0 +1,131 @@
+# charging_classifier.py
+import math
+import numpy as np
+
+# 状态枚举（英文）
+STATUS_NO_STATUS = "no_status"
+STATUS_CHARGING = "charging"
+STATUS_CHARGED = "charged"
+
+MIN_WINDOW_SAMPLES = 3  # 窗口样本数不足时不判定
+
+
+def window_statistics(values):
+    """一次计算窗口内所有网格的均值、波动比例和线性趋势斜率（values: 样本×网格）"""
+    values = np.asarray(values, dtype=np.float64)
+    n = values.shape[0]
+    means = values.mean(axis=0)
+    stds = values.std(axis=0)
+    # 波动比例 = 标准差 / 均值（均值为0时记为1.0）
+    stability = np.ones_like(means)
+    np.divide(stds, means, out=stability, where=means > 0)
+    # 最小二乘斜率：sum((x - x̄) * y) / sum((x - x̄)^2)
+    x_centered = np.arange(n, dtype=np.float64) - (n - 1) / 2.0
+    denom = float(x_centered @ x_centered)
+    slopes = (x_centered @ values) / denom if denom > 0 else np.zeros_like(means)
+    return means, stability, slopes
+
+
+def classify_window(values, bright_ratio, stability_threshold, min_samples=MIN_WINDOW_SAMPLES):
+    """批量判定所有网格充电状态，返回 (状态数组, 详情列表)"""
+    values = np.asarray(values, dtype=np.float64)
+    grid_count = values.shape[1]
+    if values.shape[0] < min_samples:
+        statuses = np.full(grid_count, STATUS_NO_STATUS, dtype=object)
+        return statuses, ["insufficient data (startup delay)"] * grid_count
+
+    means, stability, slopes = window_statistics(values)
+    return classify_statistics(means, stability, slopes, bright_ratio, stability_threshold)
+
+
+def classify_statistics(means, stability, slopes, bright_ratio, stability_threshold, with_details=True):
+    """根据均值/波动比例/趋势斜率判定状态，返回 (状态数组, 详情列表或None)"""
+    # 判定优先级：无状态（亮度低） > 充电完成（亮度稳定） > 充电中（亮度波动）
+    statuses = np.full(len(means), STATUS_CHARGING, dtype=object)
+    statuses[stability < stability_threshold] = STATUS_CHARGED
+    statuses[means < bright_ratio] = STATUS_NO_STATUS
+    if not with_details:
+        return statuses, None
+
+    details = []
+    for status, mean, ratio, slope in zip(statuses, means, stability, slopes):
+        if status == STATUS_NO_STATUS:
+            details.append(f"brightness below threshold (mean {mean:.4f} < {bright_ratio})")
+        elif status == STATUS_CHARGED:
+            details.append(f"steady light (brightness fluctuation {ratio:.4f} < 5%)")
+        else:
+            if slope > 0:
+                trend = "brightness rising"
+            elif slope < 0:
+                trend = "brightness falling"
+            else:
+                trend = "brightness fluctuating"
+            details.append(f"{trend} (fluctuation {ratio:.4f} ≥ 5%)")
+    return statuses, details
+
+
+class StreamingGridStats:
+    """逐帧增量更新的网格统计：按时间指数衰减的均值/方差/趋势（不保存样本）
+
+    前期样本按累计平均（Welford）更新，样本足够后转为时间常数为 time_constant 秒的EWMA；
+    趋势为亮度对时间的指数加权协方差 / 时间方差（即加权最小二乘斜率）。
+    """
+
+    def __init__(self, grid_count, time_constant, min_samples=MIN_WINDOW_SAMPLES):
+        self.grid_count = grid_count
+        self.time_constant = time_constant
+        self.min_samples = min_samples
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.mean = np.zeros(self.grid_count, dtype=np.float64)
+        self.var = np.zeros(self.grid_count, dtype=np.float64)
+        self.cov = np.zeros(self.grid_count, dtype=np.float64)  # 亮度-时间协方差
+        self.t_mean = 0.0
+        self.t_var = 0.0
+        self._t0 = None         # 时间原点（避免大时间戳损失精度）
+        self._last_time = None
+
+    def update(self, timestamp, values):
+        """用一帧所有网格的亮度更新统计（O(网格数)）"""
+        values = np.asarray(values, dtype=np.float64)[:self.grid_count]
+        if len(values) < self.grid_count:
+            values = np.pad(values, (0, self.grid_count - len(values)))
+        if self._t0 is None:
+            self._t0 = timestamp
+        t = timestamp - self._t0
+
+        self.count += 1
+        dt = t - self._last_time if self._last_time is not None else 0.0
+        self._last_time = t
+        # 衰减系数：取累计平均与时间衰减中较大者
+        alpha = 1.0 / self.count
+        if dt > 0:
+            alpha = max(alpha, 1.0 - math.exp(-dt / self.time_constant))
+
+        dt_mean = t - self.t_mean
+        dy = values - self.mean
+        self.t_mean += alpha * dt_mean
+        self.mean += alpha * dy
+        decay = 1.0 - alpha
+        self.var = decay * (self.var + alpha * dy * dy)
+        self.cov = decay * (self.cov + alpha * dt_mean * dy)
+        self.t_var = decay * (self.t_var + alpha * dt_mean * dt_mean)
+
+    def statistics(self):
+        """当前 (均值, 波动比例, 趋势斜率)"""
+        stds = np.sqrt(np.maximum(self.var, 0.0))
+        stability = np.ones_like(self.mean)
+        np.divide(stds, self.mean, out=stability, where=self.mean > 0)
+        slopes = self.cov / self.t_var if self.t_var > 0 else np.zeros_like(self.mean)
+        return self.mean, stability, slopes
+
+    def classify(self, bright_ratio, stability_threshold, with_details=True):
+        """按当前统计判定所有网格状态"""
+        if self.count < self.min_samples:
+            statuses = np.full(self.grid_count, STATUS_NO_STATUS, dtype=object)
+            details = ["insufficient data (startup delay)"] * self.grid_count if with_details else None
+            return statuses, details
+        means, stability, slopes = self.statistics()
+        return classify_statistics(means, stability, slopes, bright_ratio, stability_threshold, with_details)
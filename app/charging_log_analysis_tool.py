@@ -1,23 +1,149 @@
 # charging_log_analysis_tool.py
 import os
-import json
 import threading
 from datetime import datetime
 import tkinter as tk
 from tkinter import messagebox, filedialog, scrolledtext
+from segment_log import iter_log_entries, is_log_file, TimestampDecoder, local_seconds_to_datetime
+from segment_analysis import find_log_files, map_segments_cached
+
+GRID_COUNT = 20
+LOG_ENCODINGS = ['utf-8', 'gbk', 'gb2312', 'latin-1']
+SEGMENT_CACHE_FILE = ".charging_analysis.cache"  # 分段部分统计缓存（位于日志根目录）
+REQUIRED_FIELDS = ["timestamp", "grid_id", "status"]
+VALID_STATUS = ["no_status", "charging", "charged"]
+
+
+# ==============================================
+# 分段部分统计（每个分段独立解析，可在子进程中执行）
+# ==============================================
+class SegmentSummary:
+    """单个日志分段内各网格的充电部分统计；多个分段按记录时间合并即得全程统计（时间为本地时间秒数）
+
+    各网格保存最早/最晚记录的时间与状态，合并时按时间取值，分段时间范围重叠（多工位同时写入）也不受影响。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entry_count = 0
+        self.first_time = None                          # 分段内最早/最晚条目时间
+        self.last_time = None
+        self.record_counts = [0] * GRID_COUNT
+        self.initial_time = [None] * GRID_COUNT         # 分段内各网格最早/最晚记录时间及其状态
+        self.initial_status = [None] * GRID_COUNT
+        self.final_time = [None] * GRID_COUNT
+        self.final_status = [None] * GRID_COUNT
+        self.first_charging = [None] * GRID_COUNT       # 分段内首次 charging / charged 时间
+        self.first_complete = [None] * GRID_COUNT
+        self.has_fallback = [False] * GRID_COUNT        # 分段内出现 charged 之后的非 charged
+        self.last_not_charged = [None] * GRID_COUNT     # 分段内最后一条非 charged 的时间（判断跨分段回退）
+        self.debug_info = []
+
+    def fold(self, grid_records):
+        """累计各网格的记录 {网格: [(时间, 状态)]}（乱序时先按时间稳定排序）"""
+        for grid_idx, records in grid_records.items():
+            if not records:
+                continue
+            if any(records[i][0] < records[i - 1][0] for i in range(1, len(records))):
+                records.sort(key=lambda r: r[0])
+            completed_flag = False
+            for ts, status in records:
+                if status == "charging" and self.first_charging[grid_idx] is None:
+                    self.first_charging[grid_idx] = ts
+                if status == "charged":
+                    completed_flag = True
+                    if self.first_complete[grid_idx] is None:
+                        self.first_complete[grid_idx] = ts
+                else:
+                    self.last_not_charged[grid_idx] = ts
+                    if completed_flag:
+                        self.has_fallback[grid_idx] = True
+            self.record_counts[grid_idx] = len(records)
+            self.initial_time[grid_idx], self.initial_status[grid_idx] = records[0]
+            self.final_time[grid_idx], self.final_status[grid_idx] = records[-1]
+            self.entry_count += len(records)
+            if self.first_time is None or records[0][0] < self.first_time:
+                self.first_time = records[0][0]
+            if self.last_time is None or records[-1][0] > self.last_time:
+                self.last_time = records[-1][0]
+
+
+def _read_segment_records(file_path, encoding, debug_info):
+    """逐条读取分段，返回 {网格: [(时间, 状态)]}；无效条目记录到 debug_info 后跳过"""
+    grid_records = {}
+    decoder = TimestampDecoder()
+    for entry in iter_log_entries(file_path, encoding=encoding):
+        # 验证必填字段
+        if not isinstance(entry, dict) or not all(field in entry for field in REQUIRED_FIELDS):
+            debug_info.append(f"  - 缺少必填字段: {entry}")
+            continue
+
+        # 解析网格ID
+        try:
+            grid_idx = int(entry["grid_id"])
+        except (TypeError, ValueError):
+            debug_info.append(f"  - 无效网格ID: {entry['grid_id']}")
+            continue
+        if grid_idx < 0 or grid_idx >= GRID_COUNT:
+            debug_info.append(f"  - 网格ID超出范围: {grid_idx}")
+            continue
+
+        # 验证状态值
+        status = str(entry["status"]).strip()
+        if status not in VALID_STATUS:
+            debug_info.append(f"  - 无效状态值: {status} (grid {grid_idx})")
+            continue
+
+        # 解析时间戳（本地时间秒数；有 epoch 字段时不解析字符串）
+        try:
+            ts = decoder.decode(entry)
+        except (TypeError, ValueError):
+            debug_info.append(f"  - 无效时间戳: {entry['timestamp']}")
+            continue
+
+        grid_records.setdefault(grid_idx, []).append((ts, status))
+    return grid_records
+
+
+def parse_segment(file_path):
+    """解析单个充电日志分段（兼容多种编码，兼容JSON Lines/JSON数组），返回 SegmentSummary"""
+    summary = SegmentSummary(file_path)
+    if not os.path.isfile(file_path):
+        summary.debug_info.append(f"跳过非文件: {file_path}")
+        return summary
+
+    for enc in LOG_ENCODINGS:
+        entry_debug = []
+        try:
+            grid_records = _read_segment_records(file_path, enc, entry_debug)
+        except Exception as e:
+            summary.debug_info.append(f"  - 使用编码 {enc} 读取失败: {str(e)}")
+            continue
+        summary.debug_info.append(f"成功读取文件（编码:{enc}）: {file_path}")
+        summary.debug_info.extend(entry_debug)
+        summary.fold(grid_records)
+        summary.debug_info.append(f"  - 成功解析条目数: {summary.entry_count}")
+        return summary
+    summary.debug_info.append(f"读取失败（所有编码均不兼容）: {file_path}")
+    return summary
+
 
 # ==============================================
 # 充电分析核心逻辑（适配JSON日志，内部逻辑保持不变）
 # ==============================================
 class ChargingLogAnalyzer:
-    def __init__(self, log_root_dir):
+    def __init__(self, log_root_dir, workers=None, progress_callback=None, use_cache=True):
         self.log_root_dir = log_root_dir
+        self.use_cache = use_cache                  # 未变化的分段复用上次的解析结果
+        self.workers = workers                      # 并行解析进程数（None=CPU核数，1=不使用进程池）
+        self.progress_callback = progress_callback  # progress_callback(已解析分段数, 总分段数)
         self.grid_summary = {}
+        self.segments = []  # 各分段部分统计（SegmentSummary）
         self.debug_info = []  # 调试信息：找到的文件、解析的行数等
         # 初始化20个网格的统计结构
-        for idx in range(20):
+        for idx in range(GRID_COUNT):
             self.grid_summary[idx] = {
-                "records": [],                  # 所有记录 (timestamp_str, datetime_obj, status)
+                "record_count": 0,              # 解析记录数
                 "initial_status": "no_data",    # 初始状态
                 "final_status": "no_data",      # 最终状态
                 "first_charging_time": None,    # 首次充电中时间
@@ -27,134 +153,75 @@ class ChargingLogAnalyzer:
                 "is_initial_complete": False    # 初始状态即为充电完成（无充电过程）
             }
 
-    def _safe_read_json(self, file_path):
-        """安全读取JSON文件（兼容多种编码）"""
-        encodings = ['utf-8', 'gbk', 'gb2312', 'latin-1']
-        for enc in encodings:
-            try:
-                with open(file_path, 'r', encoding=enc) as f:
-                    return json.load(f), enc
-            except Exception as e:
-                self.debug_info.append(f"  - 使用编码 {enc} 读取失败: {str(e)}")
-                continue
-        return None, None
-
-    def _parse_single_json(self, file_path):
-        """解析单个JSON日志文件"""
-        if not os.path.isfile(file_path):
-            self.debug_info.append(f"跳过非文件: {file_path}")
-            return
-        
-        # 读取JSON文件
-        json_data, enc = self._safe_read_json(file_path)
-        if json_data is None:
-            self.debug_info.append(f"读取失败（所有编码均不兼容）: {file_path}")
-            return
-        self.debug_info.append(f"成功读取文件（编码:{enc}）: {file_path}")
-
-        if not isinstance(json_data, list):
-            self.debug_info.append(f"  - 无效JSON格式（非列表）: {file_path}")
-            return
-        
-        parsed_count = 0
-        for entry in json_data:
-            # 验证必填字段
-            required_fields = ["timestamp", "grid_id", "status"]
-            if not all(field in entry for field in required_fields):
-                self.debug_info.append(f"  - 缺少必填字段: {entry}")
-                continue
-            
-            # 解析网格ID
-            try:
-                grid_idx = int(entry["grid_id"])
-            except:
-                self.debug_info.append(f"  - 无效网格ID: {entry['grid_id']}")
-                continue
-            if grid_idx < 0 or grid_idx >= 20:
-                self.debug_info.append(f"  - 网格ID超出范围: {grid_idx}")
-                continue
-            
-            # 验证状态值
-            status = entry["status"].strip()
-            valid_status = ["no_status", "charging", "charged"]
-            if status not in valid_status:
-                self.debug_info.append(f"  - 无效状态值: {status} (grid {grid_idx})")
-                continue
-            
-            # 解析时间戳
-            try:
-                ts_obj = datetime.strptime(entry["timestamp"], "%Y-%m-%d %H:%M:%S")
-            except:
-                self.debug_info.append(f"  - 无效时间戳: {entry['timestamp']}")
-                continue
-            
-            self.grid_summary[grid_idx]["records"].append((entry["timestamp"], ts_obj, status))
-            parsed_count += 1
-        
-        self.debug_info.append(f"  - 成功解析条目数: {parsed_count}")
+    def _add_segment(self, summary):
+        """收集一个分段的部分统计（调试信息并入分析器）"""
+        self.debug_info.extend(summary.debug_info)
+        self.segments.append(summary)
 
     def _scan_all_log_files(self):
-        """递归扫描所有.json日志文件"""
+        """递归扫描所有日志文件（.jsonl/.json），各分段并行解析"""
         self.debug_info.append(f"\n开始扫描目录: {self.log_root_dir}")
-        log_files = []
-        for root_dir, _, files in os.walk(self.log_root_dir):
-            for fn in files:
-                if fn.lower().endswith(".json"):  # 从.log改为.json
-                    full_path = os.path.join(root_dir, fn)
-                    log_files.append(full_path)
-        self.debug_info.append(f"找到.json文件数量: {len(log_files)}")
+        log_files = find_log_files(self.log_root_dir, is_log_file)  # .jsonl（追加写格式）/ .json（旧版数组格式）
+        self.debug_info.append(f"找到日志文件数量: {len(log_files)}")
         self.debug_info.append(f"文件列表: {log_files}")
-        
-        # 解析每个文件
-        for fp in log_files:
-            self._parse_single_json(fp)
+
+        # 解析每个文件（结果按文件顺序返回，合并时再按时间排序；未变化的分段使用缓存）
+        cache_path = os.path.join(self.log_root_dir, SEGMENT_CACHE_FILE) if self.use_cache else None
+        summaries, cache_hits = map_segments_cached(parse_segment, log_files, SegmentSummary, cache_path,
+                                                    self.workers, self.progress_callback)
+        for summary in summaries:
+            self._add_segment(summary)
+        if self.use_cache:
+            self.debug_info.append(f"缓存命中分段: {cache_hits}, 重新解析分段: {len(log_files) - cache_hits}")
 
     def _compute_grid_stats(self):
-        """计算每个网格的充电统计数据"""
+        """按记录时间合并各分段的部分统计（分段时间范围可重叠），计算每个网格的充电统计数据"""
         self.debug_info.append("\n开始计算网格统计数据...")
+        # 时间相同时按 (首条时间, 路径) 顺序取先/后者，与逐条全局排序一致
+        segments = sorted((seg for seg in self.segments if seg.entry_count),
+                          key=lambda seg: (seg.first_time, seg.path))
+        for idx in range(GRID_COUNT):
+            parts = [seg for seg in segments if seg.record_counts[idx]]
+            if not parts:
+                continue
+            d = self.grid_summary[idx]
+            d["record_count"] = sum(seg.record_counts[idx] for seg in parts)
+            initial = min(parts, key=lambda seg: seg.initial_time[idx])
+            final = max(reversed(parts), key=lambda seg: seg.final_time[idx])
+            d["initial_status"] = initial.initial_status[idx]
+            d["final_status"] = final.final_status[idx]
+            first_charging = min((seg.first_charging[idx] for seg in parts if seg.first_charging[idx] is not None),
+                                 default=None)
+            first_complete = min((seg.first_complete[idx] for seg in parts if seg.first_complete[idx] is not None),
+                                 default=None)
+            if first_charging is not None:
+                d["first_charging_time"] = local_seconds_to_datetime(first_charging)
+            if first_complete is not None:
+                d["first_complete_time"] = local_seconds_to_datetime(first_complete)
+                # 回退异常：某分段内回退，或任一分段在首次充电完成之后出现非完成状态
+                d["has_fallback"] = any(
+                    seg.has_fallback[idx]
+                    or (seg.last_not_charged[idx] is not None and seg.last_not_charged[idx] > first_complete)
+                    for seg in parts
+                )
+
         total_records = 0
-        for idx in range(20):
+        for idx in range(GRID_COUNT):
             d = self.grid_summary[idx]
-            records = d["records"]
-            total_records += len(records)
-            if not records:
+            total_records += d["record_count"]
+            if not d["record_count"]:
                 self.debug_info.append(f"网格 {idx:02d}: 无解析记录")
                 continue
+            self.debug_info.append(f"网格 {idx:02d}: 初始状态={d['initial_status']}, 最终状态={d['final_status']}, 记录数={d['record_count']}")
 
-            # 按时间排序记录
-            records_sorted = sorted(records, key=lambda x: x[1])
-            d["records"] = records_sorted
-            d["initial_status"] = records_sorted[0][2]
-            d["final_status"] = records_sorted[-1][2]
-            self.debug_info.append(f"网格 {idx:02d}: 初始状态={d['initial_status']}, 最终状态={d['final_status']}, 记录数={len(records)}")
-
-            # 1. 查找首次充电中时间
-            for ts_str, ts_obj, status in records_sorted:
-                if status == "charging" and d["first_charging_time"] is None:
-                    d["first_charging_time"] = ts_obj
-
-            # 2. 查找首次充电完成时间
-            for ts_str, ts_obj, status in records_sorted:
-                if status == "charged" and d["first_complete_time"] is None:
-                    d["first_complete_time"] = ts_obj
-
-            # 3. 检查初始状态是否为充电完成
+            # 检查初始状态是否为充电完成
             if d["initial_status"] == "charged":
                 d["is_initial_complete"] = True
 
-            # 4. 计算充电耗时
+            # 计算充电耗时
             if d["first_charging_time"] and d["first_complete_time"]:
                 delta = d["first_complete_time"] - d["first_charging_time"]
                 d["cost_seconds"] = delta.total_seconds()
-
-            # 5. 检测回退异常（充电完成后变为非完成状态）
-            completed_flag = False
-            for _, _, status in records_sorted:
-                if status == "charged":
-                    completed_flag = True
-                if completed_flag and status != "charged":
-                    d["has_fallback"] = True
-                    break
         self.debug_info.append(f"总解析记录数: {total_records}")
 
     def analyze(self):
@@ -194,7 +261,7 @@ class ChargingLogAnalyzer:
 
         # 网格详情部分
         grid_part = []
-        for idx in range(20):
+        for idx in range(GRID_COUNT):
             d = self.grid_summary[idx]
             grid_title = f"Grid {idx:02d}"
             
@@ -283,13 +350,22 @@ def open_log_analyzer_window(parent_root):
         result_box.insert(tk.END, f"正在分析：{target_dir}\n\n请稍候...")
         result_box.config(state=tk.DISABLED)
 
+        last_percent = [-1]
+
+        def report_progress(done, total):
+            """解析进度（后台线程调用，按百分比节流后交给界面线程显示）"""
+            percent = done * 100 // total if total else 100
+            if percent != last_percent[0]:
+                last_percent[0] = percent
+                win.after(0, lambda: btn_start.config(text=f"分析中... {done}/{total} ({percent}%)"))
+
         def task():
             """后台分析任务"""
             error_msg = ""
             report_content = ""
             save_path = ""
             try:
-                analyzer = ChargingLogAnalyzer(target_dir)
+                analyzer = ChargingLogAnalyzer(target_dir, progress_callback=report_progress)
                 analyzer.analyze()
                 report_content = analyzer.generate_report()
                 save_path = analyzer.save_report()
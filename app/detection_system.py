@@ -7,13 +7,12 @@ import threading
 import tkinter as tk
 from tkinter import messagebox
 from PIL import Image, ImageTk
+from camera_broker import acquire_camera
 
 # ========== 配置项（统一管理，便于修改） ==========
 CURRENT_SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 HEARING_AID_BORDER_DATA = os.path.join(CURRENT_SCRIPT_DIR, "hearing_aid_border.json")
 CHARGING_CASE_BORDER_DATA = os.path.join(CURRENT_SCRIPT_DIR, "charging_case_border.json")
-CAMERA_WIDTH = 1920
-CAMERA_HEIGHT = 1080
 PREVIEW_WIDTH = 960
 PREVIEW_HEIGHT = 540
 MIN_CONTOUR_AREA = 5000  # 最小轮廓面积（过滤小噪点）
@@ -25,7 +24,7 @@ class DetectionSystem:
         self.root = root  # 主窗口对象
         self.is_running = False
         self.preview_win = None
-        self.cap = None
+        self.camera = None  # 共享摄像头凭证（与监控共用同一设备）
         self.video_label = None  # 保存Label引用，便于检查
         self.gui_lock = threading.Lock()  # 加锁保护GUI操作
         self.thread = None  # 保存线程引用，避免线程泄露
@@ -79,11 +78,11 @@ class DetectionSystem:
         if self.thread is not None and self.thread.is_alive():
             self.thread.join(timeout=2.0)
         
-        # 释放摄像头（加锁保护）
+        # 归还摄像头（加锁保护；最后一个使用者归还时才关闭设备）
         with self.gui_lock:
-            if self.cap is not None and self.cap.isOpened():
-                self.cap.release()
-                self.cap = None
+            if self.camera is not None:
+                self.camera.release()
+                self.camera = None
             
             # 销毁预览窗口（先检查是否存在，避免报错）
             if self.preview_win is not None:
@@ -111,19 +110,15 @@ class DetectionSystem:
         """工作线程：处理摄像头读取、绘制、标定逻辑"""
         # ========== 步骤1：前置检查（所有关键错误先检查，不创建窗口） ==========
         # 1.1 检查摄像头（核心错误，直接终止）
-        self.cap = cv2.VideoCapture(1)
-        camera_ok = False
-        if self.cap.isOpened():
-            camera_ok = True
-        else:
-            self.cap = cv2.VideoCapture(0)
-            if self.cap.isOpened():
-                camera_ok = True
-                # 主线程弹提示（线程安全）
-                self.root.after(0, lambda: messagebox.showinfo(
-                    "摄像头切换", 
-                    "摄像头1不可用，已自动切换到摄像头0"
-                ))
+        # 共享摄像头（摄像头1优先，回退到0；监控已打开时直接复用同一设备）
+        self.camera = acquire_camera()
+        camera_ok = self.camera is not None
+        if camera_ok and self.camera.device_index == 0:
+            # 主线程弹提示（线程安全）
+            self.root.after(0, lambda: messagebox.showinfo(
+                "摄像头切换", 
+                "摄像头1不可用，已自动切换到摄像头0"
+            ))
         
         if not camera_ok:
             self.root.after(0, lambda: messagebox.showerror(
@@ -179,10 +174,8 @@ class DetectionSystem:
         self.root.after(0, create_preview_win)
         time.sleep(0.2)  # 等待窗口创建完成（避免后续操作提前执行）
 
-        # 设置摄像头参数（提升画面质量）
-        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, CAMERA_WIDTH)
-        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, CAMERA_HEIGHT)
-        self.cap.set(cv2.CAP_PROP_FPS, 30)  # 设置帧率
+        # 摄像头参数（1920x1080@30fps）由共享摄像头统一设置；抓帧线程只保留最新帧
+        camera = self.camera
 
         # ========== 步骤3：帧循环（仅无前置错误时执行） ==========
         while True:
@@ -191,9 +184,11 @@ class DetectionSystem:
                 if not self.is_running:
                     break
 
-            ret, raw = self.cap.read()
+            packet = camera.read()
+            if packet is None and not camera.failed:
+                continue  # 等待超时，重新检查运行状态
             # 摄像头读取失败 → 清理资源并终止
-            if not ret: 
+            if packet is None:
                 self.root.after(0, lambda: messagebox.showerror(
                     "摄像头错误", 
                     "无法读取摄像头画面！请检查摄像头是否被占用"
@@ -201,8 +196,8 @@ class DetectionSystem:
                 self.clean_resources()
                 break
 
-            # 直接使用原始帧（移除透视变换）
-            frame = raw.copy()
+            # 直接使用原始帧（移除透视变换；共享帧只读，复制后再绘制）
+            frame = packet.frame.copy()
 
             if mode == "detect":
                 # 检测模式：自动标定助听器边框
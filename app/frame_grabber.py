@@ -0,0 +1,107 @@
+# frame_grabber.py
+import time
+import threading
+from collections import namedtuple
+
+# 帧数据包：图像、采集时间戳、采集序号（从1开始递增）
+FramePacket = namedtuple("FramePacket", ["frame", "timestamp", "seq"])
+
+FRAME_WAIT_TIMEOUT = 1.0  # 等待新帧超时（秒）
+
+
+class LatestFrameGrabber:
+    """独立线程持续抓帧，只保留最新一帧（避免驱动缓冲积压导致分析滞后）"""
+
+    def __init__(self, cap, name="FrameGrabber", read_only=False):
+        self.cap = cap
+        self.name = name
+        self.read_only = read_only  # 多个读取端共享同一帧时置为只读（零拷贝，需绘制的读取端自行复制）
+        self._cond = threading.Condition()
+        self._latest = None
+        self._running = False
+        self._thread = None
+        self.failed = False       # 读取失败（摄像头断开/被占用）
+        self.grabbed_count = 0    # 累计抓取帧数
+
+    def start(self):
+        """启动抓帧线程"""
+        if self._thread is not None and self._thread.is_alive():
+            return self
+        self._running = True
+        self.failed = False
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        """抓帧主循环：读到新帧即覆盖旧帧"""
+        while self._running:
+            ret, frame = self.cap.read()
+            timestamp = time.time()
+            with self._cond:
+                if not ret:
+                    self.failed = True
+                    self._running = False
+                    self._cond.notify_all()
+                    break
+                if self.read_only:
+                    frame.flags.writeable = False
+                self.grabbed_count += 1
+                self._latest = FramePacket(frame, timestamp, self.grabbed_count)
+                self._cond.notify_all()
+
+    def wait_newer(self, last_seq, timeout=FRAME_WAIT_TIMEOUT):
+        """等待比 last_seq 更新的帧；超时、失败或已停止时返回 None"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                latest = self._latest
+                if latest is not None and latest.seq > last_seq:
+                    return latest
+                if self.failed or not self._running:
+                    return None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+
+    def subscribe(self):
+        """创建一个读取端（各自统计消费/丢帧数）"""
+        return FrameSubscription(self)
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def stop(self, timeout=2.0):
+        """停止抓帧线程（不释放摄像头）"""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=timeout)
+        self._thread = None
+
+
+class FrameSubscription:
+    """抓帧线程的读取端：每次取最新帧，跳过的帧计入丢帧数"""
+
+    def __init__(self, grabber):
+        self.grabber = grabber
+        self.last_seq = 0
+        self.consumed_count = 0   # 已处理帧数
+        self.dropped_count = 0    # 处理不及被覆盖的帧数
+
+    def read(self, timeout=FRAME_WAIT_TIMEOUT):
+        """返回最新的 FramePacket；超时/失败返回 None"""
+        packet = self.grabber.wait_newer(self.last_seq, timeout)
+        if packet is None:
+            return None
+        if self.last_seq:
+            self.dropped_count += packet.seq - self.last_seq - 1
+        self.last_seq = packet.seq
+        self.consumed_count += 1
+        return packet
+
+    @property
+    def failed(self):
+        return self.grabber.failed
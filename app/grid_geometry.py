@@ -0,0 +1,124 @@
+# grid_geometry.py
+import cv2
+import numpy as np
+
+
+def build_grid_regions(monitor_type, border_rect):
+    """按设备类型生成网格区域列表 [(x1, y1, x2, y2, index), ...]（基于原始帧边框）"""
+    grid_regions = []
+    x, y, w, h = border_rect
+    index = 0
+
+    if monitor_type == "hearing_aid":
+        # 助听器：4行14列 = 56格
+        y_off = int(h * 0.05)
+        ys, ye, nh = y + y_off, y + h - y_off, h - 2 * y_off
+        gw, xs = w / 14, int(x + (w / 14) / 2)
+        for row in range(4):
+            row_y1 = int(ys + row * (nh / 4))
+            row_y2 = int(ys + (row + 1) * (nh / 4))
+            for col in range(14):
+                col_x1 = int(xs + col * gw)
+                col_x2 = int(xs + (col + 1) * gw)
+                grid_regions.append((col_x1, row_y1, col_x2, row_y2, index))
+                index += 1
+
+    elif monitor_type == "charging_case":
+        # 充电盒：4行5列 = 20格
+        gw = w / 5    # 列宽 = 总宽度 / 5
+        gh = h / 4    # 行高 = 总高度 / 4
+        for row in range(4):
+            row_y1 = int(y + row * gh)
+            row_y2 = int(y + (row + 1) * gh)
+            for col in range(5):
+                col_x1 = int(x + col * gw)
+                col_x2 = int(x + (col + 1) * gw)
+                grid_regions.append((col_x1, row_y1, col_x2, row_y2, index))
+                index += 1
+
+    return grid_regions
+
+
+def grid_line_segments(monitor_type, border_rect):
+    """网格线段列表 [((x1, y1), (x2, y2)), ...] 及颜色（BGR，基于原始帧坐标）"""
+    x, y, w, h = border_rect
+    segments = []
+    if monitor_type == "hearing_aid":
+        # 助听器网格线：4行14列
+        y_off = int(h * 0.05)
+        ys, ye, nh = y + y_off, y + h - y_off, h - 2 * y_off
+        gw, xs = w / 14, int(x + (w / 14) / 2)
+        for i in range(14):
+            cx = int(xs + i * gw)
+            segments.append(((cx, ys), (cx, ye)))
+        for i in range(5):
+            cy = int(ys + i * (nh / 4))
+            segments.append(((xs, cy), (int(xs + 13 * gw), cy)))
+        return segments, (255, 0, 255)
+    if monitor_type == "charging_case":
+        # 充电盒网格线：4行5列（竖线6条，横线5条）
+        gw = w / 5
+        gh = h / 4
+        for i in range(6):
+            segments.append(((int(x + i * gw), y), (int(x + i * gw), y + h)))
+        for i in range(5):
+            segments.append(((x, int(y + i * gh)), (x + w, int(y + i * gh))))
+        return segments, (255, 255, 255)
+    return segments, (255, 255, 255)
+
+
+class GridGeometry:
+    """预计算的网格几何信息：基于积分图一次性算出所有网格的亮像素数和亮度比例"""
+
+    def __init__(self, grid_regions, margin=0):
+        rects = np.array([r[:4] for r in grid_regions], dtype=np.int64).reshape(-1, 4)
+        self.indices = np.array([r[4] for r in grid_regions], dtype=np.int64)
+        self.grid_count = len(grid_regions)
+        self.x1, self.y1, self.x2, self.y2 = rects.T
+        # 分析区域：所有网格外接矩形 + 边距（模糊/膨胀核半径）
+        if self.grid_count:
+            self.roi_rect = (
+                int(self.x1.min()) - margin, int(self.y1.min()) - margin,
+                int(self.x2.max()) + margin, int(self.y2.max()) + margin
+            )
+        else:
+            self.roi_rect = None
+        self._local_key = None    # (ROI起点, ROI尺寸)，变化时重算局部坐标
+        self._local = None
+
+    def clip_roi(self, frame_shape):
+        """将分析区域裁剪到帧范围内，返回 (x1, y1, x2, y2)"""
+        frame_h, frame_w = frame_shape[:2]
+        if self.roi_rect is None:
+            return 0, 0, frame_w, frame_h
+        rx1, ry1, rx2, ry2 = self.roi_rect
+        return max(0, rx1), max(0, ry1), min(frame_w, rx2), min(frame_h, ry2)
+
+    def _local_coords(self, origin, shape):
+        """网格坐标换算到ROI坐标系（与切片语义一致：越界截断，反向为空）"""
+        key = (origin, shape[:2])
+        if key != self._local_key:
+            ox, oy = origin
+            roi_h, roi_w = shape[:2]
+            lx1 = np.clip(self.x1 - ox, 0, roi_w)
+            ly1 = np.clip(self.y1 - oy, 0, roi_h)
+            lx2 = np.maximum(np.clip(self.x2 - ox, 0, roi_w), lx1)
+            ly2 = np.maximum(np.clip(self.y2 - oy, 0, roi_h), ly1)
+            areas = (lx2 - lx1) * (ly2 - ly1)
+            self._local = (lx1, ly1, lx2, ly2, areas)
+            self._local_key = key
+        return self._local
+
+    def count_bright(self, binary, origin=(0, 0)):
+        """一次积分图计算所有网格的非零像素数（binary为0/255二值图）"""
+        lx1, ly1, lx2, ly2, areas = self._local_coords(origin, binary.shape)
+        integral = cv2.integral(binary)
+        sums = integral[ly2, lx2] - integral[ly1, lx2] - integral[ly2, lx1] + integral[ly1, lx1]
+        return sums // 255, areas
+
+    def bright_ratios(self, binary, origin=(0, 0)):
+        """所有网格的亮像素比例（空网格为0）"""
+        counts, areas = self.count_bright(binary, origin)
+        ratios = np.zeros(self.grid_count, dtype=np.float64)
+        np.divide(counts, areas, out=ratios, where=areas > 0)
+        return ratios
@@ -3,11 +3,21 @@ import numpy as np
 import json
 import os
 import time
+import queue
 import threading
-from tkinter import Toplevel, Label, Button
-import tkinter as tk
-import tkinter.messagebox as messagebox
-from PIL import Image, ImageTk
+import logging
+from brightness_cache import BrightnessRingBuffer
+from charging_classifier import classify_window, StreamingGridStats, STATUS_NO_STATUS, STATUS_CHARGING, STATUS_CHARGED
+from camera_broker import acquire_camera
+from grid_geometry import GridGeometry, build_grid_regions
+from overlay_renderer import OverlayRenderer
+from segment_log import (AsyncLogWriter, SEGMENT_LOG_EXT, LOG_TIMESTAMP_FORMAT, LOG_EPOCH_FIELD,
+                         LOG_QUEUE_SIZE, LOG_BATCH_SIZE, LOG_FLUSH_INTERVAL, LOG_FSYNC_POLICY)
+from replay_source import ReplaySource, REPLAY_MAX_SPEED
+import metrics_server
+from stage_metrics import (StageMetrics, format_hud_lines, STAGE_CAPTURE_WAIT, STAGE_PREPROCESS,
+                           STAGE_GRID_COUNT, STAGE_CACHE, STAGE_LOGGING, STAGE_ANALYSIS,
+                           STAGE_OVERLAY, STAGE_DISPLAY)
 
 # 配置常量（删除 PARAMS_FILE 透视参数文件）
 CURRENT_SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -17,12 +27,18 @@ CHARGING_CASE_BORDER_DATA = os.path.join(CURRENT_SCRIPT_DIR, "charging_case_bord
 HEARING_AID_BRIGHTNESS_ROOT_DIR = "hearing_aid_brightness_log"
 CHARGING_BRIGHTNESS_ROOT_DIR = "brightness_logs"  # 充电盒亮度日志根文件夹
 CHARGING_ROOT_DIR = "charging_log"               # 充电盒状态日志根文件夹
+METRICS_ROOT_DIR = "monitor_metrics"             # 各阶段耗时/帧率统计根文件夹
+REPLAY_DIR_SUFFIX = "replay"  # 回放日志子目录后缀（同一录像每次回放写入新的 <时间>_replay<N>，不追加到上次的日志）
 CAM_WIDTH, CAM_HEIGHT = 1920, 1080  # 原始帧尺寸（替代透视后的size）
+PREVIEW_SIZE = (880, 520)  # 监控窗口预览尺寸（标注直接在预览分辨率上绘制）
 
 # 亮度检测配置（通用）
 BRIGHT_THRESHOLD = 35
 BRIGHT_PIXEL_RATIO = 0.001  # 助听器异常判定阈值：超过此比例视为亮（异常）
+BLUR_KERNEL_SIZE = (5, 5)
 DILATE_KERNEL_SIZE = (5, 5)
+# ROI边距：高斯模糊+膨胀的影响半径，保证裁剪后网格内像素结果与整帧处理一致
+ROI_MARGIN = max(BLUR_KERNEL_SIZE) // 2 + max(DILATE_KERNEL_SIZE) // 2
 
 # 充电盒逐格分析配置
 ANALYSIS_INTERVAL = 4    # 每4秒分析一次
@@ -32,34 +48,106 @@ START_DELAY = 5          # 启动后延迟5秒再开始检测分析
 GRID_COUNT_CHARGING = 20 # 充电盒总网格数（4行5列=20格）
 GRID_COUNT_HEARING_AID = 56 # 助听器总网格数（4行14列=56格）
 
-# 状态枚举（英文）
-STATUS_NO_STATUS = "no_status"
-STATUS_CHARGING = "charging"
-STATUS_CHARGED = "charged"
+# 充电盒状态判定引擎：window=4秒窗口统计；streaming=逐帧增量统计（不保存样本）；compare=两者并行并报告差异
+STATUS_ENGINE_WINDOW = "window"
+STATUS_ENGINE_STREAMING = "streaming"
+STATUS_ENGINE_COMPARE = "compare"
+STATUS_ENGINE = STATUS_ENGINE_WINDOW
+STREAMING_TIME_CONSTANT = CACHE_DURATION / 2  # 流式统计时间常数（秒），与4秒窗口的平均样本年龄相当
+
+# 日志流名称
+LOG_STREAM_BRIGHTNESS = "brightness"
+LOG_STREAM_STATUS = "status"
+LOG_STREAM_METRICS = "metrics"
+LOG_WRITE_EPOCH = True      # 日志条目附带整数Unix时间（epoch字段），分析工具据此跳过时间字符串解析
+
+# 性能统计配置
+METRICS_DUMP_INTERVAL = 10  # 统计快照写入间隔（秒，0=不写入）
+SHOW_METRICS_HUD = False    # 监控窗口默认是否显示统计HUD
+
+# 无界面模式（多工位工作进程等）下的提示信息输出
+logger = logging.getLogger("grid_monitor")
 
 class GridMonitor:
-    def __init__(self, root, monitor_type):
-        self.root = root
+    def __init__(self, root, monitor_type, status_engine=STATUS_ENGINE,
+                 camera_index=None, border_file=None, station_id=None, result_callback=None,
+                 frame_source=None, log_dir="", grid_regions=None):
+        self.root = root  # Tk根窗口；None 表示无界面运行（提示信息写入logging）
         self.monitor_type = monitor_type
         self.is_running = False
-        self.cap = None
+        self.camera = None  # 共享摄像头凭证（进程内多个监控/预览共用同一设备）
+        self.camera_index = camera_index  # None=默认（摄像头1优先，回退0）
+        self.frame_source = frame_source  # 外部帧源（如 ReplaySource 离线回放），替代摄像头
+        self.log_dir = log_dir  # 日志根目录所在位置（默认当前工作目录）
+        # 边框配置文件（默认按设备类型）
+        if border_file is None:
+            border_file = HEARING_AID_BORDER_DATA if monitor_type == "hearing_aid" else CHARGING_CASE_BORDER_DATA
+        self.border_file = border_file
+        self.station_id = station_id            # 多工位模式下的工位名（区分日志目录）
+        self.result_callback = result_callback  # 每帧结果回调 callback(monitor, bright_grids, grid_brightness)
+        self.frame_count = 0
+        # 各阶段耗时/帧率统计（HUD显示、定期写入统计文件）
+        self.metrics = StageMetrics()
+        self._cache_update_seconds = 0.0  # 本帧缓存追加/流式更新耗时（与过期清理合并记录）
+        self.show_hud = SHOW_METRICS_HUD
+        self._last_metrics_dump = time.monotonic()
+        # 最近一帧结果（指标服务线程只读取引用，采集线程每帧整体替换）
+        self.last_grid_brightness = None
+        self.last_bright_count = 0
         # 核心修改1：删除透视变换相关变量（self.M/self.size）
         self.border_rect = None
+        # 自定义网格区域 [(x1, y1, x2, y2, index), ...]（如合成托盘压力测试）；None=按设备类型由边框生成
+        self.custom_grid_regions = list(grid_regions) if grid_regions else None
+        self.grid_count = len(self.custom_grid_regions) if self.custom_grid_regions else (
+            GRID_COUNT_HEARING_AID if monitor_type == "hearing_aid" else GRID_COUNT_CHARGING)
         self.grid_regions = []
+        self.roi_rect = None  # 分析区域 (x1, y1, x2, y2)：网格外接矩形+边距
+        self.grid_geometry = None  # 预计算网格几何（向量化计数）
+        self.overlay = None  # 网格标注绘制（缓存网格线图层）
         self.monitor_win = None
+        # 界面交互：采集线程不直接调用Tk，帧通过单槽位邮箱、提示通过队列交给界面线程
+        self.frame_mailbox = None
+        self.frame_view = None
+        self._ui_calls = queue.SimpleQueue()
+        self._worker_done = False
         
         # 重启时间戳（通用）
-        self.restart_timestamp = time.strftime("%Y%m%d_%H%M%S", time.localtime())
-        self.start_time = 0  # 程序启动时间
+        # 回放时取录像开始时间，日志目录与实时运行一致
+        restart_time = getattr(frame_source, "start_time", None)
+        self.restart_timestamp = time.strftime("%Y%m%d_%H%M%S", time.localtime(restart_time))
+        # 本次重启的日志子目录名（多工位同时启动时追加工位名，避免写入同一文件）
+        self.restart_dir_name = f"{self.restart_timestamp}_{station_id}" if station_id else self.restart_timestamp
+        if frame_source is not None:
+            self.restart_dir_name = self._next_replay_dir_name(self.restart_dir_name)
+        self.start_time = 0  # 程序启动时间（首帧时间戳）
         self.last_analysis_time = 0  # 上次分析时间戳
+        self.frame_time = None  # 当前帧时间戳（实时=采集时间，回放=合成时间），日志/缓存/分析均按此时间
+        # 分段日志后台写入线程（JSON Lines追加写，按10分钟分段滚动）
+        self.log_writer = AsyncLogWriter(
+            max_queue=LOG_QUEUE_SIZE, batch_size=LOG_BATCH_SIZE,
+            flush_interval=LOG_FLUSH_INTERVAL, fsync_policy=LOG_FSYNC_POLICY,
+            on_error=self._on_log_write_error,
+            block_on_full=frame_source is not None  # 回放不丢日志：写入跟不上时降速等待
+        )
+        self._log_error_reported = False
         
+        # 状态判定引擎（仅充电盒有状态分析）
+        if status_engine not in (STATUS_ENGINE_WINDOW, STATUS_ENGINE_STREAMING, STATUS_ENGINE_COMPARE):
+            raise ValueError(f"Unknown status engine: {status_engine}")
+        self.status_engine = status_engine if self.monitor_type == "charging_case" else STATUS_ENGINE_WINDOW
+        self.streaming_stats = None
+        self.current_statuses = None    # 最近一次判定的各网格状态
+        self.engine_mismatch_count = 0  # 对比模式下累计的判定差异数
+
         # 按设备类型初始化缓存和目录
         if self.monitor_type == "charging_case":
-            self.grid_brightness_cache = [[] for _ in range(GRID_COUNT_CHARGING)]
+            self.grid_brightness_cache = BrightnessRingBuffer(self.grid_count)
+            if self.status_engine != STATUS_ENGINE_WINDOW:
+                self.streaming_stats = StreamingGridStats(self.grid_count, STREAMING_TIME_CONSTANT)
             self._create_root_dirs()
             self._create_restart_subdirs()
         elif self.monitor_type == "hearing_aid":
-            self.grid_brightness_cache = [[] for _ in range(GRID_COUNT_HEARING_AID)]
+            self.grid_brightness_cache = BrightnessRingBuffer(self.grid_count)
             self._create_root_dirs()
             self._create_restart_subdirs()
 
@@ -67,33 +155,78 @@ class GridMonitor:
         """创建根目录（区分设备类型）"""
         try:
             if self.monitor_type == "hearing_aid":
-                os.makedirs(HEARING_AID_BRIGHTNESS_ROOT_DIR, exist_ok=True)
+                os.makedirs(os.path.join(self.log_dir, HEARING_AID_BRIGHTNESS_ROOT_DIR), exist_ok=True)
             else:  # charging_case
-                os.makedirs(CHARGING_BRIGHTNESS_ROOT_DIR, exist_ok=True)
-                os.makedirs(CHARGING_ROOT_DIR, exist_ok=True)
+                os.makedirs(os.path.join(self.log_dir, CHARGING_BRIGHTNESS_ROOT_DIR), exist_ok=True)
+                os.makedirs(os.path.join(self.log_dir, CHARGING_ROOT_DIR), exist_ok=True)
         except Exception as e:
-            messagebox.showerror("Dir Create Failed", f"Root dir create failed: {str(e)}")
+            self._notify_error("Dir Create Failed", f"Root dir create failed: {str(e)}")
+
+    def _log_root_dirs(self):
+        """本设备类型写入的日志根目录"""
+        if self.monitor_type == "hearing_aid":
+            return HEARING_AID_BRIGHTNESS_ROOT_DIR, METRICS_ROOT_DIR
+        return CHARGING_BRIGHTNESS_ROOT_DIR, CHARGING_ROOT_DIR, METRICS_ROOT_DIR
+
+    def _next_replay_dir_name(self, base_name):
+        """回放日志子目录名：各日志根目录下都未使用的 <base_name>_replay<N>"""
+        run = 1
+        while any(os.path.exists(os.path.join(self.log_dir, root_dir, f"{base_name}_{REPLAY_DIR_SUFFIX}{run}"))
+                  for root_dir in self._log_root_dirs()):
+            run += 1
+        return f"{base_name}_{REPLAY_DIR_SUFFIX}{run}"
 
     def _create_restart_subdirs(self):
         """创建本次重启的子目录（区分设备类型）"""
         try:
             if self.monitor_type == "hearing_aid":
                 # 助听器：hearing_aid_brightness_log/restart_timestamp/
-                restart_dir = os.path.join(HEARING_AID_BRIGHTNESS_ROOT_DIR, self.restart_timestamp)
+                restart_dir = os.path.join(self.log_dir, HEARING_AID_BRIGHTNESS_ROOT_DIR, self.restart_dir_name)
                 os.makedirs(restart_dir, exist_ok=True)
             else:  # charging_case
                 # 充电盒亮度日志子目录
-                brightness_restart_dir = os.path.join(CHARGING_BRIGHTNESS_ROOT_DIR, self.restart_timestamp)
+                brightness_restart_dir = os.path.join(self.log_dir, CHARGING_BRIGHTNESS_ROOT_DIR, self.restart_dir_name)
                 # 充电盒状态日志子目录
-                charging_restart_dir = os.path.join(CHARGING_ROOT_DIR, self.restart_timestamp)
+                charging_restart_dir = os.path.join(self.log_dir, CHARGING_ROOT_DIR, self.restart_dir_name)
                 os.makedirs(brightness_restart_dir, exist_ok=True)
                 os.makedirs(charging_restart_dir, exist_ok=True)
         except Exception as e:
-            messagebox.showerror("Dir Create Failed", f"Restart subdir create failed: {str(e)}")
+            self._notify_error("Dir Create Failed", f"Restart subdir create failed: {str(e)}")
+
+    def _post_ui(self, func):
+        """在界面线程执行 func（当前即界面线程时直接执行，否则排队等待界面线程取出）"""
+        if self.root is None:
+            return
+        if threading.current_thread() is threading.main_thread():
+            func()
+        else:
+            self._ui_calls.put(func)
+
+    def _notify_error(self, title, msg):
+        """错误提示：有界面时弹窗，无界面时写入日志"""
+        if self.root is None:
+            logger.error("%s: %s", title, msg)
+        else:
+            # Tk 只在有界面时导入（无界面运行不依赖 tkinter）
+            import tkinter.messagebox as messagebox
+            self._post_ui(lambda: messagebox.showerror(title, msg))
+
+    def _on_log_write_error(self, exc):
+        """日志写入失败回调（写入线程调用）：首次按错误提示（弹窗/错误日志），之后只记警告日志"""
+        if self._log_error_reported:
+            logger.warning("Log write failed: %s", exc)
+            return
+        self._log_error_reported = True
+        msg = f"Hearing aid brightness log save failed: {str(exc)}" if self.monitor_type == "hearing_aid" else f"Log save failed: {str(exc)}"
+        self._notify_error("Log Write Failed", msg)
+
+    def _now(self):
+        """当前帧时间（未处理帧时为系统时间）"""
+        return self.frame_time if self.frame_time is not None else time.time()
 
     def _get_10min_segment(self):
         """获取当前10分钟分段ID（YYYYMMDD_HHMM_HHMM）"""
-        now = time.localtime()
+        now = time.localtime(self._now())
         year, month, day = now.tm_year, now.tm_mon, now.tm_mday
         hour, minute = now.tm_hour, now.tm_min
 
@@ -123,13 +256,13 @@ class GridMonitor:
         """获取当前10分钟日志文件名（区分设备类型）"""
         segment = self._get_10min_segment()
         if self.monitor_type == "hearing_aid":
-            # 助听器路径：hearing_aid_brightness_log/restart_timestamp/10min_segment.json
-            restart_dir = os.path.join(HEARING_AID_BRIGHTNESS_ROOT_DIR, self.restart_timestamp)
-            return os.path.join(restart_dir, f"{segment}.json")
+            # 助听器路径：hearing_aid_brightness_log/restart_timestamp/10min_segment.jsonl
+            restart_dir = os.path.join(self.log_dir, HEARING_AID_BRIGHTNESS_ROOT_DIR, self.restart_dir_name)
+            return os.path.join(restart_dir, f"{segment}{SEGMENT_LOG_EXT}")
         elif self.monitor_type == "charging_case":
             # 充电盒亮度日志路径
-            restart_dir = os.path.join(CHARGING_BRIGHTNESS_ROOT_DIR, self.restart_timestamp)
-            return os.path.join(restart_dir, f"{segment}.json")
+            restart_dir = os.path.join(self.log_dir, CHARGING_BRIGHTNESS_ROOT_DIR, self.restart_dir_name)
+            return os.path.join(restart_dir, f"{segment}{SEGMENT_LOG_EXT}")
         return ""
 
     def get_charging_status_filename(self):
@@ -137,13 +270,13 @@ class GridMonitor:
         if self.monitor_type != "charging_case":
             return ""
         segment = self._get_10min_segment()
-        restart_dir = os.path.join(CHARGING_ROOT_DIR, self.restart_timestamp)
-        return os.path.join(restart_dir, f"{segment}.json")
+        restart_dir = os.path.join(self.log_dir, CHARGING_ROOT_DIR, self.restart_dir_name)
+        return os.path.join(restart_dir, f"{segment}{SEGMENT_LOG_EXT}")
 
     def load_config(self):
         """核心修改2：删除透视参数加载，仅保留边框配置加载"""
         # 加载对应设备的边框配置
-        border_file = HEARING_AID_BORDER_DATA if self.monitor_type == "hearing_aid" else CHARGING_CASE_BORDER_DATA
+        border_file = self.border_file
         if os.path.exists(border_file):
             with open(border_file, 'r') as f:
                 d = json.load(f)
@@ -152,95 +285,70 @@ class GridMonitor:
             raise Exception(f"Border config file not found for {self.monitor_type}: {border_file}")
 
     def init_grid_regions(self):
-        """初始化网格区域（区分设备类型，适配原始帧尺寸）"""
-        self.grid_regions.clear()
-        x, y, w, h = self.border_rect
-        index = 0
-
-        if self.monitor_type == "hearing_aid":
-            # 助听器：4行14列 = 56格（逻辑不变，基于原始帧边框）
-            y_off = int(h * 0.05)
-            ys, ye, nh = y + y_off, y + h - y_off, h - 2 * y_off
-            gw, xs = w / 14, int(x + (w / 14) / 2)
-            for row in range(4):
-                row_y1 = int(ys + row * (nh / 4))
-                row_y2 = int(ys + (row + 1) * (nh / 4))
-                for col in range(14):
-                    col_x1 = int(xs + col * gw)
-                    col_x2 = int(xs + (col + 1) * gw)
-                    self.grid_regions.append((col_x1, row_y1, col_x2, row_y2, index))
-                    index += 1
-
-        elif self.monitor_type == "charging_case":
-            # 充电盒：4行5列 = 20格（逻辑不变，基于原始帧边框）
-            gw = w / 5    # 列宽 = 总宽度 / 5
-            gh = h / 4    # 行高 = 总高度 / 4
-            for row in range(4):
-                row_y1 = int(y + row * gh)
-                row_y2 = int(y + (row + 1) * gh)
-                for col in range(5):
-                    col_x1 = int(x + col * gw)
-                    col_x2 = int(x + (col + 1) * gw)
-                    self.grid_regions.append((col_x1, row_y1, col_x2, row_y2, index))
-                    index += 1
+        """初始化网格区域和预计算几何（区分设备类型，适配原始帧尺寸）"""
+        if self.custom_grid_regions:
+            self.grid_regions = self.custom_grid_regions
+        else:
+            self.grid_regions = build_grid_regions(self.monitor_type, self.border_rect)
+        # 分析区域：所有网格的外接矩形（助听器网格右侧会超出边框半格）+ 核边距
+        self.grid_geometry = GridGeometry(self.grid_regions, margin=ROI_MARGIN)
+        self.roi_rect = self.grid_geometry.roi_rect
+        self.overlay = OverlayRenderer(self.monitor_type, self.border_rect, self.grid_regions)
 
     def calculate_grid_bright(self, frame):
-        """计算网格亮度（通用逻辑，适配原始帧）"""
-        bright_grids = []  # 异常网格（助听器）/亮网格（充电盒）
-        grid_brightness = []
-        frame_gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        frame_gray = cv2.GaussianBlur(frame_gray, (5, 5), 0)
+        """计算网格亮度（仅处理网格所在ROI，返回的二值图为ROI坐标系）"""
+        t0 = time.perf_counter()
+        # 先裁剪到ROI再做灰度/模糊/膨胀/二值化（充电盒约占整帧1/3）
+        rx1, ry1, rx2, ry2 = self.grid_geometry.clip_roi(frame.shape)
+        frame_roi = frame[ry1:ry2, rx1:rx2]
+        frame_gray = cv2.cvtColor(frame_roi, cv2.COLOR_BGR2GRAY)
+        frame_gray = cv2.GaussianBlur(frame_gray, BLUR_KERNEL_SIZE, 0)
 
         # 膨胀增强亮斑
         kernel = np.ones(DILATE_KERNEL_SIZE, np.uint8)
         frame_gray = cv2.dilate(frame_gray, kernel, iterations=1)
 
         _, frame_binary = cv2.threshold(frame_gray, BRIGHT_THRESHOLD, 255, cv2.THRESH_BINARY)
-
-        for (x1, y1, x2, y2, idx) in self.grid_regions:
-            grid_dilated = frame_binary[y1:y2, x1:x2]
-            total_pixels = grid_dilated.size
-            if total_pixels == 0:
-                grid_brightness.append(0)
-                continue
-
-            bright_pixels = np.count_nonzero(grid_dilated)
-            bright_ratio = bright_pixels / total_pixels
-            grid_brightness.append(bright_ratio)
-
-            # 判定逻辑：助听器（亮=异常）、充电盒（亮=正常亮格）
-            if bright_ratio >= BRIGHT_PIXEL_RATIO:
-                bright_grids.append(idx)
-
-        # 更新缓存（通用）
-        current_time = time.time()
-        grid_count = GRID_COUNT_HEARING_AID if self.monitor_type == "hearing_aid" else GRID_COUNT_CHARGING
-        for grid_idx in range(grid_count):
-            brightness = grid_brightness[grid_idx] if grid_idx < len(grid_brightness) else 0.0
-            self.grid_brightness_cache[grid_idx].append((current_time, brightness))
+        t1 = time.perf_counter()
+        self.metrics.record(STAGE_PREPROCESS, t1 - t0)
+
+        # 一次积分图得到所有网格的亮像素比例（NumPy数组，按网格序号排列）
+        grid_brightness = self.grid_geometry.bright_ratios(frame_binary, (rx1, ry1))
+        # 判定逻辑：助听器（亮=异常）、充电盒（亮=正常亮格）
+        bright_grids = self.grid_geometry.indices[grid_brightness >= BRIGHT_PIXEL_RATIO]
+        t2 = time.perf_counter()
+        self.metrics.record(STAGE_GRID_COUNT, t2 - t1)
+
+        current_time = self._now()
+        # 更新缓存（通用，整行写入环形缓冲）；纯流式引擎不保存样本
+        if self.status_engine != STATUS_ENGINE_STREAMING:
+            self.grid_brightness_cache.append(current_time, grid_brightness)
+        # 流式统计：逐帧增量更新，每帧都有最新状态
+        if self.streaming_stats is not None:
+            self.streaming_stats.update(current_time, grid_brightness)
+            if self.status_engine == STATUS_ENGINE_STREAMING:
+                self.current_statuses, _ = self.streaming_stats.classify(
+                    BRIGHT_PIXEL_RATIO, STABILITY_THRESHOLD, with_details=False
+                )
+        # 缓存阶段耗时由 process_frame 与过期清理合并为每帧一个样本
+        self._cache_update_seconds = time.perf_counter() - t2
 
         return bright_grids, grid_brightness, frame_binary
 
     def clean_expired_cache(self):
         """清理过期缓存（仅保留最近4秒）"""
-        current_time = time.time()
-        grid_count = GRID_COUNT_HEARING_AID if self.monitor_type == "hearing_aid" else GRID_COUNT_CHARGING
-        for grid_idx in range(grid_count):
-            self.grid_brightness_cache[grid_idx] = [
-                item for item in self.grid_brightness_cache[grid_idx]
-                if current_time - item[0] <= CACHE_DURATION
-            ]
+        self.grid_brightness_cache.expire(self._now(), CACHE_DURATION)
 
     def analyze_single_grid_status(self, grid_idx):
         """分析充电盒单个网格状态（仅充电盒）"""
         if self.monitor_type != "charging_case":
             return STATUS_NO_STATUS, "not charging case"
         
-        cache = self.grid_brightness_cache[grid_idx]
-        if len(cache) < 3:
+        if len(self.grid_brightness_cache) < 3:
             return STATUS_NO_STATUS, "insufficient data (startup delay)"
         
-        brightness_list = [item[1] for item in cache]
+        # 窗口视图（不复制）
+        brightness_list = self.grid_brightness_cache.grid_window(grid_idx)
         brightness_mean = np.mean(brightness_list)
         
         # 无状态：亮度低于阈值
@@ -273,21 +381,39 @@ class GridMonitor:
             return
         
         # 启动延迟检查
-        current_time = time.time()
+        current_time = self._now()
         if current_time - self.start_time < START_DELAY:
             return
         
         # 清理缓存
         self.clean_expired_cache()
         
-        timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
+        timestamp = time.strftime(LOG_TIMESTAMP_FORMAT, time.localtime(current_time))
         log_entries = []
         print(f"\n===== Charging Case Status Analysis [{timestamp}] =====")
         print(f"Restart ID: {self.restart_timestamp}")
         
-        # 分析20个网格
-        for grid_idx in range(GRID_COUNT_CHARGING):
-            status, detail = self.analyze_single_grid_status(grid_idx)
+        if self.status_engine == STATUS_ENGINE_STREAMING:
+            # 流式统计判定（无需样本窗口）
+            statuses, details = self.streaming_stats.classify(BRIGHT_PIXEL_RATIO, STABILITY_THRESHOLD)
+        else:
+            # 一次向量化判定所有网格（样本×网格窗口视图）
+            _, window_values = self.grid_brightness_cache.window()
+            statuses, details = classify_window(
+                window_values[:, :self.grid_count], BRIGHT_PIXEL_RATIO, STABILITY_THRESHOLD
+            )
+        self.current_statuses = statuses
+
+        # 对比模式：窗口判定为准，记录流式判定不一致的网格
+        engine_diffs = {}
+        if self.status_engine == STATUS_ENGINE_COMPARE:
+            stream_statuses, stream_details = self.streaming_stats.classify(BRIGHT_PIXEL_RATIO, STABILITY_THRESHOLD)
+            for grid_idx in np.flatnonzero(stream_statuses != statuses):
+                engine_diffs[int(grid_idx)] = (stream_statuses[grid_idx], stream_details[grid_idx])
+            self.engine_mismatch_count += len(engine_diffs)
+
+        for grid_idx in range(self.grid_count):
+            status, detail = statuses[grid_idx], details[grid_idx]
             grid_log_entry = {
                 "timestamp": timestamp,
                 "restart_timestamp": self.restart_timestamp,
@@ -295,9 +421,18 @@ class GridMonitor:
                 "status": status,
                 "detail": detail
             }
-            log_entries.append(grid_log_entry)
+            if LOG_WRITE_EPOCH:
+                grid_log_entry[LOG_EPOCH_FIELD] = int(current_time)
             print(f"Grid {grid_idx:02d}: {status} - {detail}")
+            if grid_idx in engine_diffs:
+                stream_status, stream_detail = engine_diffs[grid_idx]
+                grid_log_entry["streaming_status"] = stream_status
+                grid_log_entry["streaming_detail"] = stream_detail
+                print(f"    [engine diff] streaming: {stream_status} - {stream_detail}")
+            log_entries.append(grid_log_entry)
         
+        if self.status_engine == STATUS_ENGINE_COMPARE:
+            print(f"Engine mismatches: {len(engine_diffs)}/{self.grid_count} (total {self.engine_mismatch_count})")
         print("=======================================")
         
         # 写入状态日志
@@ -305,200 +440,334 @@ class GridMonitor:
         if not charging_log_file:
             return
         
-        try:
-            existing_logs = []
-            if os.path.exists(charging_log_file):
-                with open(charging_log_file, 'r', encoding='utf-8') as f:
-                    existing_logs = json.load(f)
-            existing_logs.extend(log_entries)
-            with open(charging_log_file, 'w', encoding='utf-8') as f:
-                json.dump(existing_logs, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            messagebox.showwarning("Status Log Write Failed", f"Charging case status log save failed: {str(e)}")
+        # 交给后台写入线程（采集循环不直接写文件）
+        self.log_writer.submit(LOG_STREAM_STATUS, charging_log_file, log_entries)
 
     def log_change(self, bright_grids, grid_brightness):
         """记录日志（区分设备类型）"""
         # 通用日志基础信息
-        timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
+        current_time = self._now()
+        timestamp = time.strftime(LOG_TIMESTAMP_FORMAT, time.localtime(current_time))
         log_file = self.get_10min_log_filename()
         if not log_file:
             return
+        # NumPy数组转为列表（JSON序列化）
+        bright_grids = np.asarray(bright_grids).tolist()
+        grid_brightness = np.asarray(grid_brightness).tolist()
 
-        try:
-            # 读取现有日志
-            logs = []
-            if os.path.exists(log_file):
-                with open(log_file, 'r', encoding='utf-8') as f:
-                    logs = json.load(f)
+        # 按设备类型构建日志条目
+        if self.monitor_type == "hearing_aid":
+            # 助听器日志：重点记录异常网格（亮格=异常）
+            log_entry = {
+                "timestamp": timestamp,
+                "monitor_type": self.monitor_type,
+                "abnormal_grids": bright_grids,  # 异常网格（亮）
+                "grid_brightness": grid_brightness,  # 所有网格亮度
+                "total_abnormal_grids": len(bright_grids),  # 异常网格数
+                "restart_timestamp": self.restart_timestamp,
+                "normal_status": "dark",  # 正常状态：长暗
+                "abnormal_reason": "bright spot detected (fluctuation)"  # 异常原因：亮度波动
+            }
+        else:  # charging_case
+            # 充电盒亮度日志（原有逻辑）
+            log_entry = {
+                "timestamp": timestamp,
+                "monitor_type": self.monitor_type,
+                "bright_grids": bright_grids,
+                "grid_brightness": grid_brightness,
+                "total_bright_grids": len(bright_grids),
+                "restart_timestamp": self.restart_timestamp
+            }
 
-            # 按设备类型构建日志条目
-            if self.monitor_type == "hearing_aid":
-                # 助听器日志：重点记录异常网格（亮格=异常）
-                log_entry = {
-                    "timestamp": timestamp,
-                    "monitor_type": self.monitor_type,
-                    "abnormal_grids": bright_grids,  # 异常网格（亮）
-                    "grid_brightness": grid_brightness,  # 所有网格亮度
-                    "total_abnormal_grids": len(bright_grids),  # 异常网格数
-                    "restart_timestamp": self.restart_timestamp,
-                    "normal_status": "dark",  # 正常状态：长暗
-                    "abnormal_reason": "bright spot detected (fluctuation)"  # 异常原因：亮度波动
-                }
-            else:  # charging_case
-                # 充电盒亮度日志（原有逻辑）
-                log_entry = {
-                    "timestamp": timestamp,
-                    "monitor_type": self.monitor_type,
-                    "bright_grids": bright_grids,
-                    "grid_brightness": grid_brightness,
-                    "total_bright_grids": len(bright_grids),
-                    "restart_timestamp": self.restart_timestamp
-                }
-
-            # 添加新条目并写入
-            logs.append(log_entry)
-            with open(log_file, 'w', encoding='utf-8') as f:
-                json.dump(logs, f, ensure_ascii=False, indent=2)
+        if LOG_WRITE_EPOCH:
+            log_entry[LOG_EPOCH_FIELD] = int(current_time)
 
-        except Exception as e:
-            msg = f"Hearing aid brightness log save failed: {str(e)}" if self.monitor_type == "hearing_aid" else f"Brightness log save failed: {str(e)}"
-            messagebox.showwarning("Log Write Failed", msg)
+        # 交给后台写入线程（跨10分钟边界自动切换文件）
+        self.log_writer.submit(LOG_STREAM_BRIGHTNESS, log_file, [log_entry])
 
     def draw_grid_and_bright(self, frame, bright_grids):
-        """绘制网格和异常/亮格（通用，适配原始帧）"""
-        x, y, w, h = self.border_rect
-        # 绘制网格线（区分设备）
-        if self.monitor_type == "hearing_aid":
-            # 助听器网格线：4行14列
-            y_off = int(h * 0.05)
-            ys, ye, nh = y + y_off, y + h - y_off, h - 2 * y_off
-            gw, xs = w / 14, int(x + (w / 14) / 2)
-            for i in range(14):
-                cx = int(xs + i * gw)
-                cv2.line(frame, (cx, ys), (cx, ye), (255, 0, 255), 2)
-            for i in range(5):
-                cy = int(ys + i * (nh / 4))
-                cv2.line(frame, (xs, cy), (int(xs + 13 * gw), cy), (255, 0, 255), 2)
-        elif self.monitor_type == "charging_case":
-            # 充电盒网格线：4行5列
-            gw = w / 5
-            gh = h / 4
-            # 竖线（5列=6条线）
-            for i in range(6):
-                cv2.line(frame, (int(x + i * gw), y), (int(x + i * gw), y + h), (255, 255, 255), 2)
-            # 横线（4行=5条线）
-            for i in range(5):
-                cv2.line(frame, (x, int(y + i * gh)), (x + w, int(y + i * gh)), (255, 255, 255), 2)
-
-        # 标记异常/亮格（红色覆盖）
-        for (x1, y1, x2, y2, idx) in self.grid_regions:
-            if idx in bright_grids:
-                overlay = frame.copy()
-                cv2.rectangle(overlay, (x1, y1), (x2, y2), (0, 0, 255), -1)
-                alpha = 0.3
-                cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0, frame)
-                cv2.putText(frame, str(idx), (x1 + 5, y1 + 20), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-        return frame
+        """绘制网格和异常/亮格（通用，适配原始帧；就地绘制）"""
+        return self.overlay.draw(frame, bright_grids)
 
     def stop_monitor(self):
         """停止监控"""
         self.is_running = False
 
-    def run_monitor(self):
-        """监控主循环（核心修改3：移除透视变换，使用原始帧）"""
+    def _start_monitor(self):
+        """加载配置、初始化网格、获取摄像头并启动日志线程；失败返回False"""
         try:
             self.load_config()
             self.init_grid_regions()
         except Exception as e:
-            messagebox.showerror("Initialization Failed", f"Config load error: {str(e)}")
-            return
+            self._notify_error("Initialization Failed", f"Config load error: {str(e)}")
+            return False
+
+        # 外部帧源（离线回放）优先；否则获取共享摄像头（默认摄像头1优先，回退到0；已被其他监控打开时直接复用）
+        if self.frame_source is not None:
+            self.camera = self.frame_source
+        else:
+            self.camera = acquire_camera(self.camera_index)
+        if self.camera is None:
+            tried = "camera 1 and 0" if self.camera_index is None else f"camera {self.camera_index}"
+            self._notify_error("Camera Error", f"No camera available (tried {tried})")
+            return False
+
+        # 启动时间在首帧时记录（回放时为录像时间）
+        self.start_time = 0
+        self.frame_time = None
+        # 启动日志写入线程
+        self.log_writer.start()
+        self.is_running = True
+        # 指标服务（如已启用）可读取本监控的统计
+        metrics_server.register_monitor(self)
+        return True
+
+    def _read_frame(self):
+        """读取最新帧；返回 (帧数据包, 是否继续)"""
+        # 共享摄像头的抓帧线程只保留最新帧：处理慢于相机时丢弃旧帧
+        t0 = time.perf_counter()
+        packet = self.camera.read()
+        if packet is not None:
+            self.metrics.record(STAGE_CAPTURE_WAIT, time.perf_counter() - t0)
+        if packet is None:
+            # 等待超时则继续检查运行状态；摄像头失败/回放结束则退出
+            return None, not (self.camera.failed or self.camera.finished)
+        return packet, True
+
+    def process_frame(self, frame, timestamp=None):
+        """单帧分析：亮度检测、缓存、日志、定时状态分析（与界面无关）"""
+        self.frame_time = time.time() if timestamp is None else timestamp
+        if not self.start_time:
+            self.start_time = self.last_analysis_time = self.frame_time
+
+        # 检测亮度/异常
+        bright_grids, grid_brightness, _ = self.calculate_grid_bright(frame)
+        
+        # 清理缓存（与本帧的缓存追加/流式更新合计为一个 cache 样本）
+        t0 = time.perf_counter()
+        self.clean_expired_cache()
+        t1 = time.perf_counter()
+        self.metrics.record(STAGE_CACHE, self._cache_update_seconds + (t1 - t0))
 
-        # 初始化摄像头
-        self.cap = cv2.VideoCapture(1)
-        if not self.cap.isOpened():
-            self.cap = cv2.VideoCapture(0)
-        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, CAM_WIDTH)
-        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, CAM_HEIGHT)
+        # 记录日志（助听器/充电盒均执行）
+        self.log_change(bright_grids, grid_brightness)
+        self.metrics.record(STAGE_LOGGING, time.perf_counter() - t1)
+        
+        # 充电盒专属：定时状态分析
+        current_time = self.frame_time
+        if (self.monitor_type == "charging_case" and 
+            current_time - self.start_time >= START_DELAY and 
+            current_time - self.last_analysis_time >= ANALYSIS_INTERVAL):
+            t0 = time.perf_counter()
+            self.analyze_charging_case_status()
+            self.metrics.record(STAGE_ANALYSIS, time.perf_counter() - t0)
+            self.last_analysis_time = current_time
+
+        self.last_grid_brightness = grid_brightness
+        self.last_bright_count = len(bright_grids)
+        self.frame_count += 1
+        self.metrics.mark_frame(self.camera.dropped_count if self.camera is not None else None)
+        self._dump_metrics()
+        if self.result_callback is not None:
+            self.result_callback(self, bright_grids, grid_brightness)
+        return bright_grids, grid_brightness
+
+    def get_metrics_filename(self):
+        """统计文件名：monitor_metrics/restart_dir/10min_segment.jsonl"""
+        restart_dir = os.path.join(self.log_dir, METRICS_ROOT_DIR, self.restart_dir_name)
+        return os.path.join(restart_dir, f"{self._get_10min_segment()}{SEGMENT_LOG_EXT}")
+
+    def _dump_metrics(self, force=False):
+        """按间隔把统计快照交给后台写入线程"""
+        if not METRICS_DUMP_INTERVAL:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_metrics_dump < METRICS_DUMP_INTERVAL:
+            return
+        self._last_metrics_dump = now
+        entry = {
+            "timestamp": time.strftime(LOG_TIMESTAMP_FORMAT, time.localtime(self._now())),
+            "monitor_type": self.monitor_type,
+            "restart_timestamp": self.restart_timestamp,
+            "log_queue_depth": self.log_writer.queue_depth(),
+            "log_dropped": self.log_writer.dropped_count,
+        }
+        entry.update(self.metrics.snapshot())
+        self.log_writer.submit(LOG_STREAM_METRICS, self.get_metrics_filename(), [entry])
+
+    def draw_metrics_hud(self, frame):
+        """在预览图左上角绘制统计HUD"""
+        for i, line in enumerate(format_hud_lines(self.metrics.snapshot())):
+            y = 18 + i * 18
+            cv2.putText(frame, line, (8, y), cv2.FONT_HERSHEY_SIMPLEX, 0.45, (0, 0, 0), 3)
+            cv2.putText(frame, line, (8, y), cv2.FONT_HERSHEY_SIMPLEX, 0.45, (0, 255, 255), 1)
+        return frame
 
-        # 记录启动时间
-        self.start_time = time.time()
+    def toggle_hud(self):
+        self.show_hud = not self.show_hud
 
-        # 创建监控窗口
+    def _stop_and_release(self):
+        """释放摄像头、写完日志"""
+        self.is_running = False
+        metrics_server.unregister_monitor(self)
+        if self.frame_count:
+            self._dump_metrics(force=True)
+        if self.camera is not None:
+            if self.camera.dropped_count:
+                print(f"Frames skipped (processing slower than camera): {self.camera.dropped_count}")
+            self.camera.release()
+            self.camera = None
+        self.log_writer.stop()
+        if self.log_writer.dropped_count:
+            print(f"Log writer dropped {self.log_writer.dropped_count} entries (queue full)")
+
+    def run_headless(self):
+        """无界面监控主循环（多工位工作进程/命令行模式）"""
+        if not self._start_monitor():
+            return False
+        try:
+            while self.is_running:
+                packet, keep_running = self._read_frame()
+                if packet is None:
+                    if not keep_running:
+                        if self.camera.failed:
+                            self._notify_error("Camera Error", "Camera read failed, monitor stopped")
+                        break
+                    continue
+                self.process_frame(packet.frame, packet.timestamp)
+        finally:
+            self._stop_and_release()
+        return True
+
+    def _open_monitor_window(self):
+        """创建监控窗口（界面线程）"""
+        from tkinter import Toplevel, Label, Button
+        from tk_display import FrameMailbox, TkFrameView, DISPLAY_FPS
         window_title = "Hearing Aid Grid Monitor (Abnormal: Red)" if self.monitor_type == "hearing_aid" else "Charging Case Grid Monitor"
         self.monitor_win = Toplevel(self.root)
         self.monitor_win.title(window_title)
         self.monitor_win.geometry("900x600")
         self.monitor_win.protocol("WM_DELETE_WINDOW", self.stop_monitor)
 
-        # 视频显示区域
+        # 视频显示区域（复用同一个PhotoImage，按显示帧率刷新）
         video_label = Label(self.monitor_win)
         video_label.pack(side="top", padx=10, pady=10, fill="both", expand=True)
+        self.frame_mailbox = FrameMailbox(PREVIEW_SIZE, DISPLAY_FPS)
+        self.frame_view = TkFrameView(video_label, self.frame_mailbox)
 
         # 停止按钮
         stop_btn = Button(self.monitor_win, text="Stop Monitor", bg="#f44336", fg="white",
                           font=("Microsoft YaHei", 12, "bold"), command=self.stop_monitor)
         stop_btn.pack(side="bottom", fill="x", padx=10, pady=10)
+        # 统计HUD开关
+        hud_btn = Button(self.monitor_win, text="Toggle Metrics HUD", command=self.toggle_hud)
+        hud_btn.pack(side="bottom", fill="x", padx=10)
+
+    def _pump_ui(self):
+        """界面线程定时执行：处理排队的提示、显示最新帧；监控线程结束后关闭窗口"""
+        done = self._worker_done
+        while True:
+            try:
+                func = self._ui_calls.get_nowait()
+            except queue.Empty:
+                break
+            func()
+        if done:
+            if self.monitor_win is not None:
+                self.monitor_win.destroy()
+                self.monitor_win = None
+            return
+        if self.frame_view is not None:
+            self.frame_view.refresh()
+        from tk_display import UI_POLL_INTERVAL_MS
+        self.root.after(UI_POLL_INTERVAL_MS, self._pump_ui)
+
+    def start_in_background(self, headless=False, on_finished=None):
+        """界面线程调用：打开监控窗口（headless=True 时不打开），后台线程运行监控循环"""
+        if not headless:
+            self._open_monitor_window()
+
+        def worker():
+            try:
+                ok = self.run_headless() if headless else self.run_monitor()
+                if on_finished is not None:
+                    on_finished(ok)
+            finally:
+                self._worker_done = True
+
+        threading.Thread(target=worker, daemon=True).start()
+        self._pump_ui()
 
-        # 主循环
-        self.is_running = True
-        self.last_analysis_time = time.time()
-        
+    def run_monitor(self):
+        """监控主循环（核心修改3：移除透视变换，使用原始帧）；预览帧交给界面线程显示"""
+        if not self._start_monitor():
+            return False
+
+        # 主循环（分析按相机帧率进行，预览按显示帧率投递）
         while self.is_running:
-            ret, raw = self.cap.read()
-            if not ret:
-                break
+            packet, keep_running = self._read_frame()
+            if packet is None:
+                if not keep_running:
+                    break
+                continue
+
+            # 核心修改4：删除透视变换，直接使用原始帧（只读共享）
+            frame = packet.frame
+            bright_grids, _ = self.process_frame(frame, packet.timestamp)
+
+            mailbox = self.frame_mailbox
+            if mailbox is None or not mailbox.wants_frame():
+                continue
+
+            # 缩放到预览尺寸并绘制标注（原始帧只读，无需整帧复制）
+            t0 = time.perf_counter()
+            frame_show = self.overlay.render_preview(frame, bright_grids, PREVIEW_SIZE)
+            t1 = time.perf_counter()
+            self.metrics.record(STAGE_OVERLAY, t1 - t0)
+
+            # 投递给界面线程（RGB转换写入复用缓冲）
+            if self.show_hud:
+                self.draw_metrics_hud(frame_show)
+            mailbox.post(frame_show)
+            self.metrics.record(STAGE_DISPLAY, time.perf_counter() - t1)
 
-            # 核心修改4：删除透视变换，直接使用原始帧
-            frame = raw
-
-            # 检测亮度/异常
-            bright_grids, grid_brightness, _ = self.calculate_grid_bright(frame)
-            
-            # 清理缓存
-            self.clean_expired_cache()
-
-            # 记录日志（助听器/充电盒均执行）
-            self.log_change(bright_grids, grid_brightness)
-            
-            # 充电盒专属：定时状态分析
-            current_time = time.time()
-            if (self.monitor_type == "charging_case" and 
-                current_time - self.start_time >= START_DELAY and 
-                current_time - self.last_analysis_time >= ANALYSIS_INTERVAL):
-                self.analyze_charging_case_status()
-                self.last_analysis_time = current_time
-
-            # 绘制标注
-            frame = self.draw_grid_and_bright(frame, bright_grids)
-
-            # 转换为Tkinter显示格式
-            frame_show = cv2.resize(frame, (880, 520))
-            frame_rgb = cv2.cvtColor(frame_show, cv2.COLOR_BGR2RGB)
-            img_pil = Image.fromarray(frame_rgb)
-            img_tk = ImageTk.PhotoImage(image=img_pil)
-            video_label.config(image=img_tk)
-            video_label.image = img_tk
-
-            # 键盘退出
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                self.stop_monitor()
-
-        # 释放资源
-        self.cap.release()
-        cv2.destroyAllWindows()
-        self.monitor_win.destroy()
+        # 释放资源（窗口由界面线程关闭）
+        self._stop_and_release()
+        return True
 
 def start_hearing_aid_monitor(root):
     """启动助听器监控（含异常日志）"""
     monitor = GridMonitor(root, "hearing_aid")
-    threading.Thread(target=monitor.run_monitor, daemon=True).start()
+    monitor.start_in_background()
 
 def start_charging_case_monitor(root):
     """启动充电盒监控"""
     monitor = GridMonitor(root, "charging_case")
-    threading.Thread(target=monitor.run_monitor, daemon=True).start()
+    monitor.start_in_background()
+
+def start_replay_monitor(root, monitor_type, replay_path, speed=REPLAY_MAX_SPEED):
+    """离线回放录像/图片序列（最快速度时无界面运行，结束后提示）"""
+    import tkinter.messagebox as messagebox
+    try:
+        source = ReplaySource(replay_path, speed=speed)
+    except Exception as e:
+        messagebox.showerror("Replay Error", f"Cannot open replay source: {str(e)}")
+        return None
+    monitor = GridMonitor(root, monitor_type, frame_source=source)
+    started = time.time()
+
+    def on_finished(ok):
+        if ok and not speed:
+            msg = (f"Replayed {monitor.frame_count} frames "
+                   f"({monitor.frame_count / source.fps:.0f}s of video) in {time.time() - started:.1f}s\n"
+                   f"Logs: {monitor.restart_dir_name}")
+            monitor._post_ui(lambda: messagebox.showinfo("Replay Finished", msg))
+
+    monitor.start_in_background(headless=not speed, on_finished=on_finished)
+    return monitor
 
 if __name__ == "__main__":
+    import tkinter as tk
     root = tk.Tk()
     root.withdraw()  # 隐藏主窗口
     # 可选择启动对应监控
@@ -0,0 +1,136 @@
+# headless_monitor.py
+"""无界面网格监控（命令行/后台服务）
+
+示例：
+    python headless_monitor.py --type charging_case --camera 0 --border charging_case_border.json
+    python headless_monitor.py --type hearing_aid --replay recording.mp4 --log-file monitor.log
+"""
+import os
+import sys
+import time
+import signal
+import logging
+import argparse
+import threading
+import contextlib
+
+import grid_monitor
+import metrics_server
+from replay_source import ReplaySource, REPLAY_MAX_SPEED
+
+REPORT_INTERVAL = 60  # 运行状态汇总输出间隔（秒）
+LOG_FORMAT = "%(asctime)s %(levelname)s [%(name)s] %(message)s"
+
+logger = logging.getLogger("headless_monitor")
+
+
+def setup_logging(log_file=None, level="INFO"):
+    """日志输出到 stderr 或文件"""
+    handler = logging.FileHandler(log_file, encoding="utf-8") if log_file else logging.StreamHandler(sys.stderr)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    root_logger = logging.getLogger()
+    root_logger.handlers[:] = [handler]
+    root_logger.setLevel(getattr(logging, str(level).upper(), logging.INFO))
+
+
+class _StatusReporter:
+    """按间隔输出帧率/丢帧/日志队列等运行状态"""
+
+    def __init__(self, interval=REPORT_INTERVAL):
+        self.interval = interval
+        self._last = time.monotonic()
+
+    def __call__(self, monitor, bright_grids, grid_brightness):
+        now = time.monotonic()
+        if not self.interval or now - self._last < self.interval:
+            return
+        self._last = now
+        snapshot = monitor.metrics.snapshot()
+        msg = (f"fps {snapshot['fps']:.1f}, frames {snapshot['frames']}, dropped {snapshot['dropped_frames']}, "
+               f"bright grids {len(bright_grids)}, log queue {monitor.log_writer.queue_depth()}, "
+               f"log dropped {monitor.log_writer.dropped_count}")
+        if monitor.current_statuses is not None:
+            counts = {}
+            for status in monitor.current_statuses:
+                counts[status] = counts.get(status, 0) + 1
+            msg += ", status " + ", ".join(f"{k} {v}" for k, v in sorted(counts.items()))
+        logger.info(msg)
+
+
+def install_signal_handlers(monitor):
+    """SIGINT/SIGTERM（Windows 另含 SIGBREAK）时停止监控，当前帧处理完后正常退出"""
+    def handle(signum, frame):
+        logger.info("Received signal %s, stopping", signum)
+        monitor.stop_monitor()
+
+    for name in ("SIGINT", "SIGTERM", "SIGBREAK"):
+        sig = getattr(signal, name, None)
+        if sig is not None:
+            signal.signal(sig, handle)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Headless grid monitor (no GUI)")
+    parser.add_argument("--type", dest="monitor_type", required=True, choices=("hearing_aid", "charging_case"))
+    parser.add_argument("--camera", type=int, default=None, help="camera index (default: 1, fallback 0)")
+    parser.add_argument("--border", dest="border_file", default=None, help="border config json")
+    parser.add_argument("--station", dest="station_id", default=None, help="station name (log subdir suffix)")
+    parser.add_argument("--log-dir", default="", help="directory holding the log roots (default: cwd)")
+    parser.add_argument("--replay", default=None, help="replay a video file / image directory instead of a camera")
+    parser.add_argument("--replay-speed", type=float, default=REPLAY_MAX_SPEED,
+                        help="0 = as fast as possible, 1 = realtime")
+    parser.add_argument("--status-engine", default=grid_monitor.STATUS_ENGINE,
+                        choices=(grid_monitor.STATUS_ENGINE_WINDOW, grid_monitor.STATUS_ENGINE_STREAMING,
+                                 grid_monitor.STATUS_ENGINE_COMPARE))
+    parser.add_argument("--duration", type=float, default=0, help="stop after N seconds (0 = until signalled)")
+    parser.add_argument("--report-interval", type=float, default=REPORT_INTERVAL)
+    parser.add_argument("--metrics-port", type=int, default=None, help="serve Prometheus metrics on localhost")
+    parser.add_argument("--log-file", default=None, help="write diagnostics to this file instead of stderr")
+    parser.add_argument("--log-level", default="INFO")
+    parser.add_argument("--quiet", action="store_true", help="suppress per-analysis status printout on stdout")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    setup_logging(args.log_file, args.log_level)
+
+    frame_source = None
+    if args.replay:
+        try:
+            frame_source = ReplaySource(args.replay, speed=args.replay_speed)
+        except Exception as e:
+            logger.error("Cannot open replay source: %s", e)
+            return 1
+
+    monitor = grid_monitor.GridMonitor(
+        None, args.monitor_type, status_engine=args.status_engine,
+        camera_index=args.camera, border_file=args.border_file, station_id=args.station_id,
+        result_callback=_StatusReporter(args.report_interval), frame_source=frame_source,
+        log_dir=args.log_dir,
+    )
+    install_signal_handlers(monitor)
+    if args.duration:
+        timer = threading.Timer(args.duration, monitor.stop_monitor)
+        timer.daemon = True
+        timer.start()
+    if args.metrics_port:
+        try:
+            metrics_server.start_metrics_server(args.metrics_port)
+        except OSError as e:
+            logger.error("Metrics server failed to start: %s", e)
+
+    logger.info("Starting %s monitor (camera=%s, border=%s, logs=%s)", args.monitor_type,
+                "replay" if frame_source else args.camera, monitor.border_file,
+                os.path.abspath(args.log_dir or "."))
+    with open(os.devnull, "w") as devnull, \
+            (contextlib.redirect_stdout(devnull) if args.quiet else contextlib.nullcontext()):
+        ok = monitor.run_headless()
+    snapshot = monitor.metrics.snapshot()
+    logger.info("Stopped: frames %d, dropped %d, log dropped %d", snapshot["frames"],
+                snapshot["dropped_frames"], monitor.log_writer.dropped_count)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
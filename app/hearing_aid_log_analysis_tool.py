@@ -1,140 +1,225 @@
 # hearing_aid_log_analysis_tool.py
 import os
-import json
 import threading
 from datetime import datetime
+import numpy as np
 import tkinter as tk
 from tkinter import messagebox, filedialog, scrolledtext
+from segment_log import iter_log_entries, is_log_file, TimestampDecoder, local_seconds_to_datetime
+from segment_analysis import find_log_files, map_segments_cached
+
+GRID_COUNT = 56
+LOG_ENCODINGS = ('utf-8', 'gbk', 'gb2312', 'latin-1')
+SEGMENT_CACHE_FILE = ".hearing_aid_analysis.cache"  # 分段部分统计缓存（位于日志根目录）
+REQUIRED_FIELDS = ("timestamp", "abnormal_grids", "restart_timestamp")
+FOLD_CHUNK_ROWS = 1 << 18  # 位矩阵分块展开的行数（限制超大分段的内存）
+
+
+# ==============================================
+# 分段部分统计（流式解析，内存只与单个分段有关）
+# ==============================================
+class SegmentSummary:
+    """单个日志分段的网格异常部分统计；多个分段按时间顺序合并即得全程统计
+
+    分段内按列存储：排序后的时间秒数向量 + 每条一个 uint64 异常位掩码（56个网格），
+    展开为 条目×网格 布尔矩阵后用向量化归约得到各网格统计。时间为秒数，无异常为 NaN。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entry_count = 0
+        self.first_time = None                                          # 分段内最早/最晚条目时间（秒）
+        self.last_time = None
+        self.head_abnormal = np.zeros(GRID_COUNT, dtype=bool)           # 最早条目各网格是否异常（合并时补算与上一分段的间隔）
+        self.abnormal_counts = np.zeros(GRID_COUNT, dtype=np.int64)
+        self.first_abnormal = np.full(GRID_COUNT, np.nan)
+        self.last_abnormal = np.full(GRID_COUNT, np.nan)
+        self.abnormal_duration = np.zeros(GRID_COUNT)                   # 分段内异常时长（不含首条与上一分段的间隔）
+        self.debug_info = []
+
+    def fold(self, times, masks):
+        """累计分段内的记录：times 为时间秒数，masks 为对应的异常网格位掩码（乱序时先按时间稳定排序）"""
+        n = len(times)
+        if not n:
+            return
+        times = np.asarray(times, dtype=np.float64)
+        masks = np.asarray(masks, dtype="<u8")
+        if n > 1 and np.any(times[1:] < times[:-1]):
+            order = np.argsort(times, kind="stable")
+            times, masks = times[order], masks[order]
+        # 异常条目的时长 = 与上一条的时间间隔（分段首条为0，合并时补算）
+        deltas = np.diff(times, prepend=times[0])
+        for start in range(0, n, FOLD_CHUNK_ROWS):
+            stop = min(n, start + FOLD_CHUNK_ROWS)
+            # 条目×网格 异常矩阵（位掩码按小端字节展开）
+            bits = np.unpackbits(masks[start:stop].view(np.uint8).reshape(-1, 8), axis=1,
+                                 bitorder="little")[:, :GRID_COUNT]
+            counts = bits.sum(axis=0, dtype=np.int64)
+            seen = counts > 0
+            if start == 0:
+                self.head_abnormal = bits[0].astype(bool)
+            self.abnormal_duration += deltas[start:stop] @ bits
+            self.abnormal_counts += counts
+            self.first_abnormal = np.where(np.isnan(self.first_abnormal) & seen,
+                                           times[start + bits.argmax(axis=0)], self.first_abnormal)
+            self.last_abnormal = np.where(seen, times[stop - 1 - bits[::-1].argmax(axis=0)], self.last_abnormal)
+        self.entry_count = n
+        self.first_time = float(times[0])
+        self.last_time = float(times[-1])
+
+
+def _read_segment_records(file_path, encoding, debug_info):
+    """逐条读取分段，返回 (时间秒数列表, 异常网格位掩码列表)；无效条目记录到 debug_info 后跳过"""
+    times, masks = [], []
+    decoder = TimestampDecoder()
+    for entry in iter_log_entries(file_path, encoding=encoding):
+        # 验证必填字段
+        if not isinstance(entry, dict) or not all(field in entry for field in REQUIRED_FIELDS):
+            debug_info.append(f"  - 缺少必填字段: {entry}")
+            continue
+
+        # 解析时间戳（本地时间秒数；有 epoch 字段时不解析字符串）
+        try:
+            ts = decoder.decode(entry)
+        except (TypeError, ValueError):
+            debug_info.append(f"  - 无效时间戳: {entry['timestamp']}")
+            continue
+
+        # 解析异常网格
+        abnormal_grids = entry.get("abnormal_grids", [])
+        if not isinstance(abnormal_grids, list):
+            debug_info.append(f"  - 异常网格格式错误: {abnormal_grids}")
+            continue
+        mask = 0
+        for grid_idx in abnormal_grids:
+            if isinstance(grid_idx, int) and 0 <= grid_idx < GRID_COUNT:
+                mask |= 1 << grid_idx
+        times.append(ts)
+        masks.append(mask)
+    return times, masks
+
+
+def read_segment(file_path, debug_info):
+    """依次尝试各编码读取分段，返回 (时间秒数列表, 异常网格位掩码列表)；所有编码均失败返回 None"""
+    for enc in LOG_ENCODINGS:
+        entry_debug = []
+        try:
+            records = _read_segment_records(file_path, enc, entry_debug)
+        except Exception as e:
+            debug_info.append(f"  - 使用编码 {enc} 读取失败: {str(e)}")
+            continue
+        debug_info.append(f"成功读取文件（编码:{enc}）: {file_path}")
+        debug_info.extend(entry_debug)
+        return records
+    debug_info.append(f"读取失败（所有编码均不兼容）: {file_path}")
+    return None
+
+
+def parse_segment(file_path):
+    """解析单个助听器日志分段（兼容多编码，兼容JSON Lines/JSON数组），返回 SegmentSummary"""
+    summary = SegmentSummary(file_path)
+    if not os.path.isfile(file_path):
+        summary.debug_info.append(f"跳过非文件: {file_path}")
+        return summary
+
+    records = read_segment(file_path, summary.debug_info)
+    if records is not None:
+        summary.fold(*records)
+        summary.debug_info.append(f"  - 成功解析条目数: {summary.entry_count}")
+    return summary
+
 
 # ==============================================
 # 助听器日志分析核心逻辑
 # ==============================================
 class HearingAidLogAnalyzer:
-    def __init__(self, log_root_dir):
+    def __init__(self, log_root_dir, workers=None, progress_callback=None, use_cache=True):
         self.log_root_dir = log_root_dir
+        self.use_cache = use_cache                  # 未变化的分段复用上次的解析结果
+        self.workers = workers                      # 并行解析进程数（None=CPU核数，1=不使用进程池）
+        self.progress_callback = progress_callback  # progress_callback(已解析分段数, 总分段数)
         self.grid_summary = {}
+        self.segments = []  # 各分段部分统计（SegmentSummary）
         self.debug_info = []  # 调试信息
         # 初始化56个网格的统计结构
-        for idx in range(56):
+        for idx in range(GRID_COUNT):
             self.grid_summary[idx] = {
-                "records": [],                  # 所有记录 (timestamp_str, datetime_obj, is_abnormal)
+                "total_records": 0,             # 解析记录数
                 "total_abnormal_times": 0,      # 异常次数
                 "first_abnormal_time": None,    # 首次异常时间
                 "last_abnormal_time": None,     # 最后异常时间
-                "total_abnormal_duration": 0,   # 总异常时长（秒，按10分钟分段估算）
+                "total_abnormal_duration": 0,   # 总异常时长（秒，按记录时间间隔估算）
                 "is_always_normal": True        # 是否全程正常（无异常）
             }
 
-    def _safe_read_json(self, file_path):
-        """安全读取JSON文件（兼容多编码）"""
-        encodings = ['utf-8', 'gbk', 'gb2312', 'latin-1']
-        for enc in encodings:
-            try:
-                with open(file_path, 'r', encoding=enc) as f:
-                    return json.load(f), enc
-            except Exception as e:
-                self.debug_info.append(f"  - 使用编码 {enc} 读取失败: {str(e)}")
-                continue
-        return None, None
-
-    def _parse_single_json(self, file_path):
-        """解析单个助听器JSON日志文件"""
-        if not os.path.isfile(file_path):
-            self.debug_info.append(f"跳过非文件: {file_path}")
-            return
-        
-        # 读取JSON
-        json_data, enc = self._safe_read_json(file_path)
-        if json_data is None:
-            self.debug_info.append(f"读取失败（所有编码均不兼容）: {file_path}")
-            return
-        self.debug_info.append(f"成功读取文件（编码:{enc}）: {file_path}")
-
-        if not isinstance(json_data, list):
-            self.debug_info.append(f"  - 无效JSON格式（非列表）: {file_path}")
-            return
-        
-        parsed_count = 0
-        for entry in json_data:
-            # 验证必填字段
-            required_fields = ["timestamp", "abnormal_grids", "restart_timestamp"]
-            if not all(field in entry for field in required_fields):
-                self.debug_info.append(f"  - 缺少必填字段: {entry}")
-                continue
-            
-            # 解析时间戳
-            try:
-                ts_obj = datetime.strptime(entry["timestamp"], "%Y-%m-%d %H:%M:%S")
-            except:
-                self.debug_info.append(f"  - 无效时间戳: {entry['timestamp']}")
-                continue
-            
-            # 解析异常网格
-            abnormal_grids = entry.get("abnormal_grids", [])
-            if not isinstance(abnormal_grids, list):
-                self.debug_info.append(f"  - 异常网格格式错误: {abnormal_grids}")
-                continue
-            
-            # 记录每个网格的异常状态
-            for grid_idx in range(56):
-                is_abnormal = grid_idx in abnormal_grids
-                self.grid_summary[grid_idx]["records"].append((entry["timestamp"], ts_obj, is_abnormal))
-                if is_abnormal:
-                    self.grid_summary[grid_idx]["total_abnormal_times"] += 1
-                    self.grid_summary[grid_idx]["is_always_normal"] = False
-                    # 记录首次/最后异常时间
-                    if self.grid_summary[grid_idx]["first_abnormal_time"] is None:
-                        self.grid_summary[grid_idx]["first_abnormal_time"] = ts_obj
-                    self.grid_summary[grid_idx]["last_abnormal_time"] = ts_obj
-            
-            parsed_count += 1
-        
-        self.debug_info.append(f"  - 成功解析条目数: {parsed_count}")
+    def _add_segment(self, summary):
+        """收集一个分段的部分统计（调试信息并入分析器）"""
+        self.debug_info.extend(summary.debug_info)
+        self.segments.append(summary)
 
     def _scan_all_log_files(self):
-        """递归扫描所有助听器JSON日志"""
+        """递归扫描所有助听器日志（.jsonl/.json），各分段并行解析"""
         self.debug_info.append(f"\n开始扫描目录: {self.log_root_dir}")
-        log_files = []
-        for root_dir, _, files in os.walk(self.log_root_dir):
-            for fn in files:
-                if fn.lower().endswith(".json"):
-                    full_path = os.path.join(root_dir, fn)
-                    log_files.append(full_path)
-        self.debug_info.append(f"找到.json文件数量: {len(log_files)}")
+        log_files = find_log_files(self.log_root_dir, is_log_file)  # .jsonl（追加写格式）/ .json（旧版数组格式）
+        self.debug_info.append(f"找到日志文件数量: {len(log_files)}")
         self.debug_info.append(f"文件列表: {log_files}")
-        
-        # 解析每个文件
-        for fp in log_files:
-            self._parse_single_json(fp)
+
+        # 解析每个文件（结果按文件顺序返回，合并时再按时间排序；未变化的分段使用缓存）
+        cache_path = os.path.join(self.log_root_dir, SEGMENT_CACHE_FILE) if self.use_cache else None
+        summaries, cache_hits = map_segments_cached(parse_segment, log_files, SegmentSummary, cache_path,
+                                                    self.workers, self.progress_callback)
+        for summary in summaries:
+            self._add_segment(summary)
+        if self.use_cache:
+            self.debug_info.append(f"缓存命中分段: {cache_hits}, 重新解析分段: {len(log_files) - cache_hits}")
 
     def _compute_grid_stats(self):
-        """计算每个网格的异常统计"""
+        """按时间顺序合并各分段的部分统计，得到每个网格的异常统计
+
+        不重叠的分段按时间依次衔接（分段首条异常时计入与上一分段最后一条的间隔）；
+        时间范围重叠的分段（多个工位目录同时写入）只与同一目录的上一分段衔接，时长为各目录之和。
+        只使用部分统计，不重新读取日志，内存与日志总量无关。
+        """
         self.debug_info.append("\n开始计算网格异常统计...")
-        total_records = 0
-        for idx in range(56):
-            d = self.grid_summary[idx]
-            records = d["records"]
-            total_records += len(records)
-            if not records:
-                self.debug_info.append(f"网格 {idx:02d}: 无解析记录")
+        segments = sorted((seg for seg in self.segments if seg.entry_count),
+                          key=lambda seg: (seg.first_time, seg.path))
+        total_entries = sum(seg.entry_count for seg in segments)
+        counts = np.zeros(GRID_COUNT, dtype=np.int64)
+        duration = np.zeros(GRID_COUNT)
+        first = np.full(GRID_COUNT, np.nan)
+        last = np.full(GRID_COUNT, np.nan)
+        group_end = None  # 当前重叠时间段的最晚时间
+        dir_last = {}     # 当前重叠时间段内各目录上一分段的最晚时间
+        for seg in segments:
+            station_dir = os.path.dirname(seg.path)
+            if group_end is not None and seg.first_time < group_end:
+                prev_last = dir_last.get(station_dir)
+            else:
+                prev_last = group_end
+                dir_last = {}
+            gap = max(0.0, seg.first_time - prev_last) if prev_last is not None else 0.0
+            counts += seg.abnormal_counts
+            duration += seg.abnormal_duration + gap * seg.head_abnormal
+            first = np.fmin(first, seg.first_abnormal)
+            last = np.fmax(last, seg.last_abnormal)
+            dir_last[station_dir] = seg.last_time
+            group_end = seg.last_time if group_end is None else max(group_end, seg.last_time)
+
+        for idx in range(GRID_COUNT):
+            if not counts[idx]:
                 continue
+            d = self.grid_summary[idx]
+            d["total_abnormal_times"] = int(counts[idx])
+            d["is_always_normal"] = False
+            d["first_abnormal_time"] = local_seconds_to_datetime(first[idx])
+            d["last_abnormal_time"] = local_seconds_to_datetime(last[idx])
+            d["total_abnormal_duration"] = float(duration[idx])
 
-            # 按时间排序
-            records_sorted = sorted(records, key=lambda x: x[1])
-            d["records"] = records_sorted
-
-            # 估算异常总时长（假设每条记录间隔约1秒）
-            abnormal_durations = []
-            prev_time = None
-            for ts_str, ts_obj, is_abnormal in records_sorted:
-                if prev_time and is_abnormal:
-                    delta = ts_obj - prev_time
-                    abnormal_durations.append(delta.total_seconds())
-                prev_time = ts_obj
-            if abnormal_durations:
-                d["total_abnormal_duration"] = sum(abnormal_durations)
-        
-        self.debug_info.append(f"总解析记录数: {total_records}")
+        for idx in range(GRID_COUNT):
+            self.grid_summary[idx]["total_records"] = total_entries
+            if not total_entries:
+                self.debug_info.append(f"网格 {idx:02d}: 无解析记录")
+        self.debug_info.append(f"总解析记录数: {total_entries * GRID_COUNT}")
 
     def analyze(self):
         """统一分析入口"""
@@ -171,7 +256,7 @@ class HearingAidLogAnalyzer:
 
         # 网格详情
         grid_part = []
-        for idx in range(56):
+        for idx in range(GRID_COUNT):
             d = self.grid_summary[idx]
             grid_title = f"网格 {idx:02d}"
             
@@ -254,13 +339,22 @@ def open_hearing_aid_analyzer_window(parent_root):
         result_box.insert(tk.END, f"正在分析：{target_dir}\n\n请稍候...")
         result_box.config(state=tk.DISABLED)
 
+        last_percent = [-1]
+
+        def report_progress(done, total):
+            """解析进度（后台线程调用，按百分比节流后交给界面线程显示）"""
+            percent = done * 100 // total if total else 100
+            if percent != last_percent[0]:
+                last_percent[0] = percent
+                win.after(0, lambda: btn_start.config(text=f"分析中... {done}/{total} ({percent}%)"))
+
         def task():
             """后台任务"""
             error_msg = ""
             report_content = ""
             save_path = ""
             try:
-                analyzer = HearingAidLogAnalyzer(target_dir)
+                analyzer = HearingAidLogAnalyzer(target_dir, progress_callback=report_progress)
                 analyzer.analyze()
                 report_content = analyzer.generate_report()
                 save_path = analyzer.save_report()
@@ -1,30 +1,124 @@
 # main_gui.py
-import tkinter as tk
-from tkinter import messagebox
+import time
+_STARTUP_T0 = time.perf_counter()
+import os
+import sys
+import importlib
 import threading
-# 业务模块导入
-import detection_system
-from border_adjuster import adjust_charging_case_border
-import grid_monitor
-# 导入日志分析工具（充电盒+助听器）
-import charging_log_analysis_tool
-import hearing_aid_log_analysis_tool  # 新增：导入助听器日志分析工具
+import tkinter as tk
+from tkinter import messagebox, filedialog
+# 业务模块（cv2/NumPy/PIL 等）按需导入：点击按钮时加载，窗口显示后可在后台预热
+import metrics_server
+
+LAZY_MODULES = (
+    "grid_monitor",
+    "detection_system",
+    "border_adjuster",
+    "station_supervisor",
+    "charging_log_analysis_tool",
+    "hearing_aid_log_analysis_tool",  # 新增：助听器日志分析工具
+)
+PREWARM_ENABLED = os.environ.get("GRID_MONITOR_PREWARM", "1") != "0"  # 窗口显示后后台预热业务模块
+PREWARM_DELAY_MS = 300           # 窗口显示后延迟多久开始预热
+STARTUP_TARGET_S = 1.5           # 启动到主窗口显示的目标耗时（秒）
+IMPORT_REPORT = os.environ.get("GRID_MONITOR_IMPORT_REPORT") == "1" or "--import-report" in sys.argv
 
 # 全局 root 变量
 root = None
+# 模块导入耗时（秒，含其首次引入的 cv2/NumPy 等依赖）
+import_times = {}
+
+
+def load_module(name):
+    """导入业务模块，记录首次导入耗时（后台预热导入中途调用时由导入锁等待其完成，不会拿到半初始化模块）"""
+    if name in import_times:
+        return sys.modules[name]
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    import_times.setdefault(name, time.perf_counter() - start)
+    return module
+
+
+def call_module(name, func_name, *args):
+    """按钮回调：加载模块后调用其函数；首次加载期间显示等待光标"""
+    loaded = name in import_times
+    if not loaded and root is not None:
+        root.config(cursor="watch")
+        root.update_idletasks()
+    try:
+        return getattr(load_module(name), func_name)(*args)
+    except ImportError as e:
+        messagebox.showerror("Module Error", f"Cannot load {name}: {str(e)}")
+    finally:
+        if not loaded and root is not None:
+            root.config(cursor="")
+
+
+def _prewarm_modules():
+    """后台线程预热业务模块（与按钮触发的导入并发时由导入锁保证只导入一次）"""
+    for name in LAZY_MODULES:
+        try:
+            load_module(name)
+        except Exception as e:
+            print(f"Prewarm {name} failed: {str(e)}")
+    if IMPORT_REPORT:
+        print_import_report("prewarm finished")
+
+
+def print_import_report(stage, window_time=None):
+    """输出启动/导入耗时报告"""
+    print(f"[startup] {stage}")
+    if window_time is not None:
+        verdict = "OK" if window_time <= STARTUP_TARGET_S else "OVER TARGET"
+        print(f"  window shown after {window_time:.3f}s (target {STARTUP_TARGET_S:.1f}s, {verdict})")
+    for name, seconds in sorted(import_times.items(), key=lambda kv: -kv[1]):
+        print(f"  {name:<32} {seconds * 1000:8.1f} ms")
+    heavy = [m for m in ("cv2", "numpy", "PIL") if m in sys.modules]
+    print(f"  heavy modules loaded: {', '.join(heavy) if heavy else 'none'}")
+
+
+def _on_window_shown():
+    """主窗口首次显示后：输出启动报告、启动后台预热"""
+    if IMPORT_REPORT:
+        print_import_report("control panel shown", time.perf_counter() - _STARTUP_T0)
+    if PREWARM_ENABLED:
+        root.after(PREWARM_DELAY_MS, lambda: threading.Thread(
+            target=_prewarm_modules, name="prewarm", daemon=True).start())
+
 
 def run_detection(mode):
     """运行实时监测或预览"""
     global root
-    ds = detection_system.DetectionSystem(root)
+    ds = call_module("detection_system", "DetectionSystem", root)
+    if ds is None:
+        return
     threading.Thread(target=ds.worker, args=(mode,), daemon=True).start()
 
+def run_replay():
+    """离线回放录像（最快速度重新分析，日志与实时运行一致）"""
+    path = filedialog.askopenfilename(title="选择录像文件（取消则选择图片序列目录）",
+                                      filetypes=[("Video", "*.mp4 *.avi *.mkv *.mov"), ("All", "*.*")])
+    if not path:
+        path = filedialog.askdirectory(title="选择图片序列目录")
+    if not path:
+        return
+    is_hearing_aid = messagebox.askyesnocancel("回放类型", "是否为助听器托盘录像？\n（是=助听器，否=充电盒）")
+    if is_hearing_aid is None:
+        return
+    call_module("grid_monitor", "start_replay_monitor", root,
+                "hearing_aid" if is_hearing_aid else "charging_case", path)
+
 def main_gui():
     """系统主界面入口"""
     global root
     root = tk.Tk()
+    # 指标服务（可选，设置 GRID_MONITOR_METRICS_PORT 后启用）
+    try:
+        metrics_server.start_metrics_server()
+    except OSError as e:
+        messagebox.showwarning("Metrics", f"Metrics server failed to start: {str(e)}")
     root.title("智能视觉标定与检测系统")
-    root.geometry("450x750")  # 微调高度，适配新增按钮
+    root.geometry("450x850")  # 微调高度，适配新增按钮
 
     # 标题
     tk.Label(root, text="系统控制面板", font=("微软雅黑", 16, "bold"), pady=20).pack()
@@ -34,7 +128,7 @@ def main_gui():
 
     # 2. 手动调整黑边
     tk.Button(root, text="📐 手动调整充电盒区域", bg="#607D8B", fg="white",
-              command=adjust_charging_case_border, **btn_style).pack(pady=10)
+              command=lambda: call_module("border_adjuster", "adjust_charging_case_border"), **btn_style).pack(pady=10)
 
     # 3. 实时检测
     tk.Button(root, text="🔍 助听器托盘校准", bg="#4CAF50", fg="white",
@@ -50,20 +144,26 @@ def main_gui():
 
     # 6. 网格监控按钮
     tk.Button(root, text="📹 启动助听器网格监控", bg="#FF9800", fg="white",
-              command=lambda: grid_monitor.start_hearing_aid_monitor(root), **btn_style).pack(pady=5)
+              command=lambda: call_module("grid_monitor", "start_hearing_aid_monitor", root), **btn_style).pack(pady=5)
     tk.Button(root, text="📹 启动充电盒网格监控", bg="#9C27B0", fg="white",
-              command=lambda: grid_monitor.start_charging_case_monitor(root), **btn_style).pack(pady=5)
+              command=lambda: call_module("grid_monitor", "start_charging_case_monitor", root), **btn_style).pack(pady=5)
+    tk.Button(root, text="⏩ 离线回放分析", bg="#00796B", fg="white",
+              command=run_replay, **btn_style).pack(pady=5)
+    tk.Button(root, text="🖥 多工位监控（每摄像头一进程）", bg="#009688", fg="white",
+              command=lambda: call_module("station_supervisor", "open_station_supervisor_window", root), **btn_style).pack(pady=5)
 
     # 7. 日志分析按钮（充电盒+助听器）
     tk.Button(root, text="📊 充电日志分析", bg="#F44336", fg="white",
-              command=lambda: charging_log_analysis_tool.open_log_analyzer_window(root), **btn_style).pack(pady=5)
+              command=lambda: call_module("charging_log_analysis_tool", "open_log_analyzer_window", root), **btn_style).pack(pady=5)
     # 新增：助听器日志分析按钮
     tk.Button(root, text="📊 助听器日志分析", bg="#3F51B5", fg="white",
-              command=lambda: hearing_aid_log_analysis_tool.open_hearing_aid_analyzer_window(root), **btn_style).pack(pady=5)
+              command=lambda: call_module("hearing_aid_log_analysis_tool", "open_hearing_aid_analyzer_window", root), **btn_style).pack(pady=5)
 
     # 状态栏
     tk.Label(root, text="提示：按 'S' 保存调整，'Q' 退出预览/监控", fg="gray").pack(side="bottom", pady=20)
 
+    # 窗口显示后再输出启动报告/开始预热，避免与界面首次绘制争抢
+    root.after_idle(_on_window_shown)
     root.mainloop()
 
 if __name__ == "__main__":
@@ -0,0 +1,144 @@
+# metrics_server.py
+import os
+import threading
+import weakref
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# 指标服务（Prometheus 文本格式），默认关闭：设置端口后启用，仅监听本机
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = int(os.environ.get("GRID_MONITOR_METRICS_PORT", "0"))  # 0=不启动
+METRICS_PATH = "/metrics"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# 已注册的运行中监控（弱引用：监控结束后自动移除）
+_monitors = weakref.WeakSet()
+_monitors_lock = threading.Lock()
+_server = None
+_server_lock = threading.Lock()
+
+
+def register_monitor(monitor):
+    with _monitors_lock:
+        _monitors.add(monitor)
+
+
+def unregister_monitor(monitor):
+    with _monitors_lock:
+        _monitors.discard(monitor)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(base, **extra):
+    items = dict(base, **extra)
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items.items()) + "}"
+
+
+def render_metrics(monitors):
+    """将监控快照渲染为 Prometheus 文本格式（只读取监控已发布的数据，不加锁阻塞采集）"""
+    families = {}  # 指标名 -> (类型, 说明, [行])
+
+    def add(name, kind, help_text, labels, value, suffix=""):
+        family = families.setdefault(name, (kind, help_text, []))
+        family[2].append(f"{name}{suffix}{labels} {value}")
+
+    for monitor in monitors:
+        base = {
+            "monitor_type": monitor.monitor_type,
+            "station": monitor.station_id or monitor.restart_dir_name,
+        }
+        lb = _labels(base)
+        add("grid_monitor_up", "gauge", "Monitor loop running", lb, int(bool(monitor.is_running)))
+
+        snapshot = monitor.metrics.snapshot()
+        add("grid_monitor_fps", "gauge", "Effective processed frames per second", lb, snapshot["fps"])
+        add("grid_monitor_frames_total", "counter", "Processed frames", lb, snapshot["frames"])
+        add("grid_monitor_dropped_frames_total", "counter",
+            "Frames skipped because processing was slower than the camera", lb, snapshot["dropped_frames"])
+        for stage, stats in snapshot["stages"].items():
+            for q, key in (("0.5", "p50_ms"), ("0.95", "p95_ms"), ("0.99", "p99_ms")):
+                add("grid_monitor_stage_latency_seconds", "summary", "Per-stage processing latency",
+                    _labels(base, stage=stage, quantile=q), stats[key] / 1000.0)
+            add("grid_monitor_stage_latency_seconds", "summary", "Per-stage processing latency",
+                _labels(base, stage=stage), stats["sum_s"], suffix="_sum")
+            add("grid_monitor_stage_latency_seconds", "summary", "Per-stage processing latency",
+                _labels(base, stage=stage), stats["count"], suffix="_count")
+
+        writer = monitor.log_writer
+        add("grid_monitor_log_queue_depth", "gauge", "Entries waiting in the log writer queue", lb,
+            writer.queue_depth())
+        add("grid_monitor_log_dropped_total", "counter", "Log entries dropped because the queue was full", lb,
+            writer.dropped_count)
+
+        # 逐网格亮度比例（采集线程每帧整体替换数组引用，这里读到的是完整的一帧）
+        brightness = monitor.last_grid_brightness
+        if brightness is not None:
+            for grid_idx, ratio in enumerate(brightness):
+                add("grid_monitor_grid_brightness_ratio", "gauge", "Bright pixel ratio per grid",
+                    _labels(base, grid=grid_idx), float(ratio))
+
+        if monitor.monitor_type == "hearing_aid":
+            add("grid_monitor_abnormal_grids", "gauge", "Hearing aid grids currently abnormal (bright)", lb,
+                monitor.last_bright_count)
+        else:
+            add("grid_monitor_bright_grids", "gauge", "Charging case grids currently lit", lb,
+                monitor.last_bright_count)
+            statuses = monitor.current_statuses
+            if statuses is not None:
+                counts = {}
+                for status in statuses:
+                    counts[status] = counts.get(status, 0) + 1
+                for status, count in sorted(counts.items()):
+                    add("grid_monitor_charging_status_grids", "gauge", "Charging case grids per status",
+                        _labels(base, status=status), count)
+
+    lines = []
+    for name, (kind, help_text, rows) in families.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(rows)
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != METRICS_PATH:
+            self.send_error(404)
+            return
+        with _monitors_lock:
+            monitors = list(_monitors)
+        body = render_metrics(monitors).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # 不在控制台输出访问日志
+
+
+def start_metrics_server(port=None, host=METRICS_HOST):
+    """启动指标服务线程（已启动则直接返回）；port 为 0/None 且未配置时不启动，返回 None"""
+    global _server
+    port = METRICS_PORT if port is None else port
+    if not port:
+        return None
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name="metrics_server", daemon=True).start()
+            print(f"Metrics endpoint: http://{host}:{_server.server_address[1]}{METRICS_PATH}")
+        return _server
+
+
+def stop_metrics_server():
+    global _server
+    with _server_lock:
+        if _server is not None:
+            _server.shutdown()
+            _server.server_close()
+            _server = None
@@ -0,0 +1,115 @@
+# overlay_renderer.py
+import cv2
+import numpy as np
+from grid_geometry import grid_line_segments
+
+HIGHLIGHT_COLOR = (0, 0, 255)   # 亮格/异常格覆盖色（红）
+HIGHLIGHT_ALPHA = 0.3
+LINE_THICKNESS = 2              # 原始分辨率下的网格线宽
+LABEL_FONT_SCALE = 0.6          # 原始分辨率下的序号字号
+
+
+class _OverlayLayers:
+    """某一 (原始尺寸, 输出尺寸) 下预渲染的静态图层"""
+
+    def __init__(self, monitor_type, border_rect, grid_regions, src_size, out_size):
+        src_w, src_h = src_size
+        out_w, out_h = out_size
+        sx, sy = out_w / src_w, out_h / src_h
+        scale = min(sx, sy)
+
+        # 网格区域换算到输出坐标，及所有网格+网格线的外接矩形（只在该区域内合成）
+        rects = [(int(round(x1 * sx)), int(round(y1 * sy)), int(round(x2 * sx)), int(round(y2 * sy)), idx)
+                 for x1, y1, x2, y2, idx in grid_regions]
+        segments, self.line_color = grid_line_segments(monitor_type, border_rect)
+        segments = [((int(round(a[0] * sx)), int(round(a[1] * sy))), (int(round(b[0] * sx)), int(round(b[1] * sy))))
+                    for a, b in segments]
+        thickness = max(1, int(round(LINE_THICKNESS * scale)))
+        xs = [r[0] for r in rects] + [r[2] for r in rects] + [p[0] for seg in segments for p in seg]
+        ys = [r[1] for r in rects] + [r[3] for r in rects] + [p[1] for seg in segments for p in seg]
+        pad = thickness
+        bx1, by1 = max(0, min(xs, default=0) - pad), max(0, min(ys, default=0) - pad)
+        bx2, by2 = min(out_w, max(xs, default=0) + pad + 1), min(out_h, max(ys, default=0) + pad + 1)
+        self.bbox = (bx1, by1, max(bx1, bx2), max(by1, by2))
+        roi_w, roi_h = self.bbox[2] - bx1, self.bbox[3] - by1
+
+        # 网格线图层 + 掩码（ROI坐标）
+        self.line_mask = np.zeros((roi_h, roi_w), dtype=np.uint8)
+        for (ax, ay), (bx, by) in segments:
+            cv2.line(self.line_mask, (ax - bx1, ay - by1), (bx - bx1, by - by1), 255, thickness)
+        self.line_layer = np.empty((roi_h, roi_w, 3), dtype=np.uint8)
+        self.line_layer[:] = self.line_color
+
+        # 网格标签图：每个像素记录所属网格（位置+1，0=不属于任何网格）；不超过255格时用uint8查表
+        self.small_lut = len(rects) < 256
+        self.label_map = np.zeros((roi_h, roi_w), dtype=np.uint8 if self.small_lut else np.int32)
+        self.index_to_pos = {}
+        for pos, (x1, y1, x2, y2, idx) in enumerate(rects):
+            self.label_map[max(0, y1 - by1):max(0, y2 - by1), max(0, x1 - bx1):max(0, x2 - bx1)] = pos + 1
+            self.index_to_pos[idx] = pos
+        self.lut = np.zeros(256 if self.small_lut else len(rects) + 1, dtype=np.uint8)
+
+        # 序号文字位置与字号
+        self.font_scale = max(0.35, LABEL_FONT_SCALE * scale)
+        self.font_thickness = max(1, int(round(2 * scale)))
+        self.label_pos = [(x1 + max(2, int(5 * scale)), y1 + max(10, int(20 * scale))) for x1, y1, _, _, _ in rects]
+        self.labels = [str(idx) for *_, idx in rects]
+
+        # 合成缓冲（复用）
+        self.color_layer = np.empty((roi_h, roi_w, 3), dtype=np.uint8)
+        self.color_layer[:] = HIGHLIGHT_COLOR
+        self.blend = np.empty((roi_h, roi_w, 3), dtype=np.uint8)
+
+
+class OverlayRenderer:
+    """网格叠加绘制：缓存静态网格线图层，所有亮格一次掩码混合（耗时与亮格数无关）"""
+
+    def __init__(self, monitor_type, border_rect, grid_regions):
+        self.monitor_type = monitor_type
+        self.border_rect = tuple(border_rect)
+        self.grid_regions = list(grid_regions)
+        self._layers = {}       # (原始尺寸, 输出尺寸) -> _OverlayLayers
+        self._preview = None    # 预览缓冲（复用）
+
+    def _get_layers(self, src_size, out_size):
+        key = (src_size, out_size)
+        layers = self._layers.get(key)
+        if layers is None:
+            layers = self._layers[key] = _OverlayLayers(
+                self.monitor_type, self.border_rect, self.grid_regions, src_size, out_size)
+        return layers
+
+    def _compose(self, canvas, layers, bright_grids):
+        """在 canvas 上绘制网格线、亮格覆盖和序号"""
+        bx1, by1, bx2, by2 = layers.bbox
+        roi = canvas[by1:by2, bx1:bx2]
+        cv2.copyTo(layers.line_layer, layers.line_mask, roi)
+
+        positions = [layers.index_to_pos[idx] for idx in np.asarray(bright_grids).tolist()
+                     if idx in layers.index_to_pos]
+        if not positions:
+            return canvas
+        lut = layers.lut
+        lut[:] = 0
+        lut[np.asarray(positions) + 1] = 255
+        mask = cv2.LUT(layers.label_map, lut) if layers.small_lut else lut[layers.label_map]
+        cv2.addWeighted(layers.color_layer, HIGHLIGHT_ALPHA, roi, 1 - HIGHLIGHT_ALPHA, 0, layers.blend)
+        cv2.copyTo(layers.blend, mask, roi)
+        for pos in positions:
+            cv2.putText(canvas, layers.labels[pos], layers.label_pos[pos], cv2.FONT_HERSHEY_SIMPLEX,
+                        layers.font_scale, (255, 255, 255), layers.font_thickness)
+        return canvas
+
+    def draw(self, frame, bright_grids):
+        """在原始分辨率帧上就地绘制"""
+        size = (frame.shape[1], frame.shape[0])
+        return self._compose(frame, self._get_layers(size, size), bright_grids)
+
+    def render_preview(self, frame, bright_grids, out_size):
+        """缩放到预览尺寸后绘制（原始帧只读不修改，预览缓冲复用）"""
+        out_w, out_h = out_size
+        if self._preview is None or self._preview.shape[:2] != (out_h, out_w):
+            self._preview = np.empty((out_h, out_w, 3), dtype=np.uint8)
+        cv2.resize(frame, (out_w, out_h), dst=self._preview)
+        layers = self._get_layers((frame.shape[1], frame.shape[0]), (out_w, out_h))
+        return self._compose(self._preview, layers, bright_grids)
@@ -0,0 +1,97 @@
+# replay_source.py
+import os
+import time
+import cv2
+from frame_grabber import FramePacket, FRAME_WAIT_TIMEOUT
+
+# 回放速度：0=最快速度（不等待，时间戳按帧率合成）；1.0=实时；2.0=两倍速……
+REPLAY_MAX_SPEED = 0
+REPLAY_REALTIME = 1.0
+DEFAULT_REPLAY_FPS = 30.0  # 视频未记录帧率/图片序列的默认帧率
+IMAGE_EXTS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff")
+
+
+def list_image_files(dir_path):
+    """图片序列目录中的图片（按文件名排序）"""
+    return [
+        os.path.join(dir_path, fn) for fn in sorted(os.listdir(dir_path))
+        if fn.lower().endswith(IMAGE_EXTS)
+    ]
+
+
+class ReplaySource:
+    """离线回放帧源：视频文件或图片序列目录，接口与摄像头凭证一致（read/failed/dropped_count/release）
+
+    时间戳按 start_time + 帧序号/帧率 合成，日志和状态分析按回放时间进行，
+    最快速度回放时结果与实时运行一致（8小时录像可在数分钟内重新分析）。
+    """
+
+    def __init__(self, path, speed=REPLAY_MAX_SPEED, fps=None, start_time=None):
+        self.path = path
+        self.speed = speed
+        self.device_index = None
+        self.failed = False      # 文件无法打开/读取失败
+        self.finished = False    # 已回放到结尾
+        self.dropped_count = 0   # 回放不丢帧（与摄像头接口保持一致）
+        self.seq = 0
+        self._cap = None
+        self._images = None
+
+        if os.path.isdir(path):
+            self._images = list_image_files(path)
+            if not self._images:
+                raise ValueError(f"No image found in replay directory: {path}")
+            self.frame_count = len(self._images)
+            self.fps = fps or DEFAULT_REPLAY_FPS
+            default_start = os.path.getmtime(self._images[0])
+        else:
+            self._cap = cv2.VideoCapture(path)
+            if not self._cap.isOpened():
+                self._cap.release()
+                raise ValueError(f"Cannot open replay video: {path}")
+            self.frame_count = int(self._cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            self.fps = fps or self._cap.get(cv2.CAP_PROP_FPS) or DEFAULT_REPLAY_FPS
+            # 录像文件修改时间约为录制结束时间
+            default_start = os.path.getmtime(path) - max(self.frame_count, 0) / self.fps
+        # 回放起始时间（合成时间戳的原点），默认取录制开始时间
+        self.start_time = default_start if start_time is None else start_time
+        self._wall_start = None
+
+    def _read_next(self):
+        """读取下一帧图像；结尾返回 None"""
+        if self._cap is not None:
+            ret, frame = self._cap.read()
+            return frame if ret else None
+        if self.seq >= len(self._images):
+            return None
+        frame = cv2.imread(self._images[self.seq])
+        if frame is None:
+            self.failed = True
+        return frame
+
+    def read(self, timeout=FRAME_WAIT_TIMEOUT):
+        """返回下一帧 FramePacket；回放结束/失败返回 None"""
+        if self.finished or self.failed:
+            return None
+        frame = self._read_next()
+        if frame is None:
+            self.finished = True
+            return None
+        timestamp = self.start_time + self.seq / self.fps
+        self.seq += 1
+
+        # 实时/倍速回放：按合成时间戳节拍等待
+        if self.speed:
+            if self._wall_start is None:
+                self._wall_start = time.monotonic()
+            delay = (timestamp - self.start_time) / self.speed - (time.monotonic() - self._wall_start)
+            if delay > 0:
+                time.sleep(delay)
+        return FramePacket(frame, timestamp, self.seq)
+
+    def release(self):
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
+        self.finished = True
+
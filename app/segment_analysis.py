@@ -0,0 +1,163 @@
+# segment_analysis.py
+import os
+import json
+import multiprocessing as mp
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# 日志分段并行解析（每个10分钟分段互相独立，各自产出可合并的部分统计）
+ANALYSIS_WORKERS = os.cpu_count() or 1  # 默认进程数
+PARALLEL_MIN_FILES = 4                  # 分段数少于此值时直接在当前进程解析
+MAP_CHUNK_SIZE = 4                      # 每次派发给子进程的分段数
+# 分段部分统计缓存（JSON，按 路径+大小+修改时间 判断分段是否变化；扩展名不是 .json/.jsonl，不会被当作日志）
+# 缓存位于用户日志目录，只存纯数据（不用 pickle，读取被篡改的缓存不会执行代码）
+SEGMENT_CACHE_VERSION = 4               # 部分统计结构变化时递增，旧缓存自动失效
+
+
+def find_log_files(root_dir, is_log_file):
+    """递归查找日志分段（按路径排序，保证解析与调试输出顺序稳定）"""
+    log_files = []
+    for dir_path, _, files in os.walk(root_dir):
+        for fn in files:
+            if is_log_file(fn):
+                log_files.append(os.path.join(dir_path, fn))
+    return sorted(log_files)
+
+
+def map_segments(parse_func, paths, workers=None, progress_callback=None):
+    """对每个分段调用 parse_func（模块级函数，可在子进程中调用），按输入顺序返回结果列表
+
+    workers>1 且分段足够多时使用进程池（spawn：界面进程中有Tk及多个线程，不能fork）；
+    进程池不可用时退回当前进程顺序解析。progress_callback(已完成数, 总数) 在调用线程中回调。
+    """
+    paths = list(paths)
+    total = len(paths)
+    workers = ANALYSIS_WORKERS if workers is None else workers
+    workers = max(1, min(workers, total))
+    results = []
+
+    def done(result):
+        results.append(result)
+        if progress_callback is not None:
+            progress_callback(len(results), total)
+
+    if workers > 1 and total >= PARALLEL_MIN_FILES:
+        try:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn")) as pool:
+                for result in pool.map(parse_func, paths, chunksize=MAP_CHUNK_SIZE):
+                    done(result)
+            return results
+        except (OSError, BrokenProcessPool) as e:
+            print(f"Process pool unavailable, parsing sequentially: {str(e)}")
+            results = []
+
+    for path in paths:
+        done(parse_func(path))
+    return results
+
+
+def _segment_stamp(path):
+    """分段文件标识（大小, 修改时间ns）；文件不存在返回 None"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+def _encode_state(state):
+    """部分统计状态 → 可JSON序列化的字典（NumPy数组记录 dtype 与数据）"""
+    encoded = {}
+    for key, value in state.items():
+        if isinstance(value, np.ndarray):
+            value = {"ndarray": value.dtype.str, "data": value.tolist()}
+        encoded[key] = value
+    return encoded
+
+
+def _decode_state(encoded):
+    """_encode_state 的逆变换"""
+    state = {}
+    for key, value in encoded.items():
+        if isinstance(value, dict) and "ndarray" in value:
+            value = np.array(value["data"], dtype=np.dtype(value["ndarray"]))
+        state[key] = value
+    return state
+
+
+def load_segment_cache(cache_path, version):
+    """读取缓存：{绝对路径: [大小, 修改时间ns, 部分统计状态dict]}；不存在/损坏/版本不符返回空字典"""
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get("version") != version:
+        return {}
+    segments = data.get("segments")
+    return segments if isinstance(segments, dict) else {}
+
+
+def save_segment_cache(cache_path, version, segments):
+    """写入缓存（先写临时文件再替换）；目录不可写时只提示不报错"""
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": version, "segments": segments}, f, ensure_ascii=False)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"Segment cache not saved: {str(e)}")
+
+
+def map_segments_cached(parse_func, paths, summary_cls, cache_path, workers=None, progress_callback=None,
+                        version=SEGMENT_CACHE_VERSION):
+    """同 map_segments，但未变化的分段直接使用缓存的部分统计，只解析新增/变化的分段
+
+    summary_cls 为部分统计类（缓存中只存其属性字典，与模块导入路径无关）。
+    返回 (按输入顺序的结果列表, 缓存命中数)；缓存只保留本次出现的分段。cache_path 为 None 时不使用缓存。
+    """
+    if cache_path is None:
+        return map_segments(parse_func, paths, workers, progress_callback), 0
+    paths = list(paths)
+    total = len(paths)
+    cache = load_segment_cache(cache_path, version)
+    results = [None] * total
+    stamps = [None] * total
+    misses = []
+    for i, path in enumerate(paths):
+        stamps[i] = _segment_stamp(path)
+        cached = cache.get(os.path.abspath(path))
+        summary = None
+        valid = isinstance(cached, list) and len(cached) == 3 and isinstance(cached[2], dict)
+        if stamps[i] is not None and valid and tuple(cached[:2]) == stamps[i]:
+            try:
+                state = _decode_state(cached[2])
+            except (AttributeError, TypeError, ValueError):
+                state = None
+            if state is not None:
+                summary = summary_cls.__new__(summary_cls)
+                summary.__dict__.update(state)
+        if summary is not None:
+            results[i] = summary
+        else:
+            misses.append(i)
+    hits = total - len(misses)
+    if progress_callback is not None and hits:
+        progress_callback(hits, total)
+
+    def miss_progress(done, _):
+        if progress_callback is not None:
+            progress_callback(hits + done, total)
+
+    parsed = map_segments(parse_func, [paths[i] for i in misses], workers, miss_progress) if misses else []
+    for i, summary in zip(misses, parsed):
+        results[i] = summary
+
+    if misses or len(cache) != total:
+        new_cache = {}
+        for path, stamp, summary in zip(paths, stamps, results):
+            if stamp is not None:
+                new_cache[os.path.abspath(path)] = [stamp[0], stamp[1], _encode_state(summary.__dict__)]
+        save_segment_cache(cache_path, version, new_cache)
+    return results, hits
@@ -0,0 +1,344 @@
+# segment_log.py
+import os
+import json
+import time
+import queue
+import calendar
+import threading
+from datetime import datetime, timedelta
+
+# 分段日志格式：JSON Lines（每行一个JSON对象，只追加不重写）
+SEGMENT_LOG_EXT = ".jsonl"
+# 分析工具可识别的日志扩展名（兼容旧版JSON数组文件）
+LOG_FILE_EXTS = (".json", SEGMENT_LOG_EXT)
+
+# 日志时间字段：timestamp 为本地时间字符串；epoch（可选）为整数Unix时间，分析工具优先使用以跳过字符串解析
+LOG_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+LOG_EPOCH_FIELD = "epoch"
+# 分析用时间刻度：本地时间秒数（以1970-01-01 00:00:00为零点的朴素时间，与 datetime 相减结果一致）
+LOCAL_TIME_ZERO = datetime(1970, 1, 1)
+
+# 后台写入线程默认配置
+LOG_QUEUE_SIZE = 2048        # 队列上限（条目批次数），满则丢弃或阻塞
+LOG_BATCH_SIZE = 64          # 累计条目数达到此值立即落盘
+LOG_FLUSH_INTERVAL = 1.0     # 最长落盘间隔（秒）
+# fsync策略：never=仅flush到系统缓存；batch=每批落盘后fsync；segment=分段切换/关闭时fsync
+FSYNC_NEVER = "never"
+FSYNC_BATCH = "batch"
+FSYNC_SEGMENT = "segment"
+LOG_FSYNC_POLICY = FSYNC_NEVER   # 默认fsync策略
+
+
+class SegmentLogWriter:
+    """追加写入的分段日志（每个10分钟分段保持一个打开的文件句柄）"""
+
+    def __init__(self, fsync_on_close=False):
+        self.current_path = None
+        self._file = None
+        self.fsync_on_close = fsync_on_close
+
+    def _open_segment(self, path):
+        """切换到新的分段文件（10分钟边界滚动）"""
+        self.close()
+        seg_dir = os.path.dirname(path)
+        if seg_dir:
+            os.makedirs(seg_dir, exist_ok=True)
+        self._file = open(path, 'a', encoding='utf-8')
+        self.current_path = path
+
+    def write_entries(self, path, entries, flush=True):
+        """追加若干条日志到指定分段（路径变化即滚动到新分段）"""
+        if path != self.current_path or self._file is None:
+            self._open_segment(path)
+        for entry in entries:
+            self._file.write(json.dumps(entry, ensure_ascii=False))
+            self._file.write("\n")
+        if flush:
+            self._file.flush()
+
+    def flush(self, fsync=False):
+        """刷新当前分段（可选fsync到磁盘）"""
+        if self._file is None:
+            return
+        self._file.flush()
+        if fsync:
+            os.fsync(self._file.fileno())
+
+    def write(self, path, entry):
+        """追加单条日志"""
+        self.write_entries(path, [entry])
+
+    def close(self):
+        """关闭当前分段文件"""
+        if self._file is not None:
+            try:
+                if self.fsync_on_close:
+                    self.flush(fsync=True)
+                self._file.close()
+            finally:
+                self._file = None
+                self.current_path = None
+
+
+class AsyncLogWriter:
+    """后台批量日志写入线程（有界队列；采集循环只入队，不访问文件系统）"""
+
+    _STOP = object()  # 停止标记
+
+    def __init__(self, max_queue=LOG_QUEUE_SIZE, batch_size=LOG_BATCH_SIZE,
+                 flush_interval=LOG_FLUSH_INTERVAL, fsync_policy=LOG_FSYNC_POLICY,
+                 block_on_full=False, on_error=None):
+        if fsync_policy not in (FSYNC_NEVER, FSYNC_BATCH, FSYNC_SEGMENT):
+            raise ValueError(f"Unknown fsync policy: {fsync_policy}")
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync_policy = fsync_policy
+        self.block_on_full = block_on_full  # True=队列满时阻塞等待（背压），False=直接丢弃
+        self.on_error = on_error            # 写入异常回调（在写入线程中调用）
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._writers = {}                  # 日志流名称 -> SegmentLogWriter
+        self._thread = None
+        self._stop_requested = False        # 已发送停止标记（写入线程尚未结束）
+
+        # 统计计数
+        self.submitted_count = 0     # 成功入队条目数
+        self.written_count = 0       # 已写入条目数
+        self.dropped_count = 0       # 队列满被丢弃的条目数
+        self.backpressure_count = 0  # 队列满导致采集线程等待的次数
+        self.error_count = 0         # 写入失败次数
+        self.last_error = None
+
+    def start(self):
+        """启动写入线程"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="AsyncLogWriter", daemon=True)
+        self._thread.start()
+
+    def submit(self, stream, path, entries):
+        """提交日志条目（stream区分日志流，path为目标分段文件）；返回是否入队成功"""
+        item = (stream, path, entries)
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            if not self.block_on_full:
+                self.dropped_count += len(entries)
+                return False
+            self.backpressure_count += 1
+            self._queue.put(item)
+        self.submitted_count += len(entries)
+        return True
+
+    def queue_depth(self):
+        """当前队列积压（批次数）"""
+        return self._queue.qsize()
+
+    def stop(self, timeout=5.0):
+        """停止写入线程（先写完队列中剩余日志）；超时仍未写完时上报错误并保留线程，返回是否已停止"""
+        thread = self._thread
+        if thread is None:
+            self._close_writers()
+            return True
+        if not self._stop_requested:
+            self._stop_requested = True
+            self._queue.put(self._STOP)
+        thread.join(timeout=timeout)
+        if thread.is_alive():
+            # 写入线程仍持有文件句柄，不能在此关闭；线程写完后自行关闭
+            self._handle_error(TimeoutError(
+                f"Log writer did not finish within {timeout}s ({self.queue_depth()} batches pending)"))
+            return False
+        self._thread = None
+        self._stop_requested = False
+        return True
+
+    def _get_writer(self, stream):
+        writer = self._writers.get(stream)
+        if writer is None:
+            writer = SegmentLogWriter(fsync_on_close=self.fsync_policy != FSYNC_NEVER)
+            self._writers[stream] = writer
+        return writer
+
+    def _write_batch(self, batch):
+        """按提交顺序写入一批日志，最后统一flush"""
+        touched = set()
+        for stream, path, entries in batch:
+            try:
+                self._get_writer(stream).write_entries(path, entries, flush=False)
+                self.written_count += len(entries)
+                touched.add(stream)
+            except Exception as e:
+                self._handle_error(e)
+        for stream in touched:
+            try:
+                self._writers[stream].flush(fsync=self.fsync_policy == FSYNC_BATCH)
+            except Exception as e:
+                self._handle_error(e)
+
+    def _handle_error(self, exc):
+        self.error_count += 1
+        self.last_error = exc
+        if self.on_error is not None:
+            try:
+                self.on_error(exc)
+            except Exception:
+                pass
+
+    def _close_writers(self):
+        for writer in self._writers.values():
+            try:
+                writer.close()
+            except Exception as e:
+                self._handle_error(e)
+        self._writers.clear()
+
+    def _run(self):
+        """写入线程主循环：数量或时间任一达到阈值即落盘"""
+        batch = []
+        pending = 0
+        last_flush = time.monotonic()
+        stopping = False
+        while not stopping:
+            timeout = max(0.0, self.flush_interval - (time.monotonic() - last_flush))
+            try:
+                item = self._queue.get(timeout=timeout)
+                if item is self._STOP:
+                    stopping = True
+                else:
+                    batch.append(item)
+                    pending += len(item[2])
+            except queue.Empty:
+                pass
+
+            if batch and (stopping or pending >= self.batch_size or
+                          time.monotonic() - last_flush >= self.flush_interval):
+                self._write_batch(batch)
+                batch = []
+                pending = 0
+                last_flush = time.monotonic()
+            elif not batch:
+                last_flush = time.monotonic()
+        self._close_writers()
+
+
+def is_log_file(file_name):
+    """判断是否为分段日志文件（.jsonl 新格式 / .json 旧格式）"""
+    return file_name.lower().endswith(LOG_FILE_EXTS)
+
+
+def parse_log_text(text):
+    """解析日志文本：兼容旧版JSON数组和JSON Lines"""
+    stripped = text.lstrip()
+    if not stripped:
+        return []
+    # 旧格式：整个文件是一个JSON数组
+    if stripped.startswith("["):
+        return json.loads(stripped)
+    # 新格式：每行一个JSON对象；最后一行可能因程序中断而不完整，直接忽略
+    entries = []
+    lines = stripped.splitlines()
+    for line_no, line in enumerate(lines):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            entries.append(json.loads(line))
+        except json.JSONDecodeError:
+            if line_no == len(lines) - 1:
+                break
+            raise
+    return entries
+
+
+def read_log_entries(file_path, encoding='utf-8'):
+    """读取分段日志文件，返回日志条目列表"""
+    with open(file_path, 'r', encoding=encoding) as f:
+        return parse_log_text(f.read())
+
+
+def iter_log_entries(file_path, encoding='utf-8'):
+    """逐条读取分段日志（JSON Lines 按行流式解析，内存与文件大小无关；旧版JSON数组整体读取）
+
+    与 parse_log_text 一致：最后一行不完整时忽略，中间行损坏时抛出异常。
+    """
+    with open(file_path, 'r', encoding=encoding) as f:
+        pending = None  # 解析失败的行（若其后还有内容则说明不是被截断的最后一行）
+        first = True
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if pending is not None:
+                raise pending
+            if first and line.startswith("["):
+                # 旧格式：整个文件是一个JSON数组
+                data = json.loads(line + f.read())
+                if not isinstance(data, list):
+                    raise ValueError("invalid JSON log (not a list)")
+                yield from data
+                return
+            first = False
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                pending = e
+
+
+def local_seconds_to_datetime(seconds):
+    """本地时间秒数 -> datetime"""
+    return LOCAL_TIME_ZERO + timedelta(seconds=float(seconds))
+
+
+def _parse_timestamp_text(text):
+    """固定格式 "YYYY-mm-dd HH:MM:SS" 按位置切片解析，格式不符时退回 strptime（非法值抛出 ValueError）"""
+    if (len(text) == 19 and text[4] == "-" and text[7] == "-" and text[10] == " "
+            and text[13] == ":" and text[16] == ":"):
+        try:
+            dt = datetime(int(text[0:4]), int(text[5:7]), int(text[8:10]),
+                          int(text[11:13]), int(text[14:16]), int(text[17:19]))
+        except ValueError:
+            dt = datetime.strptime(text, LOG_TIMESTAMP_FORMAT)
+    else:
+        dt = datetime.strptime(text, LOG_TIMESTAMP_FORMAT)
+    return (dt - LOCAL_TIME_ZERO).total_seconds()
+
+
+class TimestampDecoder:
+    """日志条目时间解码为本地时间秒数：有数值 epoch 字段时直接换算，否则解析 timestamp 字符串
+
+    日志按帧写入，连续条目大多属于同一秒，缓存上一个值即可跳过绝大多数解析。
+    """
+
+    _UNSET = object()
+
+    def __init__(self):
+        self._last_text = self._UNSET
+        self._last_text_value = None
+        self._last_epoch = None
+        self._last_epoch_value = None
+
+    def from_text(self, text):
+        """解析 timestamp 字符串（非字符串/格式错误抛出 TypeError/ValueError）"""
+        if text == self._last_text:
+            return self._last_text_value
+        if not isinstance(text, str):
+            raise TypeError(f"invalid timestamp: {text!r}")
+        value = _parse_timestamp_text(text)
+        self._last_text, self._last_text_value = text, value
+        return value
+
+    def from_epoch(self, epoch):
+        """Unix时间 -> 本地时间秒数（与 strftime(localtime(epoch)) 再解析的结果一致）"""
+        second = int(epoch)
+        if second == self._last_epoch:
+            return self._last_epoch_value
+        value = float(calendar.timegm(time.localtime(second)))
+        self._last_epoch, self._last_epoch_value = second, value
+        return value
+
+    def decode(self, entry):
+        """条目时间（本地时间秒数）"""
+        epoch = entry.get(LOG_EPOCH_FIELD)
+        if isinstance(epoch, (int, float)) and not isinstance(epoch, bool):
+            return self.from_epoch(epoch)
+        return self.from_text(entry["timestamp"])
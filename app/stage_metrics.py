@@ -0,0 +1,126 @@
+# stage_metrics.py
+import time
+import threading
+import numpy as np
+
+# 监控主循环各阶段
+STAGE_CAPTURE_WAIT = "capture_wait"   # 等待新帧
+STAGE_PREPROCESS = "preprocess"       # 裁剪/灰度/模糊/膨胀/二值化
+STAGE_GRID_COUNT = "grid_count"       # 积分图网格计数
+STAGE_CACHE = "cache"                 # 缓存追加/流式统计/过期清理
+STAGE_LOGGING = "logging"             # 日志条目构建与提交
+STAGE_ANALYSIS = "analysis"           # 充电盒状态分析
+STAGE_OVERLAY = "overlay"             # 网格/亮格绘制
+STAGE_DISPLAY = "display"             # 缩放/颜色转换/Tk图像
+STAGES = (STAGE_CAPTURE_WAIT, STAGE_PREPROCESS, STAGE_GRID_COUNT, STAGE_CACHE,
+          STAGE_LOGGING, STAGE_ANALYSIS, STAGE_OVERLAY, STAGE_DISPLAY)
+
+METRICS_WINDOW = 512         # 每个阶段保留最近的样本数（滚动直方图）
+PERCENTILES = (50, 95, 99)
+
+
+class RollingHistogram:
+    """最近 capacity 个耗时样本（秒）的滚动窗口（分位数由 _percentiles 在锁外计算）"""
+
+    def __init__(self, capacity=METRICS_WINDOW):
+        self._samples = np.zeros(capacity, dtype=np.float64)
+        self._pos = 0
+        self.count = 0   # 累计样本数
+        self.total = 0.0  # 累计耗时
+
+    def add(self, seconds):
+        self._samples[self._pos] = seconds
+        self._pos = (self._pos + 1) % len(self._samples)
+        self.count += 1
+        self.total += seconds
+
+    def samples(self):
+        """当前窗口内样本的副本（在持有锁时调用，分位数计算放到锁外）"""
+        return self._samples[:min(self.count, len(self._samples))].copy()
+
+
+def _percentiles(samples, percentiles=PERCENTILES):
+    if not len(samples):
+        return [0.0] * len(percentiles)
+    return np.percentile(samples, percentiles).tolist()
+
+
+class StageMetrics:
+    """监控各阶段耗时直方图 + 有效帧率（采集线程记录，界面/导出线程读取快照）"""
+
+    def __init__(self, window=METRICS_WINDOW, stages=STAGES):
+        self._lock = threading.Lock()
+        self.window = window
+        self.histograms = {stage: RollingHistogram(window) for stage in stages}
+        self._frame_times = np.zeros(window, dtype=np.float64)  # 最近帧的处理完成时间（单调时钟）
+        self._frame_pos = 0
+        self.frame_count = 0
+        self.dropped_frames = 0
+        self.started = time.monotonic()
+
+    def record(self, stage, seconds):
+        """记录一个阶段的耗时（秒）"""
+        with self._lock:
+            hist = self.histograms.get(stage)
+            if hist is None:
+                hist = self.histograms[stage] = RollingHistogram(self.window)
+            hist.add(seconds)
+
+    def mark_frame(self, dropped_frames=None):
+        """一帧处理完成（dropped_frames 为帧源累计丢帧数）"""
+        with self._lock:
+            self._frame_times[self._frame_pos] = time.monotonic()
+            self._frame_pos = (self._frame_pos + 1) % self.window
+            self.frame_count += 1
+            if dropped_frames is not None:
+                self.dropped_frames = dropped_frames
+
+    def _fps(self):
+        """最近窗口内的有效帧率"""
+        n = min(self.frame_count, self.window)
+        if n < 2:
+            return 0.0
+        newest = self._frame_times[(self._frame_pos - 1) % self.window]
+        oldest = self._frame_times[(self._frame_pos - n) % self.window]
+        return (n - 1) / (newest - oldest) if newest > oldest else 0.0
+
+    def snapshot(self):
+        """当前统计快照（毫秒）：{"fps", "frames", "dropped_frames", "stages": {阶段: {...}}}
+
+        锁内只复制样本和计数（采集线程每阶段都要取同一把锁），分位数在锁外计算。
+        """
+        with self._lock:
+            copies = [(stage, hist.count, hist.total, hist.samples())
+                      for stage, hist in self.histograms.items() if hist.count]
+            fps = self._fps()
+            frames = self.frame_count
+            dropped = self.dropped_frames
+        stages = {}
+        for stage, count, total, samples in copies:
+            p50, p95, p99 = _percentiles(samples, PERCENTILES)
+            stages[stage] = {
+                "count": count,
+                "mean_ms": round(total / count * 1000, 3),
+                "sum_s": round(total, 6),
+                "p50_ms": round(p50 * 1000, 3),
+                "p95_ms": round(p95 * 1000, 3),
+                "p99_ms": round(p99 * 1000, 3),
+            }
+        return {
+            "fps": round(fps, 2),
+            "frames": frames,
+            "dropped_frames": dropped,
+            "uptime": round(time.monotonic() - self.started, 1),
+            "stages": stages,
+        }
+
+
+def format_hud_lines(snapshot):
+    """HUD 显示文本（每阶段一行）"""
+    lines = [f"FPS {snapshot['fps']:.1f}  frames {snapshot['frames']}  dropped {snapshot['dropped_frames']}"]
+    for stage in STAGES:
+        stats = snapshot["stages"].get(stage)
+        if stats:
+            lines.append(f"{stage:<13} p50 {stats['p50_ms']:6.2f}  p95 {stats['p95_ms']:6.2f}  "
+                         f"p99 {stats['p99_ms']:6.2f} ms")
+    return lines
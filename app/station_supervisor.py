@@ -0,0 +1,354 @@
+# station_supervisor.py
+import os
+import json
+import time
+import queue
+import logging
+import threading
+import multiprocessing as mp
+from tkinter import Toplevel, Label, Button, Frame
+import tkinter.messagebox as messagebox
+from metrics_server import METRICS_PORT
+
+# 多工位配置：每个工位 = 一个摄像头 + 一个托盘（每个工位一个独立工作进程）
+CURRENT_SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIONS_CONFIG = os.path.join(CURRENT_SCRIPT_DIR, "stations.json")
+# stations.json 示例：
+# {"stations": [
+#     {"name": "A", "camera": 0, "monitor_type": "hearing_aid", "border_file": "hearing_aid_border.json"},
+#     {"name": "B", "camera": 1, "monitor_type": "charging_case", "border_file": "charging_case_border.json",
+#      "metrics_port": 9102}
+# ]}
+# 工位指标端口（各工作进程各自提供指标服务，station 标签为工位名）：配置 metrics_port；
+# 未配置且设置了 GRID_MONITOR_METRICS_PORT 时依次为 该端口+1、+2 …（该端口由主界面进程使用），都没有则不启动
+MONITOR_TYPES = ("hearing_aid", "charging_case")
+
+STATION_REPORT_INTERVAL = 0.5   # 工作进程上报间隔（秒）
+STATION_STALL_TIMEOUT = 5.0     # 超过此时间无上报视为卡住
+STATION_STOP_TIMEOUT = 5.0      # 停止时等待工作进程退出的时间
+STOP_POLL_INTERVAL = 0.2        # 工作进程检查停止信号的间隔
+RESULT_QUEUE_SIZE = 1024        # 上报队列上限（界面未及时读取时丢弃新消息，不阻塞工作进程）
+GUI_POLL_INTERVAL_MS = 200      # 界面轮询上报队列间隔
+
+# 上报消息类型
+MSG_STARTED = "started"
+MSG_RESULT = "result"
+MSG_ERROR = "error"
+MSG_STOPPED = "stopped"
+
+# 工位状态
+STATE_STARTING = "starting"
+STATE_RUNNING = "running"
+STATE_STALLED = "stalled"
+STATE_STOPPED = "stopped"
+STATE_EXITED = "exited"
+
+
+def load_stations(config_file=STATIONS_CONFIG):
+    """读取并校验工位配置，返回工位列表（配置有误时抛出 ValueError）"""
+    with open(config_file, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    stations = data.get("stations", []) if isinstance(data, dict) else data
+    if not stations:
+        raise ValueError("No station configured")
+
+    names, cameras, ports, result = set(), set(), set(), []
+    for i, item in enumerate(stations):
+        name = str(item.get("name", f"station{i + 1}"))
+        monitor_type = item.get("monitor_type")
+        if monitor_type not in MONITOR_TYPES:
+            raise ValueError(f"Station {name}: unknown monitor_type {monitor_type!r}")
+        if "camera" not in item:
+            raise ValueError(f"Station {name}: camera index missing")
+        camera = int(item["camera"])
+        if name in names:
+            raise ValueError(f"Duplicate station name: {name}")
+        if camera in cameras:
+            raise ValueError(f"Camera {camera} used by more than one station")
+        names.add(name)
+        cameras.add(camera)
+
+        metrics_port = item.get("metrics_port")
+        if metrics_port is None and METRICS_PORT:
+            metrics_port = METRICS_PORT + 1 + i
+        metrics_port = int(metrics_port) if metrics_port else None
+        if metrics_port is not None:
+            if metrics_port in ports or metrics_port == METRICS_PORT:
+                raise ValueError(f"Station {name}: metrics port {metrics_port} already in use")
+            ports.add(metrics_port)
+
+        border_file = item.get("border_file")
+        if border_file and not os.path.isabs(border_file):
+            border_file = os.path.join(os.path.dirname(os.path.abspath(config_file)), border_file)
+        result.append({
+            "name": name,
+            "camera": camera,
+            "monitor_type": monitor_type,
+            "border_file": border_file,
+            "metrics_port": metrics_port,
+        })
+    return result
+
+
+def _put_message(result_queue, msg):
+    """非阻塞上报（队列满时丢弃）"""
+    try:
+        result_queue.put_nowait(msg)
+        return True
+    except queue.Full:
+        return False
+
+
+class _QueueLogHandler(logging.Handler):
+    """将工作进程中的错误日志转发给监督进程"""
+
+    def __init__(self, station_name, result_queue):
+        super().__init__(level=logging.ERROR)
+        self.station_name = station_name
+        self.result_queue = result_queue
+
+    def emit(self, record):
+        _put_message(self.result_queue, {
+            "type": MSG_ERROR,
+            "station": self.station_name,
+            "time": time.time(),
+            "message": record.getMessage(),
+        })
+
+
+class _StationReporter:
+    """工作进程内的结果上报（按间隔节流，附带帧率/丢帧等健康信息）"""
+
+    def __init__(self, station_name, result_queue, interval=STATION_REPORT_INTERVAL):
+        self.station_name = station_name
+        self.result_queue = result_queue
+        self.interval = interval
+        self._last_report = 0.0
+        self._last_frames = 0
+        self.dropped_reports = 0
+
+    def __call__(self, monitor, bright_grids, grid_brightness):
+        now = time.time()
+        elapsed = now - self._last_report
+        if elapsed < self.interval:
+            return
+        fps = (monitor.frame_count - self._last_frames) / elapsed if self._last_report else 0.0
+        self._last_report = now
+        self._last_frames = monitor.frame_count
+
+        statuses = None
+        if monitor.current_statuses is not None:
+            statuses = [str(s) for s in monitor.current_statuses]
+        msg = {
+            "type": MSG_RESULT,
+            "station": self.station_name,
+            "time": now,
+            "bright_grids": [int(g) for g in bright_grids],
+            "brightness": [round(float(b), 4) for b in grid_brightness],
+            "statuses": statuses,
+            "fps": round(fps, 1),
+            "frames": monitor.frame_count,
+            "dropped_frames": monitor.camera.dropped_count if monitor.camera else 0,
+            "log_dropped": monitor.log_writer.dropped_count,
+            "dropped_reports": self.dropped_reports,
+        }
+        if not _put_message(self.result_queue, msg):
+            self.dropped_reports += 1
+
+
+def _station_worker(station, result_queue, stop_event):
+    """工作进程入口：无界面运行一个工位的网格监控"""
+    import grid_monitor  # 在子进程中导入（spawn启动时避免监督进程重复初始化）
+    import metrics_server
+
+    name = station["name"]
+    logging.getLogger("grid_monitor").addHandler(_QueueLogHandler(name, result_queue))
+    monitor = grid_monitor.GridMonitor(
+        None, station["monitor_type"],
+        camera_index=station["camera"],
+        border_file=station.get("border_file"),
+        station_id=name,
+        result_callback=_StationReporter(name, result_queue),
+    )
+
+    # 监听停止信号（轮询 is_set：进程退出时若仍阻塞在 Event.wait 上，会导致监督进程 set() 卡死）
+    def watch_stop():
+        while not stop_event.is_set():
+            time.sleep(STOP_POLL_INTERVAL)
+        monitor.stop_monitor()
+    threading.Thread(target=watch_stop, daemon=True).start()
+
+    # 本工位的指标服务（监控运行时自动注册，标签 station=工位名）
+    if station.get("metrics_port"):
+        try:
+            metrics_server.start_metrics_server(station["metrics_port"])
+        except OSError as e:
+            _put_message(result_queue, {"type": MSG_ERROR, "station": name, "time": time.time(),
+                                        "message": f"Metrics server failed to start: {str(e)}"})
+
+    _put_message(result_queue, {"type": MSG_STARTED, "station": name, "time": time.time(),
+                                "pid": os.getpid()})
+    ok = False
+    try:
+        ok = monitor.run_headless()
+    except Exception as e:
+        _put_message(result_queue, {"type": MSG_ERROR, "station": name, "time": time.time(),
+                                    "message": f"Worker crashed: {str(e)}"})
+    finally:
+        _put_message(result_queue, {"type": MSG_STOPPED, "station": name, "time": time.time(),
+                                    "ok": ok, "frames": monitor.frame_count})
+
+
+class StationSupervisor:
+    """多工位监督：每个工位一个工作进程，汇总各工位上报的结果与健康状态"""
+
+    def __init__(self, stations, stall_timeout=STATION_STALL_TIMEOUT):
+        self.stations = stations
+        self.stall_timeout = stall_timeout
+        # spawn：工作进程不继承界面进程的Tk/线程状态（与Windows行为一致）
+        self._ctx = mp.get_context("spawn")
+        self.result_queue = self._ctx.Queue(RESULT_QUEUE_SIZE)
+        self.stop_event = self._ctx.Event()
+        self.processes = {}
+        # 各工位最新状态：{name: {"state", "last_seen", "result", "errors", ...}}
+        self.station_states = {s["name"]: self._new_state(s) for s in stations}
+
+    @staticmethod
+    def _new_state(station):
+        return {
+            "station": station,
+            "state": STATE_STARTING,
+            "last_seen": time.time(),
+            "result": None,
+            "errors": [],
+            "pid": None,
+        }
+
+    def start(self):
+        """为每个工位启动工作进程"""
+        self.stop_event.clear()
+        for station in self.stations:
+            name = station["name"]
+            proc = self._ctx.Process(target=_station_worker, name=f"station-{name}",
+                                     args=(station, self.result_queue, self.stop_event),
+                                     daemon=True)
+            proc.start()
+            self.processes[name] = proc
+            self.station_states[name] = self._new_state(station)
+
+    def poll(self):
+        """读取所有已上报消息并更新工位状态（界面线程定时调用，不阻塞）"""
+        while True:
+            try:
+                msg = self.result_queue.get_nowait()
+            except queue.Empty:
+                break
+            state = self.station_states.get(msg.get("station"))
+            if state is None:
+                continue
+            state["last_seen"] = msg["time"]
+            msg_type = msg["type"]
+            if msg_type == MSG_STARTED:
+                state["pid"] = msg["pid"]
+            elif msg_type == MSG_RESULT:
+                state["state"] = STATE_RUNNING
+                state["result"] = msg
+            elif msg_type == MSG_ERROR:
+                state["errors"].append(msg["message"])
+            elif msg_type == MSG_STOPPED:
+                state["state"] = STATE_STOPPED
+
+        # 进程退出/卡住检测（单个工位卡住不影响其他工位）
+        now = time.time()
+        for name, state in self.station_states.items():
+            proc = self.processes.get(name)
+            if proc is None or state["state"] == STATE_STOPPED:
+                continue
+            if not proc.is_alive():
+                state["state"] = STATE_EXITED
+            elif now - state["last_seen"] > self.stall_timeout:
+                state["state"] = STATE_STALLED
+        return self.station_states
+
+    def stop(self, timeout=STATION_STOP_TIMEOUT):
+        """通知所有工作进程停止；超时未退出的强制结束"""
+        self.stop_event.set()
+        deadline = time.time() + timeout
+        for proc in self.processes.values():
+            proc.join(max(0.0, deadline - time.time()))
+        for proc in self.processes.values():
+            if proc.is_alive():
+                proc.terminate()
+                proc.join(1.0)
+        self.poll()
+        self.processes = {}
+
+
+def format_station_state(state):
+    """工位状态显示文本"""
+    station = state["station"]
+    lines = [f"[{station['name']}] camera {station['camera']} / {station['monitor_type']} - {state['state']}"]
+    if station.get("metrics_port"):
+        lines[0] += f"  (metrics :{station['metrics_port']})"
+    result = state["result"]
+    if result is not None:
+        lines.append(f"fps {result['fps']:.1f}  frames {result['frames']}  "
+                     f"dropped frames {result['dropped_frames']}  log dropped {result['log_dropped']}")
+        if result["statuses"] is not None:
+            counts = {}
+            for s in result["statuses"]:
+                counts[s] = counts.get(s, 0) + 1
+            lines.append("status: " + ", ".join(f"{k} {v}" for k, v in sorted(counts.items())))
+        lines.append(f"bright grids ({len(result['bright_grids'])}): {result['bright_grids']}")
+    if state["errors"]:
+        lines.append(f"error: {state['errors'][-1]}")
+    return "\n".join(lines)
+
+
+def open_station_supervisor_window(root, config_file=STATIONS_CONFIG):
+    """打开多工位监控窗口"""
+    try:
+        stations = load_stations(config_file)
+    except FileNotFoundError:
+        messagebox.showerror("Station Config", f"Station config not found: {config_file}")
+        return
+    except Exception as e:
+        messagebox.showerror("Station Config", f"Station config error: {str(e)}")
+        return
+
+    supervisor = StationSupervisor(stations)
+    supervisor.start()
+
+    win = Toplevel(root)
+    win.title("Multi-Station Grid Monitor")
+    win.geometry("800x600")
+
+    labels = {}
+    for station in stations:
+        frame = Frame(win, bd=1, relief="groove")
+        frame.pack(side="top", fill="x", padx=10, pady=5)
+        label = Label(frame, justify="left", anchor="w", font=("Consolas", 10), wraplength=760)
+        label.pack(fill="x", padx=5, pady=5)
+        labels[station["name"]] = label
+
+    def close():
+        supervisor.stop()
+        win.destroy()
+
+    Button(win, text="Stop All Stations", bg="#f44336", fg="white",
+           font=("Microsoft YaHei", 12, "bold"), command=close).pack(side="bottom", fill="x", padx=10, pady=10)
+    win.protocol("WM_DELETE_WINDOW", close)
+
+    def refresh():
+        if not win.winfo_exists():
+            return
+        states = supervisor.poll()
+        for name, label in labels.items():
+            state = states[name]
+            color = "black"
+            if state["state"] in (STATE_STALLED, STATE_EXITED) or state["errors"]:
+                color = "red"
+            label.config(text=format_station_state(state), fg=color)
+        win.after(GUI_POLL_INTERVAL_MS, refresh)
+
+    refresh()
@@ -0,0 +1,341 @@
+# synthetic_tray.py
+import os
+import io
+import json
+import time
+import argparse
+import tempfile
+import contextlib
+import cv2
+import numpy as np
+from frame_grabber import FramePacket
+from grid_geometry import build_grid_regions
+from charging_classifier import STATUS_NO_STATUS, STATUS_CHARGING, STATUS_CHARGED
+
+# LED行为
+BEHAVIOR_OFF = "off"
+BEHAVIOR_STEADY = "steady"
+BEHAVIOR_BLINKING = "blinking"
+BEHAVIOR_RAMPING = "ramping"
+BEHAVIORS = (BEHAVIOR_OFF, BEHAVIOR_STEADY, BEHAVIOR_BLINKING, BEHAVIOR_RAMPING)
+
+# 各行为对应的充电盒真实状态（常亮=充电完成，闪烁/渐亮=充电中）
+EXPECTED_STATUS = {
+    BEHAVIOR_OFF: STATUS_NO_STATUS,
+    BEHAVIOR_STEADY: STATUS_CHARGED,
+    BEHAVIOR_BLINKING: STATUS_CHARGING,
+    BEHAVIOR_RAMPING: STATUS_CHARGING,
+}
+
+# 渲染配置
+DEFAULT_FRAME_SIZE = (1920, 1080)  # (宽, 高)
+DEFAULT_FPS = 30.0
+AMBIENT_LEVEL = 12          # 背景灰度
+LED_RADIUS_RATIO = 0.18     # 光斑半径 / 网格短边
+LIT_MIN_LEVEL = 0.2         # 亮度低于此值的LED视为不可见（真值标签）
+LABELS_FILE = "labels.jsonl"
+CELLS_FILE = "cells.json"
+BORDER_FILE = "border.json"
+
+
+class LedCell:
+    """单个网格的LED行为：intensity(t) 返回 0~1 的亮度"""
+
+    def __init__(self, behavior=BEHAVIOR_OFF, level=1.0, period=1.0, phase=0.0, duty=0.5):
+        if behavior not in BEHAVIORS:
+            raise ValueError(f"Unknown LED behavior: {behavior}")
+        self.behavior = behavior
+        self.level = level      # 峰值亮度
+        self.period = period    # 闪烁/渐亮周期（秒）
+        self.phase = phase      # 相位偏移（秒）
+        self.duty = duty        # 闪烁占空比
+
+    def intensity(self, t):
+        if self.behavior == BEHAVIOR_OFF:
+            return 0.0
+        if self.behavior == BEHAVIOR_STEADY:
+            return self.level
+        pos = ((t + self.phase) % self.period) / self.period
+        if self.behavior == BEHAVIOR_BLINKING:
+            return self.level if pos < self.duty else 0.0
+        return self.level * pos  # 锯齿渐亮
+
+    @property
+    def expected_status(self):
+        return EXPECTED_STATUS[self.behavior]
+
+    def to_dict(self):
+        return {"behavior": self.behavior, "level": self.level, "period": self.period,
+                "phase": self.phase, "duty": self.duty}
+
+
+def random_cells(grid_count, seed=None, weights=(0.25, 0.25, 0.25, 0.25)):
+    """随机分配各网格的LED行为（weights 依次对应 off/steady/blinking/ramping）"""
+    rng = np.random.default_rng(seed)
+    cells = []
+    for behavior in rng.choice(BEHAVIORS, size=grid_count, p=np.asarray(weights) / np.sum(weights)):
+        cells.append(LedCell(
+            str(behavior),
+            level=float(rng.uniform(0.6, 1.0)),
+            period=float(rng.uniform(0.8, 3.0)),
+            phase=float(rng.uniform(0.0, 3.0)),
+        ))
+    return cells
+
+
+def default_border_rect(monitor_type, frame_size=DEFAULT_FRAME_SIZE):
+    """默认托盘边框：画面居中（助听器网格右侧超出边框半格，预留空间）"""
+    frame_w, frame_h = frame_size
+    w = int(frame_w * (0.7 if monitor_type == "hearing_aid" else 0.6))
+    h = int(frame_h * 0.6)
+    return [int((frame_w - w) * (0.35 if monitor_type == "hearing_aid" else 0.5)), (frame_h - h) // 2, w, h]
+
+
+def uniform_grid_regions(border_rect, rows, cols):
+    """任意行列数的均匀网格（用于数百网格的压力测试）"""
+    x, y, w, h = border_rect
+    regions = []
+    for row in range(rows):
+        for col in range(cols):
+            regions.append((int(x + col * w / cols), int(y + row * h / rows),
+                            int(x + (col + 1) * w / cols), int(y + (row + 1) * h / rows),
+                            row * cols + col))
+    return regions
+
+
+class SyntheticTray:
+    """合成托盘画面：按网格区域渲染LED光斑，支持噪声、曝光漂移和相机抖动"""
+
+    def __init__(self, monitor_type="charging_case", frame_size=DEFAULT_FRAME_SIZE, border_rect=None,
+                 grid_regions=None, cells=None, noise_std=0.0, drift_amplitude=0.0, drift_period=60.0,
+                 shake_px=0, seed=None):
+        self.monitor_type = monitor_type
+        self.frame_size = frame_size
+        self.border_rect = border_rect or default_border_rect(monitor_type, frame_size)
+        self.grid_regions = grid_regions or build_grid_regions(monitor_type, self.border_rect)
+        self.cells = cells or random_cells(len(self.grid_regions), seed)
+        if len(self.cells) != len(self.grid_regions):
+            raise ValueError("cells and grid regions count mismatch")
+        self.noise_std = noise_std              # 高斯噪声标准差（灰度）
+        self.drift_amplitude = drift_amplitude  # 曝光漂移幅度（比例，0.2=±20%）
+        self.drift_period = drift_period        # 曝光漂移周期（秒）
+        self.shake_px = shake_px                # 相机抖动最大平移（像素）
+        self._rng = np.random.default_rng(seed)
+        self._sprites = {}
+        self._noise = None
+
+    def _sprite(self, w, h):
+        """网格中心的高斯光斑模板（峰值1.0，按亮度缩放后亮区随亮度扩大）"""
+        key = (w, h)
+        if key not in self._sprites:
+            sigma = max(1.0, min(w, h) * LED_RADIUS_RATIO)
+            yy, xx = np.mgrid[0:h, 0:w].astype(np.float32)
+            self._sprites[key] = np.exp(-(((xx - w / 2) ** 2) + ((yy - h / 2) ** 2)) / (2 * sigma ** 2))
+        return self._sprites[key]
+
+    def exposure(self, t):
+        """曝光系数（正弦漂移）"""
+        if not self.drift_amplitude:
+            return 1.0
+        return 1.0 + self.drift_amplitude * np.sin(2 * np.pi * t / self.drift_period)
+
+    def render(self, t):
+        """渲染 t 秒时的画面（BGR）"""
+        frame_w, frame_h = self.frame_size
+        exposure = self.exposure(t)
+        gray = np.full((frame_h, frame_w), min(255, int(AMBIENT_LEVEL * exposure)), dtype=np.uint8)
+        for (x1, y1, x2, y2, _), cell in zip(self.grid_regions, self.cells):
+            level = cell.intensity(t) * exposure
+            if level <= 0 or x2 <= x1 or y2 <= y1:
+                continue
+            x1, y1 = max(0, x1), max(0, y1)
+            x2, y2 = min(frame_w, x2), min(frame_h, y2)
+            if x2 <= x1 or y2 <= y1:
+                continue
+            blob = np.clip(self._sprite(x2 - x1, y2 - y1) * (255.0 * level), 0, 255).astype(np.uint8)
+            region = gray[y1:y2, x1:x2]
+            np.maximum(region, blob, out=region)
+
+        if self.noise_std:
+            if self._noise is None:
+                self._noise = np.empty((frame_h, frame_w), dtype=np.int16)
+            cv2.randn(self._noise, 0, self.noise_std)
+            noisy = gray.astype(np.int16)
+            noisy += self._noise
+            gray = np.clip(noisy, 0, 255).astype(np.uint8)
+
+        if self.shake_px:
+            dx, dy = self._rng.integers(-self.shake_px, self.shake_px + 1, size=2)
+            m = np.float32([[1, 0, dx], [0, 1, dy]])
+            gray = cv2.warpAffine(gray, m, (frame_w, frame_h), borderValue=int(AMBIENT_LEVEL))
+        return cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
+
+    def labels(self, t):
+        """t 秒时的真值：点亮的网格序号"""
+        return [int(r[4]) for r, cell in zip(self.grid_regions, self.cells)
+                if cell.intensity(t) >= LIT_MIN_LEVEL]
+
+    def expected_statuses(self):
+        """各网格的真实充电状态"""
+        return [cell.expected_status for cell in self.cells]
+
+    def border_config(self):
+        """与边框配置文件相同的结构（供 GridMonitor.load_config 读取）"""
+        return {"contours": [{"bounding_rect": list(self.border_rect)}]}
+
+    def source(self, frame_count, fps=DEFAULT_FPS, start_time=None):
+        """作为帧源（接口同摄像头凭证/ReplaySource）"""
+        return SyntheticSource(self, frame_count, fps, start_time)
+
+    def write_sequence(self, out_dir, frame_count, fps=DEFAULT_FPS):
+        """写出图片序列（可用 ReplaySource 回放）+ 真值标签 + 网格配置"""
+        os.makedirs(out_dir, exist_ok=True)
+        with open(os.path.join(out_dir, BORDER_FILE), "w", encoding="utf-8") as f:
+            json.dump(self.border_config(), f)
+        with open(os.path.join(out_dir, CELLS_FILE), "w", encoding="utf-8") as f:
+            json.dump({
+                "monitor_type": self.monitor_type,
+                "fps": fps,
+                "cells": [dict(c.to_dict(), grid_id=int(r[4]), expected_status=c.expected_status)
+                          for r, c in zip(self.grid_regions, self.cells)],
+            }, f, ensure_ascii=False, indent=2)
+        with open(os.path.join(out_dir, LABELS_FILE), "w", encoding="utf-8") as f:
+            for i in range(frame_count):
+                t = i / fps
+                cv2.imwrite(os.path.join(out_dir, f"{i:06d}.png"), self.render(t))
+                f.write(json.dumps({"frame": i, "t": round(t, 4), "lit_grids": self.labels(t)}) + "\n")
+
+    def write_video(self, video_path, frame_count, fps=DEFAULT_FPS):
+        """写出视频（标签写入同名 .labels.jsonl）"""
+        writer = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*"mp4v"), fps, tuple(self.frame_size))
+        if not writer.isOpened():
+            raise ValueError(f"Cannot create video: {video_path}")
+        try:
+            with open(video_path + ".labels.jsonl", "w", encoding="utf-8") as f:
+                for i in range(frame_count):
+                    t = i / fps
+                    writer.write(self.render(t))
+                    f.write(json.dumps({"frame": i, "t": round(t, 4), "lit_grids": self.labels(t)}) + "\n")
+        finally:
+            writer.release()
+
+
+class SyntheticSource:
+    """合成画面帧源：按帧率合成时间戳，渲染完 frame_count 帧后结束"""
+
+    def __init__(self, tray, frame_count, fps=DEFAULT_FPS, start_time=None):
+        self.tray = tray
+        self.frame_count = frame_count
+        self.fps = fps
+        self.start_time = time.time() if start_time is None else start_time
+        self.device_index = None
+        self.failed = False
+        self.finished = False
+        self.dropped_count = 0
+        self.seq = 0
+
+    def read(self, timeout=None):
+        if self.finished or self.seq >= self.frame_count:
+            self.finished = True
+            return None
+        t = self.seq / self.fps
+        self.seq += 1
+        return FramePacket(self.tray.render(t), self.start_time + t, self.seq)
+
+    def release(self):
+        self.finished = True
+
+
+def evaluate(tray, frame_count, fps=DEFAULT_FPS, quiet=True):
+    """用合成画面跑完整监控流程（亮度检测+状态分析），返回吞吐量与判定准确率"""
+    import grid_monitor  # 延迟导入（生成画面不依赖界面模块）
+
+    frame_hits = frame_misses = frame_false = 0
+    status_total = status_correct = 0
+    confusion = {}
+    expected = tray.expected_statuses()
+    source = tray.source(frame_count, fps)
+    last_analysis = [0]
+
+    def on_result(monitor, bright_grids, grid_brightness):
+        nonlocal frame_hits, frame_misses, frame_false, status_total, status_correct
+        truth = set(tray.labels((monitor.frame_count - 1) / fps))
+        detected = set(int(g) for g in bright_grids)
+        frame_hits += len(truth & detected)
+        frame_misses += len(truth - detected)
+        frame_false += len(detected - truth)
+        # 每次状态分析后对比真实状态
+        if monitor.monitor_type == "charging_case" and monitor.last_analysis_time != last_analysis[0]:
+            last_analysis[0] = monitor.last_analysis_time
+            if monitor.current_statuses is None:
+                return
+            for want, got in zip(expected, monitor.current_statuses):
+                status_total += 1
+                status_correct += want == got
+                key = f"{want}->{got}"
+                confusion[key] = confusion.get(key, 0) + 1
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        border_file = os.path.join(tmp_dir, BORDER_FILE)
+        with open(border_file, "w", encoding="utf-8") as f:
+            json.dump(tray.border_config(), f)
+        # 显式传入托盘网格区域（均匀网格等非默认布局按托盘实际区域检测）
+        monitor = grid_monitor.GridMonitor(None, tray.monitor_type, border_file=border_file,
+                                           frame_source=source, log_dir=tmp_dir, result_callback=on_result,
+                                           grid_regions=tray.grid_regions)
+        started = time.perf_counter()
+        output = io.StringIO() if quiet else None
+        with contextlib.redirect_stdout(output) if quiet else contextlib.nullcontext():
+            monitor.run_headless()
+        elapsed = time.perf_counter() - started
+
+    return {
+        "monitor_type": tray.monitor_type,
+        "frame_size": list(tray.frame_size),
+        "grid_count": len(tray.grid_regions),
+        "frames": monitor.frame_count,
+        "seconds": round(elapsed, 3),
+        "fps": round(monitor.frame_count / elapsed, 1) if elapsed > 0 else 0.0,
+        "bright_recall": round(frame_hits / (frame_hits + frame_misses), 4) if frame_hits + frame_misses else None,
+        "bright_precision": round(frame_hits / (frame_hits + frame_false), 4) if frame_hits + frame_false else None,
+        "status_accuracy": round(status_correct / status_total, 4) if status_total else None,
+        "status_confusion": confusion,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic tray frame generator / accuracy evaluation")
+    parser.add_argument("--type", dest="monitor_type", default="charging_case",
+                        choices=("charging_case", "hearing_aid"))
+    parser.add_argument("--size", default="1920x1080", help="frame size WxH")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--fps", type=float, default=DEFAULT_FPS)
+    parser.add_argument("--noise", type=float, default=0.0, help="gaussian noise std (gray levels)")
+    parser.add_argument("--drift", type=float, default=0.0, help="exposure drift amplitude (0.2 = ±20%%)")
+    parser.add_argument("--shake", type=int, default=0, help="camera shake (max pixels)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--rows", type=int, default=0, help="uniform grid rows (0 = layout of --type)")
+    parser.add_argument("--cols", type=int, default=0, help="uniform grid columns (0 = layout of --type)")
+    parser.add_argument("--out", help="write image sequence + labels to this directory")
+    parser.add_argument("--video", help="write video (+ .labels.jsonl) to this path")
+    parser.add_argument("--evaluate", action="store_true", help="run monitor pipeline and report accuracy")
+    args = parser.parse_args()
+
+    frame_size = tuple(int(v) for v in args.size.lower().split("x"))
+    if (args.rows > 0) != (args.cols > 0):
+        parser.error("--rows and --cols must be given together")
+    border_rect = default_border_rect(args.monitor_type, frame_size)
+    grid_regions = uniform_grid_regions(border_rect, args.rows, args.cols) if args.rows else None
+    tray = SyntheticTray(args.monitor_type, frame_size=frame_size, border_rect=border_rect,
+                         grid_regions=grid_regions, noise_std=args.noise,
+                         drift_amplitude=args.drift, shake_px=args.shake, seed=args.seed)
+    if args.out:
+        tray.write_sequence(args.out, args.frames, args.fps)
+    if args.video:
+        tray.write_video(args.video, args.frames, args.fps)
+    if args.evaluate or not (args.out or args.video):
+        print(json.dumps(evaluate(tray, args.frames, args.fps), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
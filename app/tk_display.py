@@ -0,0 +1,77 @@
+# tk_display.py
+import time
+import threading
+import cv2
+import numpy as np
+from PIL import Image, ImageTk
+
+DISPLAY_FPS = 15            # 预览刷新上限（与分析帧率无关）
+UI_POLL_INTERVAL_MS = 15    # 界面线程检查新帧/消息的间隔
+
+
+class FrameMailbox:
+    """单槽位帧邮箱：采集线程投递（只保留最新一帧），界面线程取走；不调用任何Tk接口
+
+    三个RGB缓冲轮换使用：界面线程正在显示的、槽位中待显示的、采集线程正在写入的，互不覆盖。
+    """
+
+    def __init__(self, size, max_fps=DISPLAY_FPS):
+        w, h = size
+        self.size = size
+        self.min_interval = 1.0 / max_fps if max_fps else 0.0
+        self._lock = threading.Lock()
+        self._buffers = [np.empty((h, w, 3), dtype=np.uint8) for _ in range(3)]
+        self._slot = None       # 待显示缓冲序号
+        self._in_use = None     # 界面线程正在显示的缓冲序号
+        self._last_post = 0.0
+        self.posted_count = 0
+        self.skipped_count = 0  # 界面未取走即被新帧覆盖的帧数
+
+    def wants_frame(self):
+        """是否到了下一次显示时间（未到则采集线程可跳过缩放/绘制等显示开销）"""
+        return time.monotonic() - self._last_post >= self.min_interval
+
+    def post(self, frame_bgr):
+        """投递一帧（BGR，尺寸与 size 一致），转换为RGB写入空闲缓冲"""
+        with self._lock:
+            busy = {self._slot, self._in_use}
+            idx = next(i for i in range(3) if i not in busy)
+        cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB, dst=self._buffers[idx])
+        with self._lock:
+            if self._slot is not None:
+                self.skipped_count += 1
+            self._slot = idx
+            self.posted_count += 1
+        self._last_post = time.monotonic()
+
+    def take(self):
+        """界面线程取走最新一帧（无新帧返回 None）；返回的缓冲在下次 take 前不会被覆盖"""
+        with self._lock:
+            idx = self._slot
+            if idx is None:
+                return None
+            self._slot = None
+            self._in_use = idx
+        return self._buffers[idx]
+
+
+class TkFrameView:
+    """在Label上显示邮箱中的帧（仅在界面线程调用）：复用同一个PhotoImage，按需paste"""
+
+    def __init__(self, label, mailbox):
+        self.label = label
+        self.mailbox = mailbox
+        w, h = mailbox.size
+        self.photo = ImageTk.PhotoImage("RGB", (w, h))
+        self.label.config(image=self.photo)
+        self.shown_count = 0
+
+    def refresh(self):
+        """有新帧则显示；返回是否更新"""
+        rgb = self.mailbox.take()
+        if rgb is None:
+            return False
+        h, w = rgb.shape[:2]
+        self.photo.paste(Image.frombuffer("RGB", (w, h), rgb, "raw", "RGB", 0, 1))
+        self.shown_count += 1
+        return True
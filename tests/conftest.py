@@ -0,0 +1,28 @@
+# conftest.py
+import os
+import sys
+import json
+
+import pytest
+
+# 各模块在 app/ 下按顶层模块互相导入（与直接运行脚本一致）
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app")
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+
+@pytest.fixture
+def make_monitor(tmp_path):
+    """在临时目录中创建无界面 GridMonitor（边框配置、日志目录均在临时目录），并完成网格初始化"""
+    import grid_monitor
+
+    def factory(monitor_type, border_rect, grid_regions=None, **kwargs):
+        border_file = tmp_path / f"{monitor_type}_border.json"
+        border_file.write_text(json.dumps({"contours": [{"bounding_rect": list(border_rect)}]}), encoding="utf-8")
+        monitor = grid_monitor.GridMonitor(None, monitor_type, border_file=str(border_file), log_dir=str(tmp_path),
+                                           grid_regions=grid_regions, **kwargs)
+        monitor.load_config()
+        monitor.init_grid_regions()
+        return monitor
+
+    return factory
@@ -0,0 +1,63 @@
+# test_camera_discovery.py
+import json
+
+import camera_discovery
+
+
+class FakeProbe:
+    """按缓存配置打开：available 中的设备成功"""
+    available = set()
+
+    def __init__(self, device_index, attempts, timeout):
+        self.device_index = device_index
+
+    def start(self):
+        return self
+
+    def result(self):
+        if self.device_index in self.available:
+            return f"cap{self.device_index}", {"device_index": self.device_index, "backend": "ANY"}
+        return None, None
+
+
+def setup_cameras(tmp_path, monkeypatch, cached, available):
+    """cached: 有缓存配置的设备；available: 实际可打开的设备。返回探测记录"""
+    profile_path = tmp_path / "camera_profile.json"
+    devices = {str(idx): {"device_index": idx, "backend": "ANY", "width": 640, "height": 480} for idx in cached}
+    profile_path.write_text(json.dumps({"devices": devices}), encoding="utf-8")
+    monkeypatch.setattr(FakeProbe, "available", set(available))
+    monkeypatch.setattr(camera_discovery, "_Probe", FakeProbe)
+    probed = []
+
+    def discover(candidates, width, height, fps):
+        probed.append(list(candidates))
+        for idx in candidates:
+            if idx in available:
+                return f"cap{idx}", {"device_index": idx, "backend": "ANY"}
+        return None, None
+
+    monkeypatch.setattr(camera_discovery, "discover_camera", discover)
+    return str(profile_path), probed
+
+
+def test_uncached_higher_priority_probed_first(tmp_path, monkeypatch):
+    """摄像头1无缓存、摄像头0有缓存：先探测1，可用时打开1并写入缓存"""
+    profile_path, probed = setup_cameras(tmp_path, monkeypatch, cached=[0], available=[0, 1])
+    cap, profile = camera_discovery.open_camera([1, 0], 640, 480, 30, profile_path=profile_path)
+    assert (cap, probed) == ("cap1", [[1]])
+    assert set(camera_discovery.load_profiles(profile_path)) == {"0", "1"}
+
+
+def test_cached_fallback_when_higher_priority_missing(tmp_path, monkeypatch):
+    """摄像头1不可用时回退到缓存的摄像头0，不再重复探测"""
+    profile_path, probed = setup_cameras(tmp_path, monkeypatch, cached=[0], available=[0])
+    cap, _ = camera_discovery.open_camera([1, 0], 640, 480, 30, profile_path=profile_path)
+    assert (cap, probed) == ("cap0", [[1]])
+
+
+def test_stale_cache_reprobed(tmp_path, monkeypatch):
+    """缓存失效的设备被删除并按优先级重新探测"""
+    profile_path, probed = setup_cameras(tmp_path, monkeypatch, cached=[1, 0], available=[])
+    assert camera_discovery.open_camera([1, 0], 640, 480, 30, profile_path=profile_path) == (None, None)
+    assert probed == [[1], [0]]
+    assert camera_discovery.load_profiles(profile_path) == {}
@@ -0,0 +1,55 @@
+# test_charging_classifier.py
+import numpy as np
+
+import grid_monitor
+from charging_classifier import classify_window, STATUS_NO_STATUS, STATUS_CHARGING, STATUS_CHARGED
+
+
+def fill_window(monitor, rng, samples=40):
+    """按网格写入不同类型的亮度序列：暗、常亮、上升/下降/随机波动、阈值附近"""
+    grid_count = monitor.grid_count
+    t = np.arange(samples, dtype=np.float64)
+    values = np.empty((samples, grid_count))
+    for grid_idx in range(grid_count):
+        kind = grid_idx % 6
+        if kind == 0:
+            series = rng.random(samples) * grid_monitor.BRIGHT_PIXEL_RATIO * 0.5
+        elif kind == 1:
+            series = 0.3 + rng.normal(0, 0.002, samples)
+        elif kind == 2:
+            series = 0.05 + t * 0.01
+        elif kind == 3:
+            series = 0.5 - t * 0.01
+        elif kind == 4:
+            series = rng.random(samples) * 0.4
+        else:
+            series = grid_monitor.BRIGHT_PIXEL_RATIO * (1 + rng.normal(0, 0.02, samples))
+        values[:, grid_idx] = series
+    for i in range(samples):
+        monitor.grid_brightness_cache.append(1700000000.0 + i / 10, values[i])
+    return values
+
+
+def test_classify_window_matches_single_grid(make_monitor):
+    """向量化整窗判定与逐网格判定（状态与详情）一致"""
+    rng = np.random.default_rng(3)
+    monitor = make_monitor("charging_case", [100, 100, 400, 300])
+    fill_window(monitor, rng)
+    _, window_values = monitor.grid_brightness_cache.window()
+    statuses, details = classify_window(window_values, grid_monitor.BRIGHT_PIXEL_RATIO,
+                                        grid_monitor.STABILITY_THRESHOLD)
+    assert {STATUS_NO_STATUS, STATUS_CHARGING, STATUS_CHARGED} <= set(statuses)
+    for grid_idx in range(monitor.grid_count):
+        status, detail = monitor.analyze_single_grid_status(grid_idx)
+        assert statuses[grid_idx] == status
+        assert details[grid_idx] == detail
+
+
+def test_classify_window_insufficient_samples(make_monitor):
+    """样本不足时两种判定都返回无状态"""
+    monitor = make_monitor("charging_case", [100, 100, 400, 300])
+    monitor.grid_brightness_cache.append(1700000000.0, np.full(monitor.grid_count, 0.5))
+    _, window_values = monitor.grid_brightness_cache.window()
+    statuses, _ = classify_window(window_values, grid_monitor.BRIGHT_PIXEL_RATIO, grid_monitor.STABILITY_THRESHOLD)
+    for grid_idx in range(monitor.grid_count):
+        assert monitor.analyze_single_grid_status(grid_idx)[0] == statuses[grid_idx] == STATUS_NO_STATUS
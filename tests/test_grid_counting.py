@@ -0,0 +1,75 @@
+# test_grid_counting.py
+import cv2
+import numpy as np
+import pytest
+
+import grid_monitor
+from grid_geometry import GridGeometry, build_grid_regions
+from synthetic_tray import SyntheticTray, default_border_rect, uniform_grid_regions
+
+FRAME_SIZE = (640, 480)
+
+
+def full_frame_ratios(frame, grid_regions):
+    """参考实现：整帧预处理后逐网格切片计数（向量化/ROI裁剪之前的算法）"""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    gray = cv2.GaussianBlur(gray, grid_monitor.BLUR_KERNEL_SIZE, 0)
+    gray = cv2.dilate(gray, np.ones(grid_monitor.DILATE_KERNEL_SIZE, np.uint8), iterations=1)
+    _, binary = cv2.threshold(gray, grid_monitor.BRIGHT_THRESHOLD, 255, cv2.THRESH_BINARY)
+    ratios = []
+    for x1, y1, x2, y2, _ in grid_regions:
+        grid = binary[y1:y2, x1:x2]
+        ratios.append(np.count_nonzero(grid) / grid.size if grid.size else 0.0)
+    return np.array(ratios)
+
+
+@pytest.mark.parametrize("monitor_type", ["charging_case", "hearing_aid"])
+@pytest.mark.parametrize("border_rect", [None, [400, 300, 240, 180]])
+def test_roi_matches_full_frame(make_monitor, monitor_type, border_rect):
+    """只处理ROI的亮度比例与整帧处理一致（含网格超出画面边缘的情况）"""
+    border_rect = border_rect or default_border_rect(monitor_type, FRAME_SIZE)
+    tray = SyntheticTray(monitor_type, frame_size=FRAME_SIZE, border_rect=border_rect, noise_std=6.0, seed=1)
+    monitor = make_monitor(monitor_type, border_rect)
+    x1, y1, x2, y2 = monitor.grid_geometry.roi_rect
+    margin = grid_monitor.ROI_MARGIN
+    for i in range(5):
+        frame = tray.render(i * 0.37)
+        # 网格外接矩形外侧2像素处的亮线：模糊/膨胀后会影响边缘网格，ROI边距不足时结果不同
+        cv2.rectangle(frame, (x1 + margin - 2, y1 + margin - 2), (x2 - margin + 1, y2 - margin + 1),
+                      (255, 255, 255), 1)
+        monitor.frame_time = 1700000000.0 + i
+        bright_grids, ratios, _ = monitor.calculate_grid_bright(frame)
+        expected = full_frame_ratios(frame, monitor.grid_regions)
+        np.testing.assert_allclose(ratios, expected, rtol=0, atol=1e-12)
+        assert list(bright_grids) == [idx for *_, idx in monitor.grid_regions
+                                      if expected[idx] >= grid_monitor.BRIGHT_PIXEL_RATIO]
+
+
+def test_custom_grid_regions(make_monitor):
+    """显式传入的均匀网格按其区域检测，而不是按设备类型重建"""
+    border_rect = default_border_rect("charging_case", FRAME_SIZE)
+    regions = uniform_grid_regions(border_rect, 8, 10)
+    tray = SyntheticTray("charging_case", frame_size=FRAME_SIZE, border_rect=border_rect, grid_regions=regions, seed=2)
+    monitor = make_monitor("charging_case", border_rect, grid_regions=regions)
+    assert monitor.grid_count == len(monitor.grid_regions) == 80
+    monitor.frame_time = 1700000000.0
+    frame = tray.render(0.0)
+    _, ratios, _ = monitor.calculate_grid_bright(frame)
+    np.testing.assert_allclose(ratios, full_frame_ratios(frame, regions), rtol=0, atol=1e-12)
+
+
+@pytest.mark.parametrize("monitor_type", ["charging_case", "hearing_aid"])
+def test_vectorized_counts_match_slices(monitor_type):
+    """积分图一次计数与逐网格切片 count_nonzero 一致（任意ROI起点、网格被画面截断）"""
+    rng = np.random.default_rng(0)
+    regions = build_grid_regions(monitor_type, [50, 40, 500, 300])
+    geometry = GridGeometry(regions, margin=4)
+    binary = np.where(rng.random((360, 520)) < 0.3, 255, 0).astype(np.uint8)
+    for origin in ((0, 0), (30, 25)):
+        ox, oy = origin
+        roi = binary[oy:, ox:]
+        counts, areas = geometry.count_bright(roi, origin)
+        for pos, (x1, y1, x2, y2, _) in enumerate(regions):
+            grid = roi[max(0, y1 - oy):max(0, y2 - oy), max(0, x1 - ox):max(0, x2 - ox)]
+            assert counts[pos] == np.count_nonzero(grid)
+            assert areas[pos] == grid.size
@@ -0,0 +1,233 @@
+# test_log_analysis.py
+import os
+import json
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("tkinter")  # 分析工具模块同时包含界面
+
+import segment_analysis
+from hearing_aid_log_analysis_tool import HearingAidLogAnalyzer
+from charging_log_analysis_tool import ChargingLogAnalyzer
+
+START = datetime(2024, 3, 1, 8, 0, 0)
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def hearing_aid_entries(rng, count, start, step):
+    entries = []
+    for i in range(count):
+        ts = start + timedelta(seconds=i * step)
+        abnormal = sorted(rng.sample(range(56), rng.randint(0, 4))) if rng.random() < 0.4 else []
+        entries.append({"timestamp": ts.strftime(TIME_FORMAT), "monitor_type": "hearing_aid",
+                        "abnormal_grids": abnormal, "restart_timestamp": start.strftime("%Y%m%d_%H%M%S")})
+    return entries
+
+
+def charging_entries(rng, rounds, start, step):
+    entries = []
+    for r in range(rounds):
+        ts = start + timedelta(seconds=r * step)
+        for grid_idx in range(20):
+            if grid_idx % 4 == 0:
+                status = rng.choice(["no_status", "charging", "charged"])
+            else:
+                status = "charging" if r < grid_idx * 3 else "charged"
+            entries.append({"timestamp": ts.strftime(TIME_FORMAT), "restart_timestamp": start.strftime("%Y%m%d_%H%M%S"),
+                            "grid_id": grid_idx, "status": status, "detail": ""})
+    return entries
+
+
+def write_segments(root, station, entries, legacy=False):
+    """按10分钟分段写入（legacy=True 时为旧版 .json 数组格式，否则为 .jsonl）"""
+    out_dir = os.path.join(root, station)
+    os.makedirs(out_dir, exist_ok=True)
+    segments = {}
+    for entry in entries:
+        ts = datetime.strptime(entry["timestamp"], TIME_FORMAT)
+        seg_start = ts.replace(minute=ts.minute // 10 * 10, second=0)
+        name = f"{seg_start:%Y%m%d_%H%M}_{seg_start + timedelta(minutes=10):%H%M}"
+        segments.setdefault(name, []).append(entry)
+    for name, items in segments.items():
+        if legacy:
+            with open(os.path.join(out_dir, f"{name}.json"), "w", encoding="utf-8") as f:
+                json.dump(items, f, indent=2)
+        else:
+            with open(os.path.join(out_dir, f"{name}.jsonl"), "w", encoding="utf-8") as f:
+                f.writelines(json.dumps(item) + "\n" for item in items)
+
+
+def analyze(analyzer_cls, root, workers=1, use_cache=False):
+    analyzer = analyzer_cls(str(root), workers=workers, use_cache=use_cache)
+    analyzer.analyze()
+    return analyzer.grid_summary
+
+
+def reference_hearing_aid(entries):
+    """参考实现：单个工位的所有记录按时间排序后逐条统计"""
+    records = sorted(((datetime.strptime(e["timestamp"], TIME_FORMAT), set(e["abnormal_grids"])) for e in entries),
+                     key=lambda r: r[0])
+    result = {}
+    for grid_idx in range(56):
+        count, duration, first, last, prev = 0, 0.0, None, None, None
+        for ts, abnormal in records:
+            if grid_idx in abnormal:
+                count += 1
+                first = first or ts
+                last = ts
+                if prev is not None:
+                    duration += (ts - prev).total_seconds()
+            prev = ts
+        result[grid_idx] = (count, first, last, duration)
+    return result
+
+
+def combine_stations(*references):
+    """多工位：次数/时长为各工位之和，首次/最后异常取所有工位的最早/最晚"""
+    result = {}
+    for grid_idx in range(56):
+        parts = [ref[grid_idx] for ref in references]
+        firsts = [p[1] for p in parts if p[1] is not None]
+        lasts = [p[2] for p in parts if p[2] is not None]
+        result[grid_idx] = (sum(p[0] for p in parts), min(firsts, default=None), max(lasts, default=None),
+                            sum(p[3] for p in parts))
+    return result
+
+
+def reference_charging(entries):
+    """参考实现：各网格记录全局按时间排序后逐条统计"""
+    per_grid = {}
+    for e in entries:
+        per_grid.setdefault(e["grid_id"], []).append((datetime.strptime(e["timestamp"], TIME_FORMAT), e["status"]))
+    result = {}
+    for grid_idx, records in per_grid.items():
+        records.sort(key=lambda r: r[0])
+        first_complete = next((ts for ts, st in records if st == "charged"), None)
+        fallback = first_complete is not None and any(
+            st != "charged" for ts, st in records if ts > first_complete)
+        result[grid_idx] = (len(records), records[0][1], records[-1][1],
+                            next((ts for ts, st in records if st == "charging"), None), first_complete, fallback)
+    return result
+
+
+def assert_charging(summary, expected):
+    for grid_idx, want in expected.items():
+        d = summary[grid_idx]
+        assert (d["record_count"], d["initial_status"], d["final_status"], d["first_charging_time"],
+                d["first_complete_time"], d["has_fallback"]) == want
+
+
+def write_overlapping_charging(root):
+    """两个工位目录时间范围重叠（第二个工位奇数网格一开始就充电完成），返回全部条目"""
+    rng = random.Random(4)
+    station_a = charging_entries(rng, 200, START, 4)
+    station_b = [dict(e, status="charged" if e["grid_id"] % 2 else e["status"])
+                 for e in charging_entries(rng, 120, START + timedelta(seconds=302), 4)]
+    write_segments(root, "20240301_080000_a", station_a)
+    write_segments(root, "20240301_080502_b", station_b)
+    return station_a + station_b
+
+
+def assert_hearing_aid(summary, expected):
+    for grid_idx, (count, first, last, duration) in expected.items():
+        d = summary[grid_idx]
+        assert (d["total_abnormal_times"], d["first_abnormal_time"], d["last_abnormal_time"]) == (count, first, last)
+        assert d["total_abnormal_duration"] == pytest.approx(duration)
+
+
+def test_hearing_aid_legacy_json_matches_jsonl(tmp_path):
+    entries = hearing_aid_entries(random.Random(1), 400, START, 3)
+    write_segments(tmp_path / "legacy", "20240301_080000", entries, legacy=True)
+    write_segments(tmp_path / "lines", "20240301_080000", entries)
+    legacy = analyze(HearingAidLogAnalyzer, tmp_path / "legacy")
+    assert legacy == analyze(HearingAidLogAnalyzer, tmp_path / "lines")
+    assert legacy[0]["total_records"] == len(entries)
+
+
+def test_hearing_aid_restarts_chain_in_time_order(tmp_path):
+    """同一工位的多次重启（时间不重叠）：按全局时间顺序衔接，与逐条统计一致"""
+    rng = random.Random(2)
+    first_run = hearing_aid_entries(rng, 300, START, 2)
+    second_run = hearing_aid_entries(rng, 300, START + timedelta(seconds=1500), 2)
+    write_segments(tmp_path, "20240301_080000", first_run)
+    write_segments(tmp_path, "20240301_082500", second_run)
+    assert_hearing_aid(analyze(HearingAidLogAnalyzer, tmp_path), reference_hearing_aid(first_run + second_run))
+
+
+def test_hearing_aid_overlapping_stations(tmp_path):
+    """两个工位目录时间范围重叠：各工位分别按时间衔接，时长相加，首次/最后异常取全局"""
+    rng = random.Random(3)
+    station_a = hearing_aid_entries(rng, 500, START, 2)
+    station_b = hearing_aid_entries(rng, 300, START + timedelta(seconds=301), 3)
+    write_segments(tmp_path, "20240301_080000_a", station_a)
+    write_segments(tmp_path, "20240301_080501_b", station_b)
+    expected = combine_stations(reference_hearing_aid(station_a), reference_hearing_aid(station_b))
+    assert_hearing_aid(analyze(HearingAidLogAnalyzer, tmp_path), expected)
+
+
+def test_charging_legacy_json_matches_jsonl(tmp_path):
+    entries = charging_entries(random.Random(5), 200, START, 4)
+    write_segments(tmp_path / "legacy", "20240301_080000", entries, legacy=True)
+    write_segments(tmp_path / "lines", "20240301_080000", entries)
+    legacy = analyze(ChargingLogAnalyzer, tmp_path / "legacy")
+    assert legacy == analyze(ChargingLogAnalyzer, tmp_path / "lines")
+    assert sum(d["record_count"] for d in legacy.values()) == len(entries)
+
+
+def test_charging_overlapping_stations(tmp_path):
+    """两个工位目录时间范围重叠：初始/最终状态、首次时间、回退均按记录时间判定"""
+    entries = write_overlapping_charging(tmp_path)
+    assert_charging(analyze(ChargingLogAnalyzer, tmp_path), reference_charging(entries))
+
+
+@pytest.mark.parametrize("analyzer_cls", [HearingAidLogAnalyzer, ChargingLogAnalyzer])
+def test_process_pool_matches_sequential(tmp_path, capsys, analyzer_cls):
+    """分段数达到 PARALLEL_MIN_FILES 时使用进程池，结果与顺序解析一致"""
+    rng = random.Random(6)
+    if analyzer_cls is HearingAidLogAnalyzer:
+        entries = hearing_aid_entries(rng, 600, START, 5)
+    else:
+        entries = charging_entries(rng, 600, START, 5)
+    write_segments(tmp_path, "20240301_080000", entries)
+    assert len(os.listdir(tmp_path / "20240301_080000")) >= segment_analysis.PARALLEL_MIN_FILES
+    assert analyze(analyzer_cls, tmp_path, workers=2) == analyze(analyzer_cls, tmp_path, workers=1)
+    assert "parsing sequentially" not in capsys.readouterr().out
+
+
+def test_process_pool_unavailable_falls_back(tmp_path, monkeypatch, capsys):
+    """进程池无法创建时退回当前进程顺序解析"""
+    entries = charging_entries(random.Random(7), 600, START, 5)
+    write_segments(tmp_path, "20240301_080000", entries)
+    expected = analyze(ChargingLogAnalyzer, tmp_path, workers=1)
+
+    def unavailable(*args, **kwargs):
+        raise OSError("no process pool")
+
+    monkeypatch.setattr(segment_analysis, "ProcessPoolExecutor", unavailable)
+    assert analyze(ChargingLogAnalyzer, tmp_path, workers=2) == expected
+    assert "parsing sequentially" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize("analyzer_cls", [HearingAidLogAnalyzer, ChargingLogAnalyzer])
+def test_cache_reused_for_overlapping_stations(tmp_path, monkeypatch, analyzer_cls):
+    """多工位目录（分段时间重叠）重复分析时全部分段命中缓存、不再读取日志，结果与重新解析一致"""
+    if analyzer_cls is HearingAidLogAnalyzer:
+        rng = random.Random(8)
+        write_segments(tmp_path, "20240301_080000_a", hearing_aid_entries(rng, 500, START, 2))
+        write_segments(tmp_path, "20240301_080501_b", hearing_aid_entries(rng, 300, START + timedelta(seconds=301), 3))
+    else:
+        write_overlapping_charging(tmp_path)
+    expected = analyze(analyzer_cls, tmp_path)
+    assert analyze(analyzer_cls, tmp_path, use_cache=True) == expected
+
+    def no_reads(*args, **kwargs):
+        raise AssertionError("log re-read on cached run")
+
+    monkeypatch.setattr(segment_analysis, "map_segments", no_reads)
+    analyzer = analyzer_cls(str(tmp_path), workers=1, use_cache=True)
+    analyzer.analyze()
+    assert analyzer.grid_summary == expected
+    segment_count = sum(len(files) for _, _, files in os.walk(tmp_path)) - 1  # 不含缓存文件
+    assert f"缓存命中分段: {segment_count}, 重新解析分段: 0" in analyzer.debug_info
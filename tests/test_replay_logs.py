@@ -0,0 +1,18 @@
+# test_replay_logs.py
+import os
+import types
+
+import grid_monitor
+
+
+def test_repeated_replay_uses_new_log_dirs(make_monitor, tmp_path):
+    """同一录像重复回放时每次写入新的子目录（不追加到上次回放的日志）"""
+    source = types.SimpleNamespace(start_time=1700000000.0)
+    first = make_monitor("charging_case", [100, 100, 400, 300], frame_source=source)
+    second = make_monitor("charging_case", [100, 100, 400, 300], frame_source=source)
+    assert first.restart_timestamp == second.restart_timestamp
+    assert first.restart_dir_name.endswith(f"_{grid_monitor.REPLAY_DIR_SUFFIX}1")
+    assert second.restart_dir_name.endswith(f"_{grid_monitor.REPLAY_DIR_SUFFIX}2")
+    for root_dir in (grid_monitor.CHARGING_BRIGHTNESS_ROOT_DIR, grid_monitor.CHARGING_ROOT_DIR):
+        assert os.path.isdir(tmp_path / root_dir / first.restart_dir_name)
+        assert os.path.isdir(tmp_path / root_dir / second.restart_dir_name)
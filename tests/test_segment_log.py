@@ -0,0 +1,30 @@
+# test_segment_log.py
+import threading
+
+from segment_log import AsyncLogWriter
+
+
+def test_stop_timeout_keeps_writer_thread(tmp_path):
+    """写入线程超时未结束：上报错误、保留线程，之后再次停止时写完并关闭文件"""
+    errors = []
+    release = threading.Event()
+    writer = AsyncLogWriter(batch_size=1, on_error=errors.append)
+    write_batch = writer._write_batch
+
+    def slow_write(batch):
+        release.wait()
+        write_batch(batch)
+
+    writer._write_batch = slow_write
+    writer.start()
+    log_file = tmp_path / "20240301_0800_0810.jsonl"
+    writer.submit("test", str(log_file), [{"n": 1}])
+
+    assert writer.stop(timeout=0.05) is False
+    assert writer._thread is not None and writer._thread.is_alive()
+    assert len(errors) == 1 and isinstance(errors[0], TimeoutError)
+
+    release.set()
+    assert writer.stop(timeout=5.0) is True
+    assert writer._thread is None and not writer._writers
+    assert log_file.read_text(encoding="utf-8").strip() == '{"n": 1}'
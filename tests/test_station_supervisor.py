@@ -0,0 +1,37 @@
+# test_station_supervisor.py
+import json
+
+import pytest
+
+pytest.importorskip("tkinter")  # 监督模块同时包含界面
+
+import station_supervisor
+
+
+def write_config(tmp_path, stations):
+    config_file = tmp_path / "stations.json"
+    config_file.write_text(json.dumps({"stations": stations}), encoding="utf-8")
+    return str(config_file)
+
+
+def test_station_metrics_ports(tmp_path, monkeypatch):
+    """各工位指标端口：配置优先，否则为基准端口 +1、+2 …；未设置基准端口时不启动"""
+    config_file = write_config(tmp_path, [
+        {"name": "A", "camera": 0, "monitor_type": "hearing_aid"},
+        {"name": "B", "camera": 1, "monitor_type": "charging_case", "metrics_port": 9200},
+        {"name": "C", "camera": 2, "monitor_type": "charging_case"},
+    ])
+    monkeypatch.setattr(station_supervisor, "METRICS_PORT", 0)
+    assert [s["metrics_port"] for s in station_supervisor.load_stations(config_file)] == [None, 9200, None]
+    monkeypatch.setattr(station_supervisor, "METRICS_PORT", 9100)
+    assert [s["metrics_port"] for s in station_supervisor.load_stations(config_file)] == [9101, 9200, 9103]
+
+
+def test_station_metrics_port_conflict(tmp_path, monkeypatch):
+    monkeypatch.setattr(station_supervisor, "METRICS_PORT", 9100)
+    config_file = write_config(tmp_path, [
+        {"name": "A", "camera": 0, "monitor_type": "hearing_aid", "metrics_port": 9102},
+        {"name": "B", "camera": 1, "monitor_type": "charging_case"},
+    ])
+    with pytest.raises(ValueError, match="metrics port 9102"):
+        station_supervisor.load_stations(config_file)